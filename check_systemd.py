@@ -14,6 +14,14 @@ Monitoring scopes
 =================
 
 * ``units``: State of unites
+* ``unit_groups``: Aggregated state of user-defined groups of units
+* ``unit_files``: Enablement state of the unit files
+* ``cgroups``: Resource usage of the services (cgroup v2)
+* ``restarts``: Restart rates of the services
+* ``flapping``: Frequent state changes of the units
+* ``startup_profile``: The slowest units during the boot
+* ``transitions``: Units stuck in a transitional state
+* ``journal_errors``: Error rates of the units in the journal
 * ``timers``: Timers
 * ``startup_time``: Startup time
 * ``performance_data``: Performance data
@@ -23,6 +31,12 @@ Data sources
 
 * D-Bus (``dbus``)
 * Command line interface (``cli``)
+* Automatic selection (``auto``): The capabilities of the host are probed
+  once per boot and the cheapest working data source is used.
+
+Additional service managers (user service managers with
+``--user-managers``, containers with ``--machines``) are always queried
+using the command line interface.
 
 This plugin is based on a Python package named `nagiosplugin
 <https://pypi.org/project/nagiosplugin/>`_. ``nagiosplugin`` has a fine-grained
@@ -36,6 +50,15 @@ Acquisition (``Resource``)
 ==========================
 
 * :class:`UnitsResource` (``context=units``)
+* :class:`ManagerUnitsResource` (``context=units``)
+* :class:`UnitGroupsResource` (``context=unit_groups``)
+* :class:`UnitFilesResource` (``context=unit_files``)
+* :class:`CgroupsResource` (``context=cgroup_*``)
+* :class:`RestartsResource` (``context=restarts``)
+* :class:`FlappingResource` (``context=flapping``)
+* :class:`StartupProfileResource` (``context=startup_profile``)
+* :class:`TransitionsResource` (``context=transitions``)
+* :class:`JournalErrorsResource` (``context=journal_errors``)
 * :class:`TimersResource` (``context=timers``)
 * :class:`StartupTimeResource` (``context=startup_time``)
 * :class:`PerformanceDataResource` (``context=performance_data``)
@@ -44,6 +67,15 @@ Evaluation (``Context``)
 ========================
 
 * :class:`UnitsContext` (``context=units``)
+* :class:`UnitsHealthyContext` (``context=units_healthy``)
+* :class:`UnitGroupsContext` (``context=unit_groups``)
+* :class:`UnitFilesContext` (``context=unit_files``)
+* :class:`CgroupContext` (``context=cgroup_*``)
+* :class:`RestartsContext` (``context=restarts``)
+* :class:`FlappingContext` (``context=flapping``)
+* :class:`StartupProfileContext` (``context=startup_profile``)
+* :class:`TransitionsContext` (``context=transitions``)
+* :class:`JournalErrorsContext` (``context=journal_errors``)
 * :class:`TimersContext` (``context=timers``)
 * :class:`StartupTimeContext` (``context=timers``)
 * :class:`PerformanceDataContext` (``context=performance_data``)
@@ -52,14 +84,42 @@ Presentation (``Summary``)
 ==========================
 
 * :class:`SystemdSummary`
+
+Python API
+==========
+
+Every run of the check has its own :class:`CheckSession`, which holds the
+options and the unit cache. :func:`run_check` runs a check without
+printing the output and returns a :class:`CheckResult`.
 """
 from __future__ import annotations
 
+import abc
 import argparse
+import base64
 import collections.abc
+import concurrent.futures
+import contextlib
+import contextvars
+import errno
+import fcntl
+import functools
+import hashlib
+import heapq
+import io
+import json
+import mmap
+import os
+import pwd
 import re
+import select
+import socket
+import struct
 import subprocess
+import threading
+import time
 import typing
+import zlib
 
 import nagiosplugin
 from nagiosplugin.check import Check
@@ -70,7 +130,7 @@ from nagiosplugin.performance import Performance
 from nagiosplugin.range import Range
 from nagiosplugin.resource import Resource
 from nagiosplugin.result import Result, Results
-from nagiosplugin.state import Critical, Ok, ServiceState, Warn
+from nagiosplugin.state import Critical, Ok, ServiceState, Unknown, Warn
 from nagiosplugin.summary import Summary
 
 __version__: str = "2.3.1"
@@ -105,14 +165,72 @@ class OptionContainer:
     timers_warning: int
     ignore_inactive_state: bool
     scope_startup_time: bool
+    scope_unit_files: bool
+    scope_cgroups: bool
+    cgroup_root: str
+    cgroup_memory_warning: str | None
+    cgroup_memory_critical: str | None
+    cgroup_oom_kills_warning: str | None
+    cgroup_oom_kills_critical: str | None
+    cgroup_tasks_warning: str | None
+    cgroup_tasks_critical: str | None
+    scope_restarts: bool
+    restarts_warning: str | None
+    restarts_critical: str | None
+    scope_flapping: bool
+    flapping_window: int
+    flapping_warning: str | None
+    flapping_critical: str | None
+    scope_transitions: bool
+    transitions_warning: str | None
+    transitions_critical: str | None
+    scope_journal_errors: bool
+    journal_errors_warning: str | None
+    journal_errors_critical: str | None
+    scope_startup_profile: bool
+    startup_profile_top: int
+    startup_profile_warning: str | None
+    startup_profile_critical: str | None
+    startup_profile_thresholds: list[typing.Tuple[str, str, str]]
+    unit_files_presets: bool
     warning: str
     critical: str
     performance_data: bool
     include_unit: str
-    data_source: typing.Literal["dbus", "cli"]
+    data_source: typing.Literal["dbus", "cli", "auto"]
     include_type: list[str]
     exclude_type: list[str]
     exclude_unit: list[str]
+    with_user_units: bool
+    user_managers: bool
+    machines: list[str] | None
+    max_workers: int
+    record: str | None
+    replay: str | None
+    state_dir: str | None
+    boot_cache: bool
+    changes_only: bool
+    passive_command_file: str | None
+    passive_json: str | None
+    passive_host: str | None
+    passive_service: str
+    openmetrics_file: str | None
+    perfdata_units: bool
+    perfdata_types: bool
+    perfdata_top: int
+    perfdata_max_labels: int
+    perfdata_label_template: str
+    max_problems: int
+    suppress_dependents: bool
+    failure_details: bool
+    failure_details_max: int
+    failure_details_timeout: float
+    journal_lines: int
+    verbose: int
+    compact: bool
+    groups: list[typing.Tuple[str, str]]
+    group_warning: str | None
+    group_critical: str
 
     def __init__(self):
         self.include = []
@@ -121,23 +239,240 @@ class OptionContainer:
         self.data_source = None
 
 
-opts = OptionContainer()
-"""
-We make is variable global to be able to access the command line arguments
-everywhere in the plugin. In this variable the result of `parse_args()
-<https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.parse_args>`_
-is stored. It is an instance of the
-`argparse.Namespace
-<https://docs.python.org/3/library/argparse.html#argparse.Namespace>`_ class.
-This variable is initialized in the main function. The variable is
-intentionally not named ``args`` to avoid confusion with ``*args`` (Non-Keyword
-Arguments).
-"""
+# Record and replay ###########################################################
+
+
+RECORDING_MAGIC = b"CHECK_SYSTEMD_REC1\n"
+"""The first bytes of a file written by :class:`AcquisitionRecorder`."""
+
+RECORD_HEADER = struct.Struct("<II")
+"""The header of a record: the length of the key and the length of the
+value in bytes."""
+
+
+def encode_recorded_value(value: typing.Any) -> bytes:
+    """Serialize an acquired value (the raw output of a command or the reply
+    of a D-Bus method) as compressed JSON. Bytes are encoded as Base64."""
+
+    def default(obj: typing.Any) -> typing.Any:
+        if isinstance(obj, bytes):
+            return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+        raise TypeError("{} is not serializable".format(type(obj).__name__))
+
+    return zlib.compress(json.dumps(value, default=default).encode())
+
+
+def decode_recorded_value(data: bytes) -> typing.Any:
+    """The reverse of :func:`encode_recorded_value`."""
+
+    def object_hook(obj: dict[str, typing.Any]) -> typing.Any:
+        if len(obj) == 1 and "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        return obj
+
+    return json.loads(zlib.decompress(data), object_hook=object_hook)
+
+
+class AcquisitionTape(abc.ABC):
+    """Base class of :class:`AcquisitionRecorder` and
+    :class:`AcquisitionReplay`. A tape is activated for the current context
+    (and the threads that are started from it) with a ``with`` statement.
+    All acquisitions that use :func:`acquire` (the commands of
+    :func:`execute_cli`, the calls of the D-Bus API, the clocks of
+    :func:`read_clock` and the state of previous runs) pass through the
+    active tape.
+    """
+
+    @abc.abstractmethod
+    def acquire(self, key: str, fetch: typing.Callable[[], typing.Any]) -> typing.Any:
+        """Return the value of an acquisition.
+
+        :param key: The JSON encoded key of the acquisition.
+        :param fetch: A callable that acquires the value.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> AcquisitionTape:
+        self.__token = active_tape.set(self)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        active_tape.reset(self.__token)
+        self.close()
+
+
+class AcquisitionRecorder(AcquisitionTape):
+    """Record the raw results of all acquisitions into a file (option
+    ``--record``). Each record is appended as soon as it is acquired, so a
+    check that hangs or crashes can be reproduced up to that point.
+
+    The file starts with :data:`RECORDING_MAGIC`, followed by the records:
+    a header (:data:`RECORD_HEADER`), the key (for example
+    ``["cli", ["systemctl", "list-units", "--all"]]``) and the value
+    (see :func:`encode_recorded_value`).
+
+    :param path: The path of the file.
+    """
+
+    def __init__(self, path: str):
+        self.__file = open(path, "wb")
+        self.__file.write(RECORDING_MAGIC)
+        self.__lock = threading.Lock()
+
+    def acquire(self, key: str, fetch: typing.Callable[[], typing.Any]) -> typing.Any:
+        try:
+            value = fetch()
+        except Exception as e:
+            self.__write(key, ["error", str(e)])
+            raise
+        self.__write(key, ["ok", value])
+        return value
+
+    def __write(self, key: str, value: typing.Any) -> None:
+        key_bytes = key.encode()
+        value_bytes = encode_recorded_value(value)
+        with self.__lock:
+            self.__file.write(
+                RECORD_HEADER.pack(len(key_bytes), len(value_bytes))
+                + key_bytes
+                + value_bytes
+            )
+            self.__file.flush()
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class AcquisitionReplay(AcquisitionTape):
+    """Feed the records of a file written by :class:`AcquisitionRecorder`
+    back into the check (option ``--replay``) without querying systemd. The
+    file is memory-mapped and only the headers are read to build an index,
+    the values are decoded on demand.
+
+    If a key was recorded several times, the values are returned in the
+    recorded order. The last value is repeated if there are more
+    acquisitions than records.
+
+    :param path: The path of the file.
+
+    :raises CheckError: If the file is empty, not a recording or truncated.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as recording:
+            if os.fstat(recording.fileno()).st_size == 0:
+                # An empty file cannot be memory-mapped.
+                raise CheckError("The recording '{}' is empty".format(path))
+            self.__mmap = mmap.mmap(recording.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__mmap[: len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            self.__mmap.close()
+            raise CheckError("'{}' is not a recording of check_systemd".format(path))
+        self.__index: dict[str, list[typing.Tuple[int, int]]] = {}
+        self.__lock = threading.Lock()
+        offset = len(RECORDING_MAGIC)
+        while offset < len(self.__mmap):
+            if offset + RECORD_HEADER.size > len(self.__mmap):
+                raise self.__truncated(path, offset)
+            key_length, value_length = RECORD_HEADER.unpack_from(self.__mmap, offset)
+            key_offset = offset + RECORD_HEADER.size
+            value_offset = key_offset + key_length
+            if value_offset + value_length > len(self.__mmap):
+                raise self.__truncated(path, offset)
+            key = self.__mmap[key_offset:value_offset].decode()
+            self.__index.setdefault(key, []).append((value_offset, value_length))
+            offset = value_offset + value_length
+
+    def __truncated(self, path: str, offset: int) -> CheckError:
+        self.__mmap.close()
+        return CheckError(
+            "The recording '{}' is truncated at byte {}".format(path, offset)
+        )
+
+    @property
+    def keys(self) -> list[str]:
+        """The keys of the recorded acquisitions."""
+        return list(self.__index)
+
+    def acquire(self, key: str, fetch: typing.Callable[[], typing.Any]) -> typing.Any:
+        with self.__lock:
+            locations = self.__index.get(key)
+            if not locations:
+                raise CheckError("No recorded data for {}".format(key))
+            offset, length = locations.pop(0) if len(locations) > 1 else locations[0]
+        status, value = decode_recorded_value(self.__mmap[offset : offset + length])
+        if status == "error":
+            raise CheckError(value)
+        return value
+
+    def close(self) -> None:
+        self.__mmap.close()
+
+
+active_tape: contextvars.ContextVar[AcquisitionTape | None] = contextvars.ContextVar(
+    "active_tape", default=None
+)
+"""The tape of the current context. A context variable is used instead of
+a module level variable, so that concurrent checks can record or replay
+independently."""
+
+
+def acquire(key: typing.Any, fetch: typing.Callable[[], typing.Any]) -> typing.Any:
+    """Acquire data from systemd through the active tape (if any).
+
+    :param key: A JSON serializable key that identifies the acquisition, for
+      example ``["cli", ["systemd-analyze"]]``.
+    :param fetch: A callable that queries systemd. It is not called if a
+      recording is replayed.
+    """
+    tape = active_tape.get()
+    if tape is None:
+        return fetch()
+    return tape.acquire(json.dumps(key), fetch)
+
+
+def is_replaying() -> bool:
+    """True if a recording is replayed in the current context. Nothing
+    must be stored for the next run during a replay."""
+    return isinstance(active_tape.get(), AcquisitionReplay)
+
+
+def read_clock(name: typing.Literal["monotonic", "time"]) -> float:
+    """Read ``time.monotonic`` or ``time.time`` through the active tape, so
+    that rates and durations are computed with the recorded time when a
+    recording is replayed.
+
+    :param name: The name of the function of the module ``time``.
+    """
+    return acquire(["clock", name], getattr(time, name))
+
+
+def submit_in_context(
+    executor: concurrent.futures.Executor, fn: typing.Callable, *args: typing.Any
+) -> concurrent.futures.Future:
+    """Submit a callable to an executor that runs in a copy of the current
+    context, so that the worker threads use the active tape."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
 
 
 # Data source: D-Bus ##########################################################
 
 
+DBUS_PROXY_FLAGS = 3
+"""``Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES`` and
+``Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS``: The properties of the
+unit proxies are fetched with explicit ``GetAll`` calls."""
+
+DBUS_PROXY_CACHE_SIZE = 4096
+"""The maximum number of unit proxies that are kept by
+:class:`DbusManager`."""
+
+DBUS_MAX_WORKERS = 8
+"""The maximum number of D-Bus method calls that are executed in
+parallel when properties are fetched."""
+
+
 class DbusManager:
     """
     This class holds the main entry point object of the D-Bus systemd API. See
@@ -156,11 +491,72 @@ class DbusManager:
             "org.freedesktop.systemd1.Manager",
             None,
         )
+        self.__proxies: dict[str, typing.Any] = {}
+        self.__lock = threading.Lock()
 
     @property
     def manager(self):
         return self.__manager
 
+    def get_properties_proxy(self, object_path: str):
+        """Get a proxy for the properties interface of a unit. The proxies
+        are reused. They neither load properties nor subscribe to signals
+        when they are created, so creating one needs no round trip.
+
+        :param object_path: The object path of the unit, for example
+          ``/org/freedesktop/systemd1/unit/nginx_2eservice``.
+        """
+        with self.__lock:
+            proxy = self.__proxies.get(object_path)
+            if proxy is None:
+                if len(self.__proxies) >= DBUS_PROXY_CACHE_SIZE:
+                    self.__proxies.clear()
+                proxy = self.__proxies[object_path] = DBusProxy.new_for_bus_sync(
+                    BusType.SYSTEM,
+                    DBUS_PROXY_FLAGS,
+                    None,
+                    "org.freedesktop.systemd1",
+                    object_path,
+                    "org.freedesktop.DBus.Properties",
+                    None,
+                )
+            return proxy
+
+    def get_unit_properties(
+        self,
+        unit_name: str,
+        object_path: str | None = None,
+        timeout: float | None = None,
+    ) -> dict[str, typing.Any]:
+        """Get all properties of the generic unit interface and of the unit
+        type specific interface (for example
+        ``org.freedesktop.systemd1.Service``) of one unit.
+
+        :param unit_name: The name of the unit, for example
+          ``nginx.service``.
+        :param object_path: The object path of the unit as returned by
+          ``ListUnits``. It is looked up with ``GetUnit`` if it is not
+          specified.
+        :param timeout: The maximum number of seconds to wait for each
+          method call.
+        """
+        kwargs: dict[str, typing.Any] = {}
+        if timeout is not None:
+            # The bindings expect milliseconds.
+            kwargs["timeout"] = max(1, int(timeout * 1000))
+        if not object_path:
+            object_path = self.__manager.GetUnit("(s)", unit_name, **kwargs)
+        proxy = self.get_properties_proxy(object_path)
+        unit_type = unit_name.rsplit(".", 1)[-1].capitalize()
+        properties: dict[str, typing.Any] = {}
+        for interface in ("Unit", unit_type):
+            properties.update(
+                proxy.GetAll(
+                    "(s)", "org.freedesktop.systemd1.{}".format(interface), **kwargs
+                )
+            )
+        return properties
+
 
 dbus_manager = None
 """
@@ -211,28 +607,60 @@ def format_timespan_to_seconds(fmt_timespan: str) -> float:
     return round(float(result), 3)
 
 
-def execute_cli(args: str | typing.Sequence[str]) -> str | None:
+def get_remaining_time(deadline: float | None) -> float | None:
+    """The number of seconds until a deadline (a value of
+    ``time.monotonic``).
+
+    :raises nagiosplugin.CheckError: If the deadline has passed.
+
+    :return: ``None`` if there is no deadline.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise CheckError("The time budget is exhausted")
+    return remaining
+
+
+def execute_cli(
+    args: str | typing.Sequence[str], timeout: float | None = None
+) -> str | None:
     """Execute a command on the command line (cli = command line interface))
     and capture the stdout. This is a wrapper around ``subprocess.Popen``.
 
     :param args: A list of programm arguments.
+    :param timeout: The maximum number of seconds to wait for the command.
+      The command is killed if it takes longer.
 
-    :raises nagiosplugin.CheckError: If the command produces some stderr output
-      or if an OSError exception occurs.
+    :raises nagiosplugin.CheckError: If the command produces some stderr output,
+      if it times out or if an OSError exception occurs.
 
     :return: The stdout of the command.
     """
-    try:
+
+    def run() -> list[typing.Any]:
         p = subprocess.Popen(
             args, stderr=subprocess.PIPE, stdin=subprocess.PIPE, stdout=subprocess.PIPE
         )
-        stdout, stderr = p.communicate()
+        try:
+            stdout, stderr = p.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.communicate()
+            raise CheckError("The command timed out after {} seconds".format(timeout))
+        return [p.returncode, stdout, stderr]
+
+    try:
+        returncode, stdout, stderr = acquire(
+            ["cli", args if isinstance(args, str) else list(args)], run
+        )
     except OSError as e:
         raise CheckError(e)
 
-    if p.returncode != 0:
+    if returncode != 0:
         raise CheckError(
-            "The command exits with a none-zero" "return code ({})".format(p.returncode)
+            "The command exits with a none-zero" "return code ({})".format(returncode)
         )
 
     if stderr:
@@ -243,6 +671,59 @@ def execute_cli(args: str | typing.Sequence[str]) -> str | None:
         return stdout
 
 
+UNIT_TYPES_REGEXP = re.compile(r"^\.\*\\\.\(([a-z|]+)\)\$$")
+"""Matches the regular expressions that are generated by
+:meth:`SystemdUnitTypesList.convert_to_regexp`, for example
+``.*\\.(service|timer)$``."""
+
+
+def convert_regexp_to_globs(regexp: str) -> list[str] | None:
+    """Convert a regular expression of the options ``--include*`` into
+    shell-style patterns that match the same unit names when passed to
+    ``systemctl list-units``. The regular expressions are matched at the
+    beginning of the unit names (``re.match``), so a pattern without
+    ``$`` at its end gets a trailing ``*``.
+
+    Only literal characters, escaped characters, ``.``, ``.*``, a final
+    ``$`` and the regular expressions of the unit types can be
+    converted.
+
+    :param regexp: A regular expression, for example ``nginx\\.service``.
+
+    :return: The patterns, for example ``['nginx.service*']``, or ``None``
+      if the regular expression can not be expressed as patterns.
+    """
+    match = UNIT_TYPES_REGEXP.match(regexp)
+    if match:
+        return ["*." + unit_type for unit_type in match.group(1).split("|")]
+    glob = ""
+    i = 0
+    while i < len(regexp):
+        char = regexp[i]
+        if char == "\\" and i + 1 < len(regexp) and not regexp[i + 1].isalnum():
+            literal = regexp[i + 1]
+            i += 2
+        elif regexp.startswith(".*", i):
+            glob += "*"
+            i += 2
+            continue
+        elif char == ".":
+            glob += "?"
+            i += 1
+            continue
+        elif char == "$" and i == len(regexp) - 1:
+            return [glob]
+        elif char.isalnum() or char in "-_@:":
+            literal = char
+            i += 1
+        else:
+            return None
+        if literal in "*?[]\\":
+            return None
+        glob += literal
+    return [glob if glob.endswith("*") else glob + "*"]
+
+
 class TableParser:
     """This class reads the text tables that some systemd commands like
     ``systemctl list-units`` or ``systemctl list-timers`` produce."""
@@ -371,6 +852,162 @@ class TableParser:
             yield self.get_row(i)
 
 
+LIST_PROPERTIES: typing.FrozenSet[str] = frozenset(
+    (
+        "After",
+        "Before",
+        "BindsTo",
+        "BoundBy",
+        "ConsistsOf",
+        "Conflicts",
+        "ConflictedBy",
+        "Names",
+        "PartOf",
+        "RequiredBy",
+        "Requires",
+        "Requisite",
+        "RequisiteOf",
+        "TriggeredBy",
+        "Triggers",
+        "WantedBy",
+        "Wants",
+    )
+)
+"""Properties that ``systemctl show`` prints as a space separated list of
+unit names."""
+
+
+def convert_property_value(name: str, value: str) -> typing.Any:
+    """Convert the textual value of a property as printed by ``systemctl
+    show`` into a Python type that corresponds to the type of the D-Bus
+    API.
+
+    :param name: The name of the property, for example ``NRestarts``.
+    :param value: The value of the property, for example ``3``.
+
+    :return: ``None`` for unset values, a list of strings for dependency
+      properties, a boolean for ``yes`` / ``no``, an integer for numeric
+      values and the unchanged string otherwise.
+    """
+    if name in LIST_PROPERTIES:
+        return value.split()
+    if value == "" or value == "[not set]":
+        return None
+    if value == "yes":
+        return True
+    if value == "no":
+        return False
+    if re.match(r"^-?\d+$", value):
+        return int(value)
+    return value
+
+
+def parse_show_output(
+    stdout: str,
+) -> typing.Generator[dict[str, typing.Any], None, None]:
+    """Parse the output of ``systemctl show`` line by line. Multiple units
+    are separated by a blank line.
+
+    :param stdout: The standard output of ``systemctl show``.
+
+    :return: A generator that emits one dictionary of typed properties per
+      unit.
+    """
+    record: dict[str, typing.Any] = {}
+    for line in io.StringIO(stdout):
+        line = line.rstrip("\n")
+        if line == "":
+            if record:
+                yield record
+                record = {}
+            continue
+        name, _, value = line.partition("=")
+        record[name] = convert_property_value(name, value)
+    if record:
+        yield record
+
+
+# Data source: automatic selection ###########################################
+
+
+def parse_systemd_version(text: str) -> int | None:
+    """Extract the major version from the output of ``systemctl --version``
+    (``systemd 252 (252.22-1~deb12u1)``) or from the D-Bus property
+    ``Version`` (``252.22-1~deb12u1``)."""
+    match = re.match(r"(?:systemd )?(\d+)", text.strip())
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def probe_capabilities() -> dict[str, typing.Any]:
+    """Probe which data sources work on this host: the availability of the
+    D-Bus bindings (``gi``), the reachability of the system bus
+    (``dbus``), the version of systemd (``version``) and the support of
+    JSON output by ``systemctl list-units`` (``json``)."""
+    capabilities: dict[str, typing.Any] = {
+        "gi": is_gi,
+        "dbus": False,
+        "version": None,
+        "json": False,
+    }
+    if is_gi and dbus_manager is not None:
+        try:
+            version = acquire(
+                ["dbus", "Version"],
+                lambda: dbus_manager.manager.get_cached_property("Version").unpack(),
+            )
+            capabilities["dbus"] = True
+            capabilities["version"] = parse_systemd_version(version)
+        except Exception:
+            pass
+
+    if capabilities["version"] is None:
+        try:
+            capabilities["version"] = parse_systemd_version(
+                execute_cli(["systemctl", "--version"]) or ""
+            )
+        except CheckError:
+            pass
+
+    # Older versions of systemctl ignore --output for tables.
+    try:
+        stdout = execute_cli(
+            ["systemctl", "list-units", "--all", "--output=json", "init.scope"]
+        )
+        capabilities["json"] = isinstance(json.loads(stdout or ""), list)
+    except (CheckError, ValueError):
+        pass
+    return capabilities
+
+
+def select_data_source(
+    capabilities: dict[str, typing.Any],
+    with_user_units: bool = False,
+    fetches_properties: bool = False,
+) -> typing.Literal["dbus", "cli"]:
+    """Select the cheapest working data source. Listing the units over
+    D-Bus needs one method call, while the command line interface has to
+    start a ``systemctl`` process and parse its output. Fetching
+    additional properties is the other way round: D-Bus needs two
+    ``GetAll`` calls per unit, while ``systemctl show`` fetches up to
+    :data:`PROPERTY_CHUNK_SIZE` units per process. If properties are
+    fetched and ``systemctl`` can list the units as JSON (cheap to parse,
+    systemd 246 or later), the command line interface is selected.
+
+    :param capabilities: The result of :func:`probe_capabilities`.
+    :param with_user_units: The D-Bus data source supports only the system
+      service manager.
+    :param fetches_properties: An enabled feature fetches additional unit
+      properties (see :attr:`CheckSession.fetches_properties`).
+    """
+    if not capabilities.get("dbus") or with_user_units:
+        return "cli"
+    if fetches_properties and capabilities.get("json"):
+        return "cli"
+    return "dbus"
+
+
 # Unit abstraction ############################################################
 
 
@@ -575,25 +1212,64 @@ class Unit:
     was already active).
     """
 
+    properties: dict[str, typing.Any]
+    """Additional properties of the unit (for example ``NRestarts``) that
+    are fetched on demand by :meth:`UnitCache.fetch_properties`. The keys
+    are the property names of the D-Bus API."""
+
     def __init__(self, **kwargs):
         self.name = kwargs.get("name")
         self.active_state = kwargs.get("active_state")
         self.sub_state = kwargs.get("sub_state")
         self.load_state = kwargs.get("load_state")
+        self.properties = kwargs.get("properties", {})
+
+    @property
+    def type(self) -> str:
+        """The type of the unit, which is the suffix of the unit name, for
+        example ``service`` or ``timer``."""
+        return self.name.rsplit(".", 1)[-1]
 
-    def convert_to_exitcode(self) -> ServiceState:
+    def convert_to_exitcode(self, required: str | None = None) -> ServiceState:
         """Convert the different systemd states into a Nagios compatible
         exit code.
 
+        :param required: The active state the unit is required to be in
+          (option ``--required``).
+
         :return: A Nagios compatible exit code: 0, 1, 2, 3
         """
-        if opts.required and opts.required.lower() != self.active_state:
+        if required and required.lower() != self.active_state:
             return Critical
         if self.load_state == "error" or self.active_state == "failed":
             return Critical
         return Ok
 
 
+ACTIVE_STATE_CODES: dict[str, int] = {
+    "active": 0,
+    "reloading": 1,
+    "inactive": 2,
+    "failed": 3,
+    "activating": 4,
+    "deactivating": 5,
+}
+"""Numeric codes for the active states of the units, for example for
+performance data."""
+
+ACTIVE_STATE_SEVERITY: typing.Tuple[str, ...] = (
+    "failed",
+    "activating",
+    "deactivating",
+    "reloading",
+    "inactive",
+    "active",
+)
+"""The active states ordered by severity, the most severe state first.
+Unknown states are ranked last. The numeric codes of
+:data:`ACTIVE_STATE_CODES` are not ordered by severity."""
+
+
 class SystemdUnitTypesList(collections.abc.MutableSequence):
     def __init__(self, *args):
         self.unit_types = list()
@@ -782,15 +1458,97 @@ class UnitCache:
 
         return counter
 
+    def fetch_properties(
+        self,
+        properties: typing.Sequence[str],
+        names: typing.Iterable[str] | None = None,
+        timeout: float | None = None,
+    ) -> list[Unit]:
+        """Fetch additional properties in bulk and attach them to the
+        attribute :attr:`Unit.properties` of the cached units.
+
+        This cache has no data source, so the units are returned with the
+        properties that were stored by :meth:`add_unit`. Subclasses query
+        systemd.
+
+        :param properties: The names of the properties as used by the
+          D-Bus API, for example ``('NRestarts', 'ExecMainStatus')``.
+        :param names: The names of the units. All units are used if no names
+          are specified.
+        :param timeout: The maximum number of seconds for the whole fetch.
+
+        :raises nagiosplugin.CheckError: If the timeout expires.
+
+        :return: The units whose properties have been updated.
+        """
+        if names is None:
+            return list(self.list())
+        return [self.get(name) for name in names]
+
+
+PROPERTY_CHUNK_SIZE = 200
+"""The number of unit names that are passed to one ``systemctl show``
+call."""
+
+PROPERTY_MAX_WORKERS = 4
+"""The maximum number of ``systemctl show`` processes that run in
+parallel."""
+
 
 class CliUnitCache(UnitCache):
-    def __init__(self, with_user_units: bool = False):
+    def __init__(
+        self,
+        with_user_units: bool = False,
+        machine: str | None = None,
+        json_output: bool = False,
+        patterns: typing.Sequence[str] | None = None,
+    ):
+        """
+        :param with_user_units: Query the user service manager
+          (``systemctl --user``).
+        :param machine: Connect to the service manager of a container or
+          of a user (``systemctl --machine``), for example ``web1`` or
+          ``alice@``.
+        :param json_output: Parse the JSON output of ``systemctl
+          list-units --output=json`` instead of the text table.
+        :param patterns: List only the units that match one of the
+          shell-style patterns (see :func:`convert_regexp_to_globs`).
+          Patterns that only select unit types (``*.service``) are passed
+          as ``--type=``.
+        """
         super().__init__()
-        command = ["systemctl", "list-units", "--all"]
+        self.__systemctl_args: list[str] = []
         if with_user_units:
-            command += ["--user"]
+            self.__systemctl_args.append("--user")
+        if machine:
+            self.__systemctl_args.append("--machine={}".format(machine))
+        command = ["systemctl", "list-units", "--all"] + self.__systemctl_args
+        if json_output:
+            command.append("--output=json")
+        if patterns:
+            try:
+                types = SystemdUnitTypesList(
+                    *(p[2:] for p in patterns if p.startswith("*."))
+                )
+            except ValueError:
+                types = SystemdUnitTypesList()
+            if len(types) == len(patterns):
+                command.append("--type=" + ",".join(sorted(types)))
+            else:
+                command += ["--"] + sorted(patterns)
+        if json_output:
+            stdout = execute_cli(command)
+            for row in json.loads(stdout or "[]"):
+                self.add_unit(
+                    name=row["unit"],
+                    active_state=row["active"],
+                    sub_state=row["sub"],
+                    load_state=row["load"],
+                )
+            return
         stdout = execute_cli(command)
-        if stdout:
+        # Without matching units only the legend is printed.
+        if stdout and not re.match(r"\s*0 loaded units listed", stdout):
             table_parser = TableParser(stdout)
             table_parser.check_header(("unit", "active", "sub", "load"))
             for row in table_parser.list_rows():
@@ -801,204 +1559,2563 @@ class CliUnitCache(UnitCache):
                     load_state=row["load"],
                 )
 
+    def __show(
+        self,
+        properties: typing.Sequence[str],
+        names: list[str],
+        deadline: float | None = None,
+    ) -> str:
+        command = (
+            ["systemctl", "show", "--property=" + ",".join(properties)]
+            + self.__systemctl_args
+            + ["--"]
+            + names
+        )
+        return execute_cli(command, timeout=get_remaining_time(deadline)) or ""
+
+    def fetch_properties(
+        self,
+        properties: typing.Sequence[str],
+        names: typing.Iterable[str] | None = None,
+        timeout: float | None = None,
+    ) -> list[Unit]:
+        """Fetch the properties with chunked ``systemctl show`` calls. If
+        there are many chunks, the calls are executed in parallel.
+
+        ``systemctl show`` prints the units in the order of the command line
+        arguments. The property ``Id`` is always requested so that no
+        record is empty and the order of the records is preserved."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if names is None:
+            names = [unit.name for unit in self.list()]
+        units = [self.get(name) for name in names]
+        if not units:
+            return units
+        properties = ["Id"] + [p for p in properties if p != "Id"]
+        chunks = [
+            [unit.name for unit in units[i : i + PROPERTY_CHUNK_SIZE]]
+            for i in range(0, len(units), PROPERTY_CHUNK_SIZE)
+        ]
+        if len(chunks) > 1:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(PROPERTY_MAX_WORKERS, len(chunks))
+            ) as executor:
+                futures = [
+                    submit_in_context(
+                        executor, self.__show, properties, chunk, deadline
+                    )
+                    for chunk in chunks
+                ]
+                outputs = [future.result() for future in futures]
+        else:
+            outputs = [self.__show(properties, chunks[0], deadline)]
+
+        records = (record for stdout in outputs for record in parse_show_output(stdout))
+        for unit, record in zip(units, records):
+            unit.properties.update(record)
+        return units
+
 
 class DbusUnitCache(UnitCache):
     def __init__(self):
         super().__init__()
-        all_units = dbus_manager.manager.ListUnits()
-        for (name, _, load_state, active_state, sub_state, _, _, _, _, _) in all_units:
+        self.__object_paths: dict[str, str] = {}
+        all_units = acquire(
+            ["dbus", "ListUnits"], lambda: dbus_manager.manager.ListUnits()
+        )
+        for (
+            name,
+            _,
+            load_state,
+            active_state,
+            sub_state,
+            _,
+            object_path,
+            _,
+            _,
+            _,
+        ) in all_units:
             self.add_unit(
                 name=name,
                 active_state=active_state,
                 sub_state=sub_state,
                 load_state=load_state,
             )
+            self.__object_paths[name] = object_path
 
+    def __get_all(
+        self, name: str, deadline: float | None = None
+    ) -> dict[str, typing.Any]:
+        object_path = self.__object_paths.get(name)
+        try:
+            return acquire(
+                ["dbus", "GetAll", name],
+                lambda: dbus_manager.get_unit_properties(
+                    name, object_path, get_remaining_time(deadline)
+                ),
+            )
+        except CheckError:
+            raise
+        except Exception as e:
+            # For example a GLib.Error if a method call times out.
+            raise CheckError("D-Bus: {}".format(e))
 
-unit_cache: UnitCache = None
-"""An instance of :class:`DbusUnitCache` or :class:`CliUnitCache`"""
+    def fetch_properties(
+        self,
+        properties: typing.Sequence[str],
+        names: typing.Iterable[str] | None = None,
+        timeout: float | None = None,
+    ) -> list[Unit]:
+        """Fetch the properties with one ``GetAll`` call per unit and
+        interface. The object paths of ``ListUnits`` are used, so no
+        ``GetUnit`` calls are needed, and the calls for several units are
+        executed in parallel."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if names is None:
+            names = [unit.name for unit in self.list()]
+        units = [self.get(name) for name in names]
+        if len(units) > 1:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(DBUS_MAX_WORKERS, len(units))
+            ) as executor:
+                futures = [
+                    submit_in_context(executor, self.__get_all, unit.name, deadline)
+                    for unit in units
+                ]
+                all_values = [future.result() for future in futures]
+        else:
+            all_values = [self.__get_all(unit.name, deadline) for unit in units]
+        for unit, values in zip(units, all_values):
+            for name in properties:
+                if name in values:
+                    unit.properties[name] = values[name]
+        return units
 
 
-# scope: units ################################################################
+# Additional service managers #################################################
 
 
-class UnitsResource(Resource):
-    def probe(self) -> typing.Generator[Metric, None, None]:
-        counter = 0
-        for unit in unit_cache.list(include=opts.include, exclude=opts.exclude):
-            yield Metric(name=unit.name, value=unit, context="units")
-            counter += 1
+def acquire_unit_caches(
+    factories: dict[str, typing.Callable[[], UnitCache]], max_workers: int
+) -> dict[str, UnitCache | Exception]:
+    """Acquire the units of several service managers concurrently.
 
-        if counter == 0:
-            raise ValueError(
-                "Please verify your --include-* and --exclude-* "
-                "options. No units have been added for "
-                "testing."
-            )
+    :param factories: A dictionary of labels (for example ``user@1000``)
+      and callables that return a filled unit cache.
+    :param max_workers: The maximum number of service managers that are
+      queried at the same time.
 
+    :return: A dictionary of labels and unit caches. If the acquisition of
+      a service manager fails, the exception is stored instead of the unit
+      cache.
+    """
+    caches: dict[str, UnitCache | Exception] = {}
+    if not factories:
+        return caches
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(factories)))
+    ) as executor:
+        futures = {
+            label: submit_in_context(executor, factory)
+            for label, factory in factories.items()
+        }
+        for label, future in futures.items():
+            try:
+                caches[label] = future.result()
+            except Exception as e:
+                caches[label] = e
+    return caches
+
+
+def get_user_managers(unit_cache: UnitCache) -> dict[str, str]:
+    """Discover the running user service managers (``user@UID.service``).
+
+    :param unit_cache: The unit cache of the system service manager.
+
+    :return: A dictionary of labels (for example ``user@1000``) and the
+      corresponding ``--machine`` arguments (for example ``alice@``).
+    """
+    managers: dict[str, str] = {}
+    for unit in unit_cache.list(include=r"user@\d+\.service$"):
+        if unit.active_state != "active":
+            continue
+        uid = unit.name[5:-8]
+        try:
+            user = pwd.getpwuid(int(uid)).pw_name
+        except KeyError:
+            user = uid
+        managers["user@{}".format(uid)] = "{}@".format(user)
+    return dict(sorted(managers.items()))
 
-class UnitsContext(Context):
-    def __init__(self):
-        super(UnitsContext, self).__init__("units")
 
-    def evaluate(self, metric: Metric, resource: Resource) -> Result:
-        """Determines state of a given metric.
+def get_user_manager_caches(
+    unit_cache: UnitCache, max_workers: int
+) -> dict[str, UnitCache | Exception]:
+    """Query all running user service managers concurrently.
 
-        :param metric: associated metric that is to be evaluated
-        :param resource: resource that produced the associated metric
-            (may optionally be consulted)
+    :param unit_cache: The unit cache of the system service manager.
+    :param max_workers: The maximum number of concurrent queries.
+    """
+    factories: dict[str, typing.Callable[[], UnitCache]] = {}
+    for label, machine in get_user_managers(unit_cache).items():
+        factories[label] = functools.partial(
+            CliUnitCache, with_user_units=True, machine=machine
+        )
+    return acquire_unit_caches(factories, max_workers)
 
-        :returns: :class:`~.result.Result`
-        """
-        if isinstance(metric.value, Unit):
-            unit = metric.value
-            exitcode = unit.convert_to_exitcode()
-            if exitcode != 0:
-                hint = "{}: {}".format(metric.name, unit.active_state)
-                return self.result_cls(exitcode, metric=metric, hint=hint)
 
-        if metric.value:
-            hint = "{}: {}".format(metric.name, metric.value)
-        else:
-            hint = metric.name
+def get_machines() -> list[str]:
+    """List the running local containers that are registered with
+    ``systemd-machined``. Virtual machines are skipped, because their
+    service managers can’t be reached with ``systemctl --machine``."""
+    machines: list[str] = []
+    stdout = execute_cli(["machinectl", "list", "--no-legend", "--no-pager"])
+    if stdout:
+        for line in stdout.splitlines():
+            columns = line.split()
+            if len(columns) >= 2 and columns[1] == "container":
+                machines.append(columns[0])
+    return machines
 
-        # The option -u is not specifed
-        if not metric.value:
-            return self.result_cls(Ok, metric=metric, hint=hint)
 
-        if opts.ignore_inactive_state and metric.value == "failed":
-            return self.result_cls(Critical, metric=metric, hint=hint)
-        elif not opts.ignore_inactive_state and metric.value != "active":
-            return self.result_cls(Critical, metric=metric, hint=hint)
-        else:
-            return self.result_cls(Ok, metric=metric, hint=hint)
+def get_machine_caches(
+    machines: typing.Sequence[str], max_workers: int
+) -> dict[str, UnitCache | Exception]:
+    """Query the service managers of several containers concurrently.
 
+    :param machines: The names of the containers, for example
+      ``('web1', 'web2')``.
+    :param max_workers: The maximum number of concurrent queries.
+    """
+    factories: dict[str, typing.Callable[[], UnitCache]] = {}
+    for machine in machines:
+        factories[machine] = functools.partial(CliUnitCache, machine=machine)
+    return acquire_unit_caches(factories, max_workers)
 
-# scope: timers ###############################################################
 
+# Dependencies ################################################################
 
-class TimersResource(Resource):
-    """
-    Resource that calls ``systemctl list-timers --all`` on the command line to
-    get informations about dead / inactive timers. There is one type of systemd
-    “degradation” which is normally not detected: dead / inactive timers.
 
-    :param list excludes: A list of systemd unit names to exclude from the
-      checks.
-    """
+DEPENDENCY_PROPERTIES: typing.Tuple[str, ...] = (
+    "Requires",
+    "Requisite",
+    "BindsTo",
+    "After",
+)
+"""The properties that are fetched to build the dependency graph of the
+units with a problem."""
 
-    def __init__(self):
-        super().__init__()
+PROBLEM_STATES: typing.Tuple[str, ...] = ("failed", "activating")
+"""The active states of the units that can be the root cause of failed
+dependents."""
 
-    name = "SYSTEMD"
 
-    def probe(self) -> typing.Generator[Metric, None, None]:
-        """
-        :return: generator that emits
-          :class:`~nagiosplugin.metric.Metric` objects
-        """
-        stdout = execute_cli(["systemctl", "list-timers", "--all"])
+def get_causal_dependencies(
+    properties: dict[str, typing.Any], candidates: typing.Container[str]
+) -> list[str]:
+    """The dependencies of a unit whose failure causes the unit to fail:
+    The job of a unit fails with the result ``dependency`` if a unit that
+    is listed in ``Requires=``, ``Requisite=`` or ``BindsTo=`` and ordered
+    before it (``After=``) fails.
 
-        # NEXT                          LEFT
-        # Sat 2020-05-16 15:11:15 CEST  34min left
+    :param properties: The properties of the unit (see
+      :data:`DEPENDENCY_PROPERTIES`).
+    :param candidates: The names of the units that can be a cause.
+    """
+    after = set(properties.get("After") or ())
+    return sorted(
+        name
+        for key in ("Requires", "Requisite", "BindsTo")
+        for name in properties.get(key) or ()
+        if name in after and name in candidates
+    )
 
-        # LAST                          PASSED
-        # Sat 2020-05-16 14:31:56 CEST  4min 20s ago
 
-        # UNIT             ACTIVATES
-        # apt-daily.timer  apt-daily.service
-        if stdout:
-            table_parser = TableParser(stdout)
-            table_parser.check_header(("unit", "next", "passed"))
-            state = Ok
+def find_root_causes(dependencies: dict[str, typing.Sequence[str]]) -> dict[str, str]:
+    """Follow the dependencies of the units with a problem to their root
+    causes. Each unit is visited once, so the run time is linear in the
+    number of units and dependencies. If a unit has several causes, the
+    first one is followed. A cycle is attributed to the unit at which it
+    was entered.
 
-            for row in table_parser.list_rows():
-                unit = row["unit"]
-                if match_multiple(unit, opts.exclude):
-                    continue
+    :param dependencies: The units with a problem and their dependencies
+      that also have a problem (see :func:`get_causal_dependencies`).
 
-                if row["next"] == "n/a":
+    :return: The dependent units and their root causes. Root causes are
+      not included as keys.
+    """
+    roots: dict[str, str] = {}
+    for start in sorted(dependencies):
+        path: list[str] = []
+        on_path: set[str] = set()
+        name = start
+        while name not in roots and name not in on_path:
+            path.append(name)
+            on_path.add(name)
+            causes = dependencies.get(name)
+            if not causes:
+                roots[name] = name
+                break
+            name = causes[0]
+        root = roots.get(name, name)
+        for name in path:
+            roots[name] = root
+    return {name: root for name, root in roots.items() if name != root}
 
-                    if row["passed"] == "n/a":
-                        state = Critical
-                    else:
-                        passed = format_timespan_to_seconds(row["passed"])
 
-                        if row["passed"] == "n/a" or passed >= opts.timers_critical:
-                            state = Critical
-                        elif passed >= opts.timers_warning:
-                            state = Warn
+# Failure details #############################################################
 
-                yield Metric(name=unit, value=state, context="timers")
 
+FAILURE_PROPERTIES: typing.Tuple[str, ...] = (
+    "Result",
+    "ExecMainCode",
+    "ExecMainStatus",
+)
+"""The properties that explain why a unit failed."""
 
-class TimersContext(Context):
-    def __init__(self):
-        super(TimersContext, self).__init__("timers")
+EXEC_MAIN_CODES: dict[int, str] = {1: "status", 2: "signal", 3: "signal"}
+"""The values of ``ExecMainCode`` (``CLD_EXITED``, ``CLD_KILLED``,
+``CLD_DUMPED``) and the meaning of ``ExecMainStatus``."""
 
-    def evaluate(self, metric: Metric, resource: Resource):
-        """Determines state of a given metric.
 
-        :param metric: associated metric that is to be evaluated
-        :param resource: resource that produced the associated metric
-            (may optionally be consulted)
+class FailureDetails:
+    """Why a unit failed: the values of :data:`FAILURE_PROPERTIES` and the
+    last lines of its journal.
 
-        :returns: :class:`~.result.Result`
-        """
-        return self.result_cls(metric.value, metric=metric, hint=metric.name)
+    :param properties: The properties of the unit.
+    """
 
+    result: str | None
+    """The result of the unit, for example ``exit-code`` or ``timeout``."""
 
-# scope: startup_time #########################################################
+    exec_main_code: int | None
 
+    exec_main_status: int | None
 
-class StartupTimeResource(Resource):
-    """Resource that calls ``systemd-analyze`` on the command line to get
-    informations about the startup time."""
+    journal: list[str]
+    """The last messages of the unit, the oldest one first."""
 
-    def probe(self) -> typing.Generator[Metric, None, None]:
-        """Query system state and return metrics.
+    def __init__(self, properties: dict[str, typing.Any]):
+        self.result = properties.get("Result")
+        self.exec_main_code = properties.get("ExecMainCode")
+        self.exec_main_status = properties.get("ExecMainStatus")
+        self.journal = []
 
-        :return: generator that emits
-          :class:`~nagiosplugin.metric.Metric` objects
-        """
-        stdout = None
-        try:
-            stdout = execute_cli(["systemd-analyze"])
-        except CheckError:
+    @property
+    def reason(self) -> str:
+        """A short explanation, for example ``exit-code, status=1`` or
+        ``signal, signal=9``."""
+        parts: list[str] = []
+        if self.result and self.result != "success":
+            parts.append(self.result)
+        if self.exec_main_code in EXEC_MAIN_CODES and (
+            self.exec_main_code != 1 or self.exec_main_status
+        ):
+            parts.append(
+                "{}={}".format(
+                    EXEC_MAIN_CODES[self.exec_main_code], self.exec_main_status
+                )
+            )
+        return ", ".join(parts)
+
+
+def parse_journal_json(
+    stdout: str, names: typing.Container[str], lines: int
+) -> dict[str, list[str]]:
+    """Parse the output of ``journalctl --output=json`` and keep the last
+    messages of each unit.
+
+    :param stdout: One JSON object per line.
+    :param names: The names of the units.
+    :param lines: The number of messages to keep per unit.
+    """
+    journal: dict[str, collections.deque[str]] = {}
+    for line in stdout.splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        name = entry.get("UNIT") or entry.get("_SYSTEMD_UNIT")
+        message = entry.get("MESSAGE")
+        if name not in names or not isinstance(message, str):
+            continue
+        journal.setdefault(name, collections.deque(maxlen=lines)).append(message)
+    return {name: list(messages) for name, messages in journal.items()}
+
+
+def fetch_failure_details(session: CheckSession) -> dict[str, FailureDetails]:
+    """Fetch the failure details of the failed units selected by the
+    options, at most ``--failure-details-max`` units. The properties are
+    fetched in one batch, the journal lines with one ``journalctl`` call
+    for all units. Both share the time budget of the option
+    ``--failure-details-timeout``: Commands that exceed it are killed. If
+    fetching the properties fails or takes too long, no details are
+    reported; if the budget is used up before the journal is read, the journal is
+    skipped.
+
+    :param session: The session of the check.
+    """
+    opts = session.opts
+    deadline = time.monotonic() + opts.failure_details_timeout
+    names = sorted(
+        unit.name
+        for unit in session.list_units(exclude=session.units_exclude)
+        if unit.active_state == "failed"
+    )[: opts.failure_details_max]
+    if not names:
+        return {}
+    try:
+        units = session.unit_cache.fetch_properties(
+            FAILURE_PROPERTIES, names, timeout=opts.failure_details_timeout
+        )
+    except CheckError:
+        return {}
+    details = {unit.name: FailureDetails(unit.properties) for unit in units}
+    remaining = deadline - time.monotonic()
+    if opts.journal_lines and remaining > 0:
+        command = ["journalctl", "--no-pager", "--quiet", "--boot", "--output=json"]
+        # --lines limits the entries of all units together. The margin keeps
+        # a chatty unit from displacing the messages of the other units.
+        command.append("--lines={}".format(opts.journal_lines * len(names) * 10))
+        for name in names:
+            command.append("--unit={}".format(name))
+        try:
+            stdout = execute_cli(command, timeout=remaining)
+        except CheckError:
+            stdout = None
+        for name, messages in parse_journal_json(
+            stdout or "", details, opts.journal_lines
+        ).items():
+            details[name].journal = messages
+    return details
+
+
+# Check session ###############################################################
+
+
+class CheckSession:
+    """Everything a single run of the check depends on: the command line
+    options, the data source and the unit cache. The session is passed to
+    the resources, contexts and the summary, so several checks with
+    different options can run concurrently in one Python process.
+
+    :param opts: The normalized command line options (see
+      :func:`normalize_argparser`).
+    :param unit_cache: An already filled unit cache. If not specified, the
+      unit cache is filled on first access using the data source of the
+      options.
+    """
+
+    opts: OptionContainer
+    """The result of `parse_args()
+    <https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.parse_args>`_
+    normalized by :func:`normalize_argparser`."""
+
+    capabilities: dict[str, typing.Any]
+    """The result of :func:`probe_capabilities` (only with
+    ``--data-source auto``)."""
+
+    def __init__(
+        self,
+        opts: OptionContainer | argparse.Namespace,
+        unit_cache: UnitCache | None = None,
+    ):
+        self.opts = typing.cast(OptionContainer, opts)
+        self.__unit_cache = unit_cache
+        self.__data_source: str | None = None
+        self.__root_causes: dict[str, str] | None = None
+        self.__failure_details: dict[str, FailureDetails] | None = None
+        self.capabilities = {}
+
+    @property
+    def data_source(self) -> str:
+        """The data source that is used: ``dbus`` or ``cli``. With
+        ``--data-source auto`` the capabilities of the host are probed once
+        per boot and the cheapest working data source is selected."""
+        if self.__data_source is None:
+            if self.opts.data_source == "auto":
+                capabilities = self.cache_per_boot("capabilities", probe_capabilities)
+                if not isinstance(capabilities, dict):
+                    capabilities = probe_capabilities()
+                self.capabilities = capabilities
+                self.__data_source = select_data_source(
+                    capabilities, self.opts.with_user_units, self.fetches_properties
+                )
+            else:
+                self.__data_source = self.opts.data_source
+        return self.__data_source
+
+    @property
+    def fetches_properties(self) -> bool:
+        """True if an enabled feature fetches additional unit properties
+        with :meth:`UnitCache.fetch_properties`: the scopes ``restarts``
+        and ``transitions``, the failure details and the suppression of
+        dependent failures."""
+        opts = self.opts
+        return bool(
+            opts.scope_restarts
+            or opts.scope_transitions
+            or opts.failure_details
+            or opts.suppress_dependents
+        )
+
+    @property
+    def unit_cache(self) -> UnitCache:
+        """An instance of :class:`DbusUnitCache` or :class:`CliUnitCache`"""
+        if self.__unit_cache is None:
+            if self.data_source == "dbus":
+                self.__unit_cache = DbusUnitCache()
+            else:
+                self.__unit_cache = CliUnitCache(
+                    with_user_units=self.opts.with_user_units,
+                    json_output=bool(self.capabilities.get("json")),
+                    patterns=self.list_units_patterns,
+                )
+        return self.__unit_cache
+
+    @property
+    def list_units_patterns(self) -> list[str] | None:
+        """Shell-style patterns that ``systemctl list-units`` can use to
+        list only the units selected by the options ``--include*``, so
+        that the other units are not transferred and parsed at all.
+
+        ``None`` is returned if a regular expression can not be converted
+        (see :func:`convert_regexp_to_globs`) or if an enabled feature
+        needs the units that are not selected: the performance data
+        ``count_units`` and ``units_*``, unit groups, the user service
+        managers, the unit files, the state history, the dependencies
+        and the OpenMetrics export. ``--exclude*`` and ``--required`` are
+        always evaluated in Python, because units in an unexpected state
+        have to be reported.
+        """
+        opts = self.opts
+        if not opts.include or (
+            opts.performance_data
+            or opts.groups
+            or opts.user_managers
+            or opts.scope_unit_files
+            or opts.scope_flapping
+            or opts.suppress_dependents
+            or opts.openmetrics_file
+        ):
+            return None
+        patterns: list[str] = []
+        for regexp in opts.include:
+            globs = convert_regexp_to_globs(regexp)
+            if globs is None:
+                return None
+            patterns += globs
+        return patterns
+
+    @property
+    def units_exclude(self) -> set[str]:
+        """The regular expressions of the units that are not evaluated
+        individually: the excluded units and the members of unit groups
+        (options ``--group`` and ``--group-type``)."""
+        return set(self.opts.exclude) | {regexp for _, regexp in self.opts.groups}
+
+    def list_units(self, exclude: typing.Iterable[str] | None = None):
+        """List the units selected by the options ``--include*`` and
+        ``--exclude*``.
+
+        :param exclude: Regular expressions that replace the ones of the
+          options ``--exclude*``.
+        """
+        return self.unit_cache.list(
+            include=self.opts.include,
+            exclude=self.opts.exclude if exclude is None else exclude,
+        )
+
+    @property
+    def root_causes(self) -> dict[str, str]:
+        """The failed or activating units that are dependents of another
+        failed or activating unit and their root causes (see
+        :func:`find_root_causes`). The dependencies are fetched in one
+        batch on first access, only for the units with a problem."""
+        if self.__root_causes is None:
+            names = [
+                unit.name
+                for unit in self.unit_cache.list()
+                if unit.active_state in PROBLEM_STATES
+            ]
+            dependencies: dict[str, list[str]] = {}
+            if len(names) > 1:
+                candidates = set(names)
+                for unit in self.unit_cache.fetch_properties(
+                    DEPENDENCY_PROPERTIES, names
+                ):
+                    dependencies[unit.name] = get_causal_dependencies(
+                        unit.properties, candidates - {unit.name}
+                    )
+            self.__root_causes = find_root_causes(dependencies)
+        return self.__root_causes
+
+    @property
+    def failure_details(self) -> dict[str, FailureDetails]:
+        """The names of the failed units and the details of their failures
+        (see :func:`fetch_failure_details`). The details are fetched on
+        first access."""
+        if self.__failure_details is None:
+            self.__failure_details = fetch_failure_details(self)
+        return self.__failure_details
+
+    def format_perfdata_label(self, name: str) -> str:
+        """Format a label of the performance data of a unit using the
+        template of the option ``--perfdata-label-template``.
+
+        :param name: The name of a unit, for example ``nginx.service``.
+        """
+        stem, _, unit_type = name.rpartition(".")
+        return self.opts.perfdata_label_template.format(
+            name=name, stem=stem, type=unit_type
+        )
+
+    @property
+    def state_dir(self) -> str:
+        """The directory in which the plugin stores data between two runs.
+        It can be changed with the option ``--state-dir``."""
+        if self.opts.state_dir:
+            return self.opts.state_dir
+        return os.path.join("/var/tmp", "check_systemd-{}".format(os.getuid()))
+
+    def read_state(self, name: str) -> typing.Any:
+        """Read data that was stored by a previous run.
+
+        :param name: The name of the state, for example ``snapshot``.
+
+        :return: The deserialized JSON data or ``None`` if there is no
+          (valid) state.
+        """
+
+        def read() -> typing.Any:
+            try:
+                with open(os.path.join(self.state_dir, name + ".json")) as state_file:
+                    return json.load(state_file)
+            except (OSError, ValueError):
+                return None
+
+        # The state is part of a recording: A replay must not use the state
+        # of the local host.
+        return acquire(["state", name], read)
+
+    @contextlib.contextmanager
+    def acquisition(self) -> typing.Iterator[None]:
+        """Record or replay all acquisitions inside the ``with`` block
+        (options ``--record`` and ``--replay``)."""
+        tape: AcquisitionTape | None = None
+        if self.opts.replay:
+            tape = AcquisitionReplay(self.opts.replay)
+        elif self.opts.record:
+            tape = AcquisitionRecorder(self.opts.record)
+        if tape is None:
+            yield
+            return
+        with tape:
+            yield
+
+    def write_state(self, name: str, data: typing.Any) -> None:
+        """Store data for the next run. Nothing is stored while a recording
+        is replayed.
+
+        :param name: The name of the state, for example ``snapshot``.
+        :param data: Data that can be serialized as JSON.
+        """
+        if is_replaying():
+            return
+        write_file_atomically(
+            os.path.join(self.state_dir, name + ".json"),
+            json.dumps(data, separators=(",", ":")),
+        )
+
+    def read_boot_state(self, name: str) -> typing.Any:
+        """Read data that was stored during the current boot by
+        :meth:`write_boot_state`.
+
+        :param name: The name of the state, for example ``capabilities``.
+
+        :return: The data or ``None`` if the data was stored during a
+          previous boot.
+        """
+        boot_id = get_boot_id()
+        state = self.read_state(name)
+        if boot_id and isinstance(state, dict) and state.get("boot_id") == boot_id:
+            return state.get("data")
+        return None
+
+    def cache_per_boot(
+        self, name: str, fetch: typing.Callable[[], typing.Any]
+    ) -> typing.Any:
+        """Get a value that does not change until the next boot, for
+        example the startup time. The value is fetched on first use and
+        read from the state directory during the rest of the boot.
+
+        Empty values (``None``, an empty list …) are not stored, so a value
+        that is not available yet, for example the startup time of an
+        unfinished boot, is fetched again on the next run. The cache is not
+        used while acquisitions are recorded or replayed, because a
+        recording has to contain all commands.
+
+        :param name: The name of the state, for example ``startup-time``.
+        :param fetch: A callable that returns data that can be serialized
+          as JSON.
+        """
+        use_cache = active_tape.get() is None
+        if use_cache:
+            cached = self.read_boot_state(name)
+            if cached is not None:
+                return cached
+        value = fetch()
+        if use_cache and value:
+            self.write_boot_state(name, value)
+        return value
+
+    def write_boot_state(self, name: str, data: typing.Any) -> None:
+        """Store data that is valid until the next boot. Nothing is stored
+        if the boot ID is unknown or if the state directory is not
+        writable.
+
+        :param name: The name of the state, for example ``capabilities``.
+        :param data: Data that can be serialized as JSON.
+        """
+        boot_id = get_boot_id()
+        if not boot_id:
+            return
+        try:
+            self.write_state(name, {"boot_id": boot_id, "data": data})
+        except OSError:
             pass
 
+
+# Persistent state ############################################################
+
+
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+"""A file that contains a random ID that is generated on each boot."""
+
+
+def get_boot_id() -> str | None:
+    """Read the ID of the current boot (see :data:`BOOT_ID_PATH`). The ID
+    is recorded and replayed like the state of previous runs."""
+
+    def read() -> str | None:
+        try:
+            with open(BOOT_ID_PATH) as boot_id:
+                return boot_id.read().strip() or None
+        except OSError:
+            return None
+
+    return acquire(["boot_id"], read)
+
+
+def write_file_atomically(path: str, content: str | bytes) -> None:
+    """Write a file in a way that readers never see a partially written
+    file: The content is written into a temporary file in the same
+    directory, which is then renamed.
+
+    :param path: The path of the file.
+    :param content: The content of the file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(
+        directory, ".{}.{}.tmp".format(os.path.basename(path), os.getpid())
+    )
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(tmp_path, mode) as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, path)
+
+
+class UnitSnapshot:
+    """A compact digest of the states (load, active and sub state) of the
+    selected units. One CRC32 checksum is stored per unit. The snapshot of
+    the previous run is read from the state directory to determine the
+    units whose state changed since then.
+
+    The exit code of a unit depends only on its states and the command line
+    options. The state file is therefore specific to the options and only
+    the changed units and the units that had a problem in the previous run
+    need to be evaluated again.
+
+    :param session: The session of the check.
+    :param units: The selected units.
+    """
+
+    units: dict[str, int]
+    """The unit names and the checksums of their states."""
+
+    digest: str
+    """A digest of the whole snapshot."""
+
+    changed: set[str]
+    """The names of the units that have been added, removed or whose state
+    changed since the previous run. All units are considered as changed
+    on the first run."""
+
+    problems: set[str]
+    """The names of the units that had a problem in the previous run."""
+
+    def __init__(self, session: CheckSession, units: typing.Iterable[Unit]):
+        self.session = session
+        self.units = {}
+        for unit in units:
+            self.units[unit.name] = zlib.crc32(
+                "{} {} {}".format(
+                    unit.load_state, unit.active_state, unit.sub_state
+                ).encode()
+            )
+        self.digest = hashlib.blake2b(
+            json.dumps(self.units, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+
+        previous = session.read_state(self.state_name) or {}
+        self.problems = set(previous.get("problems", ()))
+        previous_units: dict[str, int] | None = previous.get("units")
+        if previous_units is None:
+            self.changed = set(self.units)
+        elif previous.get("digest") == self.digest:
+            self.changed = set()
+        else:
+            self.changed = {
+                name
+                for name, checksum in self.units.items()
+                if previous_units.get(name) != checksum
+            }
+            self.changed.update(
+                name for name in previous_units if name not in self.units
+            )
+
+    @property
+    def state_name(self) -> str:
+        """The name of the state file. It contains a checksum of all
+        options that influence the evaluation of the units."""
+        opts = self.session.opts
+        options = repr(
+            (
+                sorted(opts.include),
+                sorted(opts.exclude),
+                opts.required,
+                self.session.data_source,
+                opts.with_user_units,
+            )
+        )
+        return "snapshot-{:08x}".format(zlib.crc32(options.encode()))
+
+    @property
+    def to_evaluate(self) -> list[str]:
+        """The names of the units that need to be evaluated: changed units
+        and units that had a problem in the previous run."""
+        return sorted((self.changed | self.problems) & self.units.keys())
+
+    def save(self, problems: typing.Iterable[str]) -> None:
+        """Store the snapshot for the next run.
+
+        :param problems: The names of the units that currently have a
+          problem.
+        """
+        self.session.write_state(
+            self.state_name,
+            {"digest": self.digest, "units": self.units, "problems": list(problems)},
+        )
+
+
+# State history ###############################################################
+
+
+HISTORY_MAGIC = b"CSHIST1\0"
+"""The first bytes of a state history file."""
+
+HISTORY_HEADER = struct.Struct("<8s16sIIIII")
+"""The header of a state history file: magic, boot ID (16 bytes),
+capacity (number of rows), width (bytes per row), index of the next row,
+number of filled rows and size of the name table."""
+
+HISTORY_CAPACITY = 64
+"""The number of runs that are kept in a state history file."""
+
+STATE_CODES: typing.Tuple[str, ...] = (
+    "active",
+    "reloading",
+    "inactive",
+    "failed",
+    "activating",
+    "deactivating",
+    "maintenance",
+)
+"""The active states that are encoded as one byte (index + 1). ``0`` means
+that the unit did not exist, ``255`` that the state is unknown."""
+
+
+def encode_state(active_state: str) -> int:
+    """Encode an active state as one byte (see :data:`STATE_CODES`)."""
+    try:
+        return STATE_CODES.index(active_state) + 1
+    except ValueError:
+        return 255
+
+
+class StateHistory:
+    """A fixed-size ring buffer of the active states of all units, one row
+    per run and one byte per unit. The unit names are interned: Each name
+    is stored once in a name table and its index is the column of the unit
+    in the rows. The file is memory-mapped, so appending a run writes one
+    row and the header in place, and new units only add their names to the
+    name table at the end of the file. If a row has no free column left,
+    the columns of the units that do not appear in any kept row (for
+    example ``run-*.scope`` units that are gone) are dropped and the file
+    is rewritten, with more columns only if still necessary. So the size of
+    the file depends on the units of the recent runs and not on all units
+    that ever existed. The history is reset if the boot ID changes.
+
+    Use the class as a context manager. The file is locked while it is
+    open.
+
+    :param path: The path of the history file.
+    :param boot_id: The ID of the current boot (see :func:`get_boot_id`).
+    :param capacity: The number of runs that are kept.
+    :param data: The content of a history file, for example from a
+      recording. The file at ``path`` is neither read nor written, the
+      new rows are only kept in memory.
+    """
+
+    names: list[str]
+    """The interned unit names. The index of a name is its column."""
+
+    rows: list[bytes]
+    """The states of the units per run, the oldest run first."""
+
+    def __init__(
+        self,
+        path: str,
+        boot_id: str | None,
+        capacity: int = HISTORY_CAPACITY,
+        data: bytes | None = None,
+    ):
+        self.path = path
+        try:
+            self.boot_id = bytes.fromhex((boot_id or "").replace("-", ""))[:16]
+        except ValueError:
+            self.boot_id = b""
+        self.boot_id = self.boot_id.ljust(16, b"\0")
+        self.capacity = capacity
+        self.data = data
+        self.names = []
+        self.rows = []
+        self.__index: dict[str, int] = {}
+        self.__width = 0
+        self.__head = 0
+        self.__fd: int | None = None
+        self.__mmap: mmap.mmap | None = None
+
+    def __enter__(self) -> StateHistory:
+        if self.data is not None:
+            if len(self.data) >= HISTORY_HEADER.size:
+                self.__load(self.data)
+            return self
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.__fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        if os.fstat(self.__fd).st_size >= HISTORY_HEADER.size:
+            self.__mmap = mmap.mmap(self.__fd, 0)
+            self.__load(self.__mmap)
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    def __load(self, data: mmap.mmap | bytes) -> None:
+        (
+            magic,
+            boot_id,
+            capacity,
+            width,
+            head,
+            count,
+            names_size,
+        ) = HISTORY_HEADER.unpack_from(data)
+        names_offset = HISTORY_HEADER.size + capacity * width
+        if (
+            magic != HISTORY_MAGIC
+            or boot_id != self.boot_id
+            or capacity != self.capacity
+            or len(data) < names_offset + names_size
+        ):
+            return
+        names = data[names_offset : names_offset + names_size].decode()
+        self.names = names.split("\n") if names else []
+        self.__index = {name: index for index, name in enumerate(self.names)}
+        self.__width = width
+        self.__head = head
+        for i in range(count):
+            offset = HISTORY_HEADER.size + (head - count + i) % capacity * width
+            self.rows.append(data[offset : offset + width])
+
+    def __header(self) -> bytes:
+        return HISTORY_HEADER.pack(
+            HISTORY_MAGIC,
+            self.boot_id,
+            self.capacity,
+            self.__width,
+            self.__head,
+            len(self.rows),
+            len(self.__names_table()),
+        )
+
+    def __names_table(self) -> bytes:
+        return "\n".join(self.names).encode()
+
+    def record(self, units: typing.Iterable[Unit]) -> bytes:
+        """Append the states of the units as a new row.
+
+        :param units: All units of the service manager.
+
+        :return: The new row.
+        """
+        codes: dict[int, int] = {}
+        new_names = False
+        for unit in units:
+            index = self.__index.get(unit.name)
+            if index is None:
+                index = self.__index[unit.name] = len(self.names)
+                self.names.append(unit.name)
+                new_names = True
+            codes[index] = encode_state(unit.active_state)
+
+        rewrite = self.__mmap is None
+        if len(self.names) > self.__width:
+            codes = self.__prune(codes)
+            rewrite = True
+        if len(self.names) > self.__width:
+            # Reserve free columns for units that appear later.
+            self.__width = max(64, len(self.names) * 2)
+            self.rows = [row.ljust(self.__width, b"\0") for row in self.rows]
+        row = bytearray(self.__width)
+        for index, code in codes.items():
+            row[index] = code
+        self.rows = (self.rows + [bytes(row)])[-self.capacity :]
+        slot = self.__head
+        self.__head = (self.__head + 1) % self.capacity
+
+        if self.data is not None:
+            return bytes(row)
+        if rewrite:
+            self.__rewrite()
+            return bytes(row)
+        if new_names:
+            self.__write_names_table()
+        assert self.__mmap is not None
+        offset = HISTORY_HEADER.size + slot * self.__width
+        self.__mmap[offset : offset + self.__width] = row
+        self.__mmap[: HISTORY_HEADER.size] = self.__header()
+        self.__mmap.flush()
+        return bytes(row)
+
+    def __prune(self, codes: dict[int, int]) -> dict[int, int]:
+        """Drop the columns of the units that neither appear in the rows
+        that are kept after appending a new row nor in the new row itself
+        (``codes``).
+
+        :return: The codes of the new row with the new columns.
+        """
+        kept = self.rows[-(self.capacity - 1) :] if self.capacity > 1 else []
+        used = set(codes)
+        for row in kept:
+            used.update(index for index, code in enumerate(row) if code)
+        columns = sorted(used)
+        self.names = [self.names[index] for index in columns]
+        self.__index = {name: index for index, name in enumerate(self.names)}
+        self.rows = [
+            bytes(row[index] if index < len(row) else 0 for index in columns).ljust(
+                self.__width, b"\0"
+            )
+            for row in kept
+        ]
+        mapping = {old: new for new, old in enumerate(columns)}
+        return {mapping[index]: code for index, code in codes.items()}
+
+    def __write_names_table(self) -> None:
+        """Replace the name table at the end of the file. The rows stay in
+        place."""
+        assert self.__fd is not None and self.__mmap is not None
+        names_offset = HISTORY_HEADER.size + self.capacity * self.__width
+        names_table = self.__names_table()
+        self.__mmap.close()
+        self.__mmap = None
+        os.ftruncate(self.__fd, names_offset + len(names_table))
+        os.pwrite(self.__fd, names_table, names_offset)
+        self.__mmap = mmap.mmap(self.__fd, 0)
+
+    def __rewrite(self) -> None:
+        """Write the whole file. The rows are stored in ring order again, so
+        that the next run can append in place."""
+        assert self.__fd is not None
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+        body = bytearray(self.capacity * self.__width)
+        count = len(self.rows)
+        for i, row in enumerate(self.rows):
+            slot = (self.__head - count + i) % self.capacity
+            body[slot * self.__width : (slot + 1) * self.__width] = row
+        content = self.__header() + bytes(body) + self.__names_table()
+        os.ftruncate(self.__fd, len(content))
+        os.pwrite(self.__fd, content, 0)
+        self.__mmap = mmap.mmap(self.__fd, 0)
+
+
+def count_state_changes(rows: typing.Sequence[bytes], window: int) -> dict[int, int]:
+    """Count the state changes per unit in the most recent rows of a
+    :class:`StateHistory` in a single pass. Identical consecutive rows are
+    skipped with one comparison. Appearing and disappearing units are not
+    counted as state changes.
+
+    :param rows: The rows of the history, the oldest run first.
+    :param window: The number of recent rows to examine.
+
+    :return: The columns of the units and their numbers of state changes.
+      Units without a state change are omitted.
+    """
+    changes: dict[int, int] = {}
+    previous: bytes | None = None
+    for row in rows[-window:]:
+        if previous is not None and row != previous:
+            for index, (before, after) in enumerate(zip(previous, row)):
+                if before != after and before and after:
+                    changes[index] = changes.get(index, 0) + 1
+        previous = row
+    return changes
+
+
+# scope: units ################################################################
+
+
+class UnitsResource(Resource):
+    """
+    :param session: The session of the check.
+    :param snapshot: If a snapshot is specified, only the units whose state
+      changed since the previous run and the units that had a problem are
+      evaluated.
+    :param compact: Classify the units in one pass and emit metrics only
+      for units with a problem. The healthy units are folded into one
+      metric (context ``units_healthy``).
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        snapshot: UnitSnapshot | None = None,
+        compact: bool = False,
+    ):
+        super().__init__()
+        self.session = session
+        self.snapshot = snapshot
+        self.compact = compact
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        healthy = 0
+        if self.snapshot:
+            if not self.snapshot.units:
+                self.__verify_selection()
+            names = self.snapshot.to_evaluate
+            # Unchanged units without a problem in the previous run
+            healthy = len(self.snapshot.units) - len(names)
+            units: typing.Iterable[Unit] = (
+                self.session.unit_cache.get(name) for name in names
+            )
+        else:
+            units = self.session.list_units(exclude=self.session.units_exclude)
+
+        counter = 0
+        problems: list[str] = []
+        for unit in units:
+            counter += 1
+            if self.compact or self.snapshot:
+                if unit.convert_to_exitcode(self.session.opts.required) != Ok:
+                    problems.append(unit.name)
+                elif self.compact:
+                    healthy += 1
+                    continue
+            yield Metric(name=unit.name, value=unit, context="units")
+
+        if self.snapshot:
+            self.snapshot.save(problems)
+        elif counter == 0:
+            self.__verify_selection()
+
+        if healthy:
+            yield Metric(name="units_healthy", value=healthy, context="units_healthy")
+
+    def __verify_selection(self) -> None:
+        """Raise an exception if no units are selected. Units that are
+        members of unit groups count as selected."""
+        if self.session.opts.groups and any(self.session.list_units()):
+            return
+        raise ValueError(
+            "Please verify your --include-* and --exclude-* "
+            "options. No units have been added for "
+            "testing."
+        )
+
+
+class ManagerUnitsResource(Resource):
+    """The units of an additional service manager, for example of a user
+    service manager or of a container. The names of the metrics are
+    prefixed with the label of the service manager
+    (``user@1000/dbus.service`` or ``web1/nginx.service``).
+
+    :param session: The session of the check.
+    :param label: The label of the service manager, for example
+      ``user@1000`` or ``web1``.
+    :param unit_cache: The unit cache of the service manager or the
+      exception that occurred during the acquisition.
+    """
+
+    def __init__(
+        self, session: CheckSession, label: str, unit_cache: UnitCache | Exception
+    ):
+        super().__init__()
+        self.session = session
+        self.label = label
+        self.unit_cache = unit_cache
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        if isinstance(self.unit_cache, Exception):
+            raise CheckError("{}: {}".format(self.label, self.unit_cache))
+        opts = self.session.opts
+        for unit in self.unit_cache.list(include=opts.include, exclude=opts.exclude):
+            yield Metric(
+                name="{}/{}".format(self.label, unit.name), value=unit, context="units"
+            )
+
+
+class UnitsContext(Context):
+    def __init__(self, session: CheckSession):
+        super(UnitsContext, self).__init__("units")
+        self.session = session
+
+    def evaluate(self, metric: Metric, resource: Resource) -> Result:
+        """Determines state of a given metric.
+
+        :param metric: associated metric that is to be evaluated
+        :param resource: resource that produced the associated metric
+            (may optionally be consulted)
+
+        :returns: :class:`~.result.Result`
+        """
+        if isinstance(metric.value, Unit):
+            unit = metric.value
+            exitcode = unit.convert_to_exitcode(self.session.opts.required)
+            if exitcode != 0:
+                hint = "{}: {}".format(metric.name, unit.active_state)
+                if self.session.opts.failure_details and unit.active_state == "failed":
+                    details = self.session.failure_details.get(metric.name)
+                    if details and details.reason:
+                        hint += " ({})".format(details.reason)
+                return self.result_cls(exitcode, metric=metric, hint=hint)
+
+        if metric.value:
+            hint = "{}: {}".format(metric.name, metric.value)
+        else:
+            hint = metric.name
+
+        # The option -u is not specifed
+        if not metric.value:
+            return self.result_cls(Ok, metric=metric, hint=hint)
+
+        ignore_inactive_state = self.session.opts.ignore_inactive_state
+        if ignore_inactive_state and metric.value == "failed":
+            return self.result_cls(Critical, metric=metric, hint=hint)
+        elif not ignore_inactive_state and metric.value != "active":
+            return self.result_cls(Critical, metric=metric, hint=hint)
+        else:
+            return self.result_cls(Ok, metric=metric, hint=hint)
+
+
+class UnitsHealthyContext(Context):
+    """Evaluates the number of healthy units that have been folded into one
+    metric by :class:`UnitsResource` (options ``--compact`` and
+    ``--changes-only``)."""
+
+    def __init__(self):
+        super(UnitsHealthyContext, self).__init__("units_healthy")
+
+    def evaluate(self, metric: Metric, resource: Resource) -> Result:
+        return self.result_cls(
+            Ok, metric=metric, hint="{} units ok".format(metric.value)
+        )
+
+
+# scope: unit_groups ##########################################################
+
+
+class UnitGroupsResource(Resource):
+    """Count the members of the unit groups (options ``--group`` and
+    ``--group-type``) and the members with a problem in one pass over the
+    selected units. A unit belongs to the first group whose regular
+    expression matches. One metric with the percentage of members with a
+    problem is emitted per group.
+
+    :param session: The session of the check.
+    """
+
+    counts: dict[str, typing.Tuple[int, int]]
+    """The number of members and the number of members with a problem per
+    group."""
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.counts = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        opts = self.session.opts
+        groups = [(name, re.compile(regexp)) for name, regexp in opts.groups]
+        members: typing.Counter[str] = collections.Counter()
+        problems: typing.Counter[str] = collections.Counter()
+        for unit in self.session.list_units():
+            for name, regexp in groups:
+                if regexp.match(unit.name):
+                    members[name] += 1
+                    if unit.convert_to_exitcode(opts.required) != Ok:
+                        problems[name] += 1
+                    break
+
+        for name, _ in opts.groups:
+            if name in self.counts:
+                continue
+            self.counts[name] = (members[name], problems[name])
+            percent = 0.0
+            if members[name]:
+                percent = round(problems[name] / members[name] * 100, 3)
+            yield Metric(
+                name=name, value=percent, uom="%", min=0, max=100, context="unit_groups"
+            )
+            if opts.performance_data:
+                yield Metric(
+                    name="{}_count".format(name),
+                    value=members[name],
+                    context="performance_data",
+                )
+                yield Metric(
+                    name="{}_failed".format(name),
+                    value=problems[name],
+                    context="performance_data",
+                )
+
+
+class UnitGroupsContext(ScalarContext):
+    """Evaluates the percentage of group members with a problem using the
+    thresholds of the options ``--group-warning`` and ``--group-critical``.
+    """
+
+    def __init__(self, session: CheckSession):
+        super(UnitGroupsContext, self).__init__(
+            "unit_groups",
+            warning=session.opts.group_warning,
+            critical=session.opts.group_critical,
+        )
+        self.session = session
+
+    def evaluate(self, metric: Metric, resource: Resource) -> Result:
+        count, failed = resource.counts[metric.name]
+        hint = "{}: {}/{} failed ({:g}%)".format(
+            metric.name, failed, count, metric.value
+        )
+        return Result(super().evaluate(metric, resource).state, hint, metric)
+
+    def describe(self, metric: Metric) -> None:
+        """The hint of the result is used as the description."""
+        return None
+
+    def performance(self, metric: Metric, resource: Resource):
+        if not self.session.opts.performance_data:
+            return None
+        return Performance(
+            "{}_failed_percent".format(metric.name),
+            metric.value,
+            metric.uom,
+            self.warning,
+            self.critical,
+            metric.min,
+            metric.max,
+        )
+
+
+# scope: unit_files ###########################################################
+
+
+UNIT_SEARCH_PATH: typing.Tuple[str, ...] = (
+    "/etc/systemd/system.control",
+    "/run/systemd/system.control",
+    "/run/systemd/transient",
+    "/run/systemd/generator.early",
+    "/etc/systemd/system",
+    "/etc/systemd/system.attached",
+    "/run/systemd/system",
+    "/run/systemd/system.attached",
+    "/run/systemd/generator",
+    "/usr/local/lib/systemd/system",
+    "/lib/systemd/system",
+    "/usr/lib/systemd/system",
+    "/run/systemd/generator.late",
+    "/etc/systemd/system-preset",
+    "/run/systemd/system-preset",
+    "/usr/local/lib/systemd/system-preset",
+    "/lib/systemd/system-preset",
+    "/usr/lib/systemd/system-preset",
+)
+"""The directories of the unit files and of the preset files of the system
+service manager (see ``systemd.unit(5)`` and ``systemd.preset(5)``).
+Enabling or disabling a unit creates or removes a symlink in one of these
+directories or in one of their subdirectories (for example
+``multi-user.target.wants``), which changes its modification time."""
+
+
+def get_user_unit_search_path() -> typing.Tuple[str, ...]:
+    """The directories of the unit files and of the preset files of the
+    user service manager of the current user (``systemctl --user``, see
+    ``systemd.unit(5)`` and ``systemd.preset(5)``)."""
+    config = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    data = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    runtime = os.environ.get("XDG_RUNTIME_DIR") or "/run/user/{}".format(os.getuid())
+    return (
+        config + "/systemd/user.control",
+        runtime + "/systemd/user.control",
+        runtime + "/systemd/transient",
+        runtime + "/systemd/generator.early",
+        config + "/systemd/user",
+        "/etc/xdg/systemd/user",
+        "/etc/systemd/user",
+        runtime + "/systemd/user",
+        "/run/systemd/user",
+        runtime + "/systemd/generator",
+        data + "/systemd/user",
+        "/usr/local/share/systemd/user",
+        "/usr/share/systemd/user",
+        "/usr/local/lib/systemd/user",
+        "/usr/lib/systemd/user",
+        runtime + "/systemd/generator.late",
+        "/etc/systemd/user-preset",
+        "/run/systemd/user-preset",
+        "/usr/local/lib/systemd/user-preset",
+        "/usr/lib/systemd/user-preset",
+    )
+
+
+def get_unit_paths_fingerprint(paths: typing.Iterable[str] | None = None) -> str:
+    """Compute a digest of the modification times of the unit directories
+    and of their direct subdirectories. Only the directories are examined,
+    not the unit files, which is much cheaper than listing the unit files.
+
+    :param paths: The unit directories. By default :data:`UNIT_SEARCH_PATH`.
+    """
+    mtimes: list[typing.Tuple[str, int]] = []
+    for path in UNIT_SEARCH_PATH if paths is None else paths:
+        try:
+            with os.scandir(path) as entries:
+                mtimes.append((path, os.stat(path).st_mtime_ns))
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        mtimes.append(
+                            (entry.path, entry.stat(follow_symlinks=False).st_mtime_ns)
+                        )
+        except OSError:
+            continue
+    return hashlib.blake2b(repr(sorted(mtimes)).encode(), digest_size=16).hexdigest()
+
+
+def parse_unit_files(stdout: str) -> dict[str, typing.Tuple[str, str | None]]:
+    """Parse the output of ``systemctl list-unit-files --no-legend``.
+
+    :param stdout: Rows like ``nginx.service enabled enabled``. The column
+      ``VENDOR PRESET`` is missing in older versions of systemd.
+
+    :return: The enablement state and the vendor preset (or ``None``) per
+      unit file.
+    """
+    unit_files: dict[str, typing.Tuple[str, str | None]] = {}
+    for line in stdout.splitlines():
+        columns = line.split()
+        if len(columns) < 2:
+            continue
+        preset = columns[2] if len(columns) > 2 and columns[2] != "-" else None
+        unit_files[columns[0]] = (columns[1], preset)
+    return unit_files
+
+
+def get_unit_files(session: CheckSession) -> dict[str, typing.Tuple[str, str | None]]:
+    """List the unit files of the system service manager or, with the
+    option ``--user``, of the user service manager. ``systemctl
+    list-unit-files`` reads every unit directory, so the result is cached
+    in the state directory and only renewed if the fingerprint of the unit
+    directories (:func:`get_unit_paths_fingerprint`) changed.
+
+    :param session: The session of the check.
+
+    :return: See :func:`parse_unit_files`.
+    """
+    command = ["systemctl", "list-unit-files", "--no-legend"]
+    state_name = "unit-files"
+    if session.opts.with_user_units:
+        command.append("--user")
+        state_name = "unit-files-user"
+        fingerprint = get_unit_paths_fingerprint(get_user_unit_search_path())
+    else:
+        fingerprint = get_unit_paths_fingerprint()
+    # A recording has to contain the listing and a replay must not use the
+    # listing of the local host.
+    use_cache = active_tape.get() is None
+    cached = session.read_state(state_name) if use_cache else None
+    if isinstance(cached, dict) and cached.get("fingerprint") == fingerprint:
+        return {
+            name: (state, preset)
+            for name, (state, preset) in cached["unit_files"].items()
+        }
+
+    stdout = execute_cli(command)
+    unit_files = parse_unit_files(stdout or "")
+    if not use_cache:
+        return unit_files
+    try:
+        session.write_state(
+            state_name, {"fingerprint": fingerprint, "unit_files": unit_files}
+        )
+    except OSError:
+        # Without a writable state directory the listing is not cached.
+        pass
+    return unit_files
+
+
+UNIT_FILES_PROPERTIES: typing.Tuple[str, ...] = (
+    "TriggeredBy",
+    "Type",
+    "RemainAfterExit",
+)
+"""The properties that are fetched to decide whether an enabled but
+inactive unit is expected to be inactive."""
+
+
+def is_expected_inactive(properties: dict[str, typing.Any]) -> bool:
+    """Whether an enabled unit is inactive by design: It is started by
+    another unit (a socket, timer or path unit, ``TriggeredBy=``) or it is
+    a oneshot service that is inactive again after it has run (``Type=oneshot``
+    without ``RemainAfterExit=yes``).
+
+    :param properties: The properties of the unit (see
+      :data:`UNIT_FILES_PROPERTIES`).
+    """
+    if properties.get("TriggeredBy"):
+        return True
+    return properties.get("Type") == "oneshot" and not properties.get("RemainAfterExit")
+
+
+class UnitFilesResource(Resource):
+    """Join the enablement state of the unit files with the states of the
+    units in the unit cache. A metric is emitted for every enabled unit
+    file whose unit is not loaded or is inactive without being expected to
+    be inactive (see :func:`is_expected_inactive`) and, with the option
+    ``--unit-files-presets``, for every unit file whose enablement state
+    differs from the vendor preset. Template unit files (``getty@.service``)
+    are skipped.
+
+    :param session: The session of the check.
+    """
+
+    unit_files: dict[str, typing.Tuple[str, str | None]]
+    """The enablement state and the vendor preset per unit file."""
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.unit_files = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        opts = self.session.opts
+        self.unit_files = get_unit_files(self.session)
+        names = UnitNameFilter(self.unit_files).list(
+            include=opts.include, exclude=opts.exclude
+        )
+        names = sorted(name for name in names if "@." not in name)
+        enabled_inactive = self.get_enabled_inactive(names)
+        counter: typing.Counter[str] = collections.Counter()
+        for name in names:
+            state, preset = self.unit_files[name]
+            problem = None
+            if name in enabled_inactive:
+                problem = "enabled_inactive"
+            if (
+                problem is None
+                and opts.unit_files_presets
+                and state in ("enabled", "disabled")
+                and preset in ("enabled", "disabled")
+                and state != preset
+            ):
+                problem = "preset_drift"
+            if problem:
+                counter[problem] += 1
+                yield Metric(name=name, value=problem, context="unit_files")
+
+        if opts.performance_data:
+            yield Metric(
+                name="unit_files_enabled_inactive",
+                value=counter["enabled_inactive"],
+                context="performance_data",
+            )
+            if opts.unit_files_presets:
+                yield Metric(
+                    name="unit_files_preset_drift",
+                    value=counter["preset_drift"],
+                    context="performance_data",
+                )
+
+    def get_enabled_inactive(self, names: typing.Iterable[str]) -> set[str]:
+        """The enabled unit files whose units are not loaded or are
+        inactive although they are not expected to be inactive. The
+        properties of the inactive units are fetched in one batch.
+
+        :param names: The names of the unit files.
+        """
+        unit_cache = self.session.unit_cache
+        not_loaded: set[str] = set()
+        inactive: list[str] = []
+        for name in names:
+            if self.unit_files[name][0] not in ("enabled", "enabled-runtime"):
+                continue
+            try:
+                unit = unit_cache.get(name)
+            except KeyError:
+                # Units that are not loaded are not listed.
+                not_loaded.add(name)
+                continue
+            if unit.active_state == "inactive":
+                inactive.append(name)
+        if not inactive:
+            return not_loaded
+        units = unit_cache.fetch_properties(UNIT_FILES_PROPERTIES, inactive)
+        return not_loaded | {
+            unit.name for unit in units if not is_expected_inactive(unit.properties)
+        }
+
+
+class UnitFilesContext(Context):
+    """Evaluates the unit files reported by :class:`UnitFilesResource` as
+    warnings."""
+
+    def __init__(self):
+        super(UnitFilesContext, self).__init__("unit_files")
+
+    def evaluate(self, metric: Metric, resource: Resource) -> Result:
+        state, preset = resource.unit_files[metric.name]
+        if metric.value == "enabled_inactive":
+            hint = "{}: {} but inactive".format(metric.name, state)
+        else:
+            hint = "{}: {} (preset {})".format(metric.name, state, preset)
+        return self.result_cls(Warn, metric=metric, hint=hint)
+
+
+# Contexts: per-unit metrics ##################################################
+
+
+class UnitScalarContext(ScalarContext):
+    """Base class of the contexts that evaluate a numeric metric of a
+    single unit using Nagios ranges. The hint of the result names the unit
+    and is also used as the description. No performance data is emitted
+    with ``--no-performance-data``.
+
+    :param session: The session of the check.
+    :param name: The name of the context.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        name: str,
+        warning: str | None = None,
+        critical: str | None = None,
+    ):
+        super(UnitScalarContext, self).__init__(
+            name, warning=warning, critical=critical
+        )
+        self.session = session
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        """Format the hint of the result.
+
+        :param metric: The metric to evaluate.
+        :param resource: The resource that produced the metric.
+        """
+        return "{}: {}".format(metric.name, metric.value)
+
+    def get_ranges(
+        self, metric: Metric, resource: Resource
+    ) -> typing.Tuple[Range, Range]:
+        """The warning and the critical range of a metric. Subclasses can
+        override the ranges per unit.
+
+        :param metric: The metric to evaluate.
+        :param resource: The resource that produced the metric.
+        """
+        return self.warning, self.critical
+
+    def evaluate(self, metric: Metric, resource: Resource) -> Result:
+        warning, critical = self.get_ranges(metric, resource)
+        if not critical.match(metric.value):
+            state: ServiceState = Critical
+        elif not warning.match(metric.value):
+            state = Warn
+        else:
+            state = Ok
+        return Result(state, self.hint(metric, resource), metric)
+
+    def describe(self, metric: Metric) -> None:
+        """The hint of the result is used as the description."""
+        return None
+
+    def performance(self, metric: Metric, resource: Resource):
+        if not self.session.opts.performance_data:
+            return None
+        warning, critical = self.get_ranges(metric, resource)
+        return Performance(
+            metric.name,
+            metric.value,
+            metric.uom,
+            warning,
+            critical,
+            metric.min,
+            metric.max,
+        )
+
+
+# scope: cgroups ##############################################################
+
+
+CGROUP_FILES: typing.Tuple[str, ...] = (
+    "memory.current",
+    "memory.events",
+    "cpu.stat",
+    "pids.current",
+)
+"""The files of a cgroup v2 directory that are read per unit."""
+
+
+def find_unit_cgroups(root: str) -> dict[str, str]:
+    """Map the units to their cgroup v2 directories. Only the directories of
+    slices (``system.slice``, ``user-1000.slice`` …) are descended into, the
+    directories of the other units (services, scopes …) are not, because
+    they may contain an arbitrary number of sub-cgroups.
+
+    :param root: The mount point of the cgroup v2 hierarchy, usually
+      ``/sys/fs/cgroup``.
+
+    :return: A dictionary of unit names and cgroup directories.
+    """
+    cgroups: dict[str, str] = {}
+    directories = [root]
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if "." not in entry.name or not entry.is_dir(follow_symlinks=False):
+                    continue
+                cgroups[entry.name] = entry.path
+                if entry.name.endswith(".slice"):
+                    directories.append(entry.path)
+    return cgroups
+
+
+def read_cgroup_files(
+    path: str, names: typing.Iterable[str] = CGROUP_FILES
+) -> dict[str, str]:
+    """Read small files of a cgroup directory with as few system calls as
+    possible: The directory is opened once, each file is opened relative to
+    it and read with a single ``read()`` call. Buffered file objects
+    would need additional ``fstat``, ``ioctl`` and ``lseek`` calls.
+
+    :param path: The cgroup directory.
+    :param names: The names of the files. Missing files (for example if a
+      controller is not enabled) are skipped.
+    """
+    contents: dict[str, str] = {}
+    dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        for name in names:
+            try:
+                fd = os.open(name, os.O_RDONLY, dir_fd=dir_fd)
+            except OSError:
+                continue
+            try:
+                contents[name] = os.read(fd, 65536).decode()
+            finally:
+                os.close(fd)
+    finally:
+        os.close(dir_fd)
+    return contents
+
+
+def parse_cgroup_files(contents: dict[str, str]) -> dict[str, int]:
+    """Extract the values from the contents of the cgroup files.
+
+    :param contents: The result of :func:`read_cgroup_files`.
+
+    :return: A dictionary with the keys ``memory`` (bytes), ``oom_kills``,
+      ``cpu_usec`` (microseconds) and ``tasks``. Keys of missing files are
+      omitted.
+    """
+
+    def keyed(content: str) -> dict[str, str]:
+        return dict(line.split(" ", 1) for line in content.splitlines() if " " in line)
+
+    values: dict[str, int] = {}
+    if "memory.current" in contents:
+        values["memory"] = int(contents["memory.current"])
+    if "memory.events" in contents:
+        values["oom_kills"] = int(keyed(contents["memory.events"]).get("oom_kill", 0))
+    if "cpu.stat" in contents:
+        values["cpu_usec"] = int(keyed(contents["cpu.stat"]).get("usage_usec", 0))
+    if "pids.current" in contents:
+        values["tasks"] = int(contents["pids.current"])
+    return values
+
+
+class CgroupsResource(Resource):
+    """Resource metrics of the selected services read directly from their
+    cgroup v2 directories: memory usage, number of OOM kills, CPU time and
+    number of tasks. Services that are not running have no cgroup and are
+    skipped.
+
+    :param session: The session of the check.
+    """
+
+    units: dict[str, str]
+    """The names of the metrics and the corresponding unit names."""
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.units = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        opts = self.session.opts
+        cgroups = find_unit_cgroups(opts.cgroup_root)
+        for unit in sorted(self.session.list_units(), key=lambda unit: unit.name):
+            if unit.type != "service" or unit.name not in cgroups:
+                continue
+            try:
+                values = parse_cgroup_files(read_cgroup_files(cgroups[unit.name]))
+            except (OSError, ValueError):
+                # The service stopped in the meantime.
+                continue
+            label = self.session.format_perfdata_label(unit.name)
+            for key, context, uom in (
+                ("memory", "cgroup_memory", "B"),
+                ("oom_kills", "cgroup_oom_kills", None),
+                ("tasks", "cgroup_tasks", None),
+            ):
+                if key in values:
+                    name = "{}_{}".format(label, key)
+                    self.units[name] = unit.name
+                    yield Metric(
+                        name=name, value=values[key], uom=uom, min=0, context=context
+                    )
+            if opts.performance_data and "cpu_usec" in values:
+                yield Metric(
+                    name="{}_cpu_usec".format(label),
+                    value=values["cpu_usec"],
+                    uom="c",
+                    context="performance_data",
+                )
+
+
+class CgroupContext(UnitScalarContext):
+    """Evaluates a resource metric of :class:`CgroupsResource` using the
+    thresholds of the options ``--cgroup-*-warning`` and
+    ``--cgroup-*-critical``.
+
+    :param session: The session of the check.
+    :param name: The name of the context, for example ``cgroup_memory``.
+    :param description: A template for the hint, for example
+      ``{unit}: memory {value}B``.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        name: str,
+        description: str,
+        warning: str | None = None,
+        critical: str | None = None,
+    ):
+        super(CgroupContext, self).__init__(session, name, warning, critical)
+        self.description = description
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        return self.description.format(
+            unit=resource.units[metric.name], value=metric.value
+        )
+
+
+# scope: restarts #############################################################
+
+
+RESTART_PROPERTIES: typing.Tuple[str, ...] = (
+    "NRestarts",
+    "ExecMainStartTimestampMonotonic",
+    "StateChangeTimestampMonotonic",
+)
+"""The properties that are fetched to detect restart loops. The monotonic
+variants of the timestamps are used, because both data sources return
+them as integers (microseconds since boot)."""
+
+
+def count_restarts(
+    previous: typing.Sequence[int], current: typing.Sequence[int]
+) -> int:
+    """Count the automatic restarts of a service between two runs.
+
+    :param previous: ``NRestarts`` and ``ExecMainStartTimestampMonotonic``
+      of the previous run.
+    :param current: ``NRestarts`` and ``ExecMainStartTimestampMonotonic``
+      of the current run.
+    """
+    n_restarts, main_start = current[:2]
+    previous_n_restarts, previous_main_start = previous[:2]
+    if n_restarts >= previous_n_restarts:
+        return n_restarts - previous_n_restarts
+    # NRestarts is reset if the service is started manually.
+    return n_restarts if main_start != previous_main_start else 0
+
+
+class RestartsResource(Resource):
+    """The restart rates (restarts per hour) of the selected services. A
+    service in a restart loop (``Restart=`` and a crashing main process) is
+    ``active`` most of the time, so it is not detected by the scope
+    ``units``.
+
+    ``NRestarts`` is fetched for all services in one bulk operation and
+    compared with the value of the previous run, which is stored in the
+    state directory until the next boot. Services whose state did not
+    change since the previous run are reported with 0 restarts without
+    comparing their counters.
+
+    :param session: The session of the check.
+    """
+
+    restarts: dict[str, typing.Tuple[str, int, float]]
+    """The names of the metrics and the corresponding unit names, numbers
+    of restarts and intervals in seconds."""
+
+    state_name = "restarts"
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.restarts = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        session = self.session
+        now = int(read_clock("monotonic") * 1_000_000)
+        previous = session.read_boot_state(self.state_name)
+        if not isinstance(previous, dict):
+            previous = {}
+        previous_time: int | None = previous.get("time")
+        previous_units: dict[str, list[int]] = previous.get("units", {})
+        names = [unit.name for unit in session.list_units() if unit.type == "service"]
+
+        current_units: dict[str, list[int]] = {}
+        for unit in session.unit_cache.fetch_properties(RESTART_PROPERTIES, names):
+            n_restarts = unit.properties.get("NRestarts")
+            if n_restarts is None:
+                continue
+            current = current_units[unit.name] = [
+                n_restarts,
+                unit.properties.get("ExecMainStartTimestampMonotonic") or 0,
+            ]
+            if (
+                previous_time is None
+                or now <= previous_time
+                or unit.name not in previous_units
+            ):
+                continue
+            state_change = unit.properties.get("StateChangeTimestampMonotonic") or 0
+            if state_change <= previous_time:
+                restarts = 0
+            else:
+                restarts = count_restarts(previous_units[unit.name], current)
+            seconds = (now - previous_time) / 1_000_000
+            name = session.format_perfdata_label(unit.name) + "_restarts"
+            self.restarts[name] = (unit.name, restarts, seconds)
+            yield Metric(
+                name=name,
+                value=round(restarts * 3600 / seconds, 2),
+                min=0,
+                context="restarts",
+            )
+        session.write_boot_state(self.state_name, {"time": now, "units": current_units})
+
+
+class RestartsContext(UnitScalarContext):
+    """Evaluates the restart rates of :class:`RestartsResource` using the
+    thresholds of the options ``--restarts-warning`` and
+    ``--restarts-critical``.
+
+    :param session: The session of the check.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        warning: str | None = None,
+        critical: str | None = None,
+    ):
+        super(RestartsContext, self).__init__(session, "restarts", warning, critical)
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        name, restarts, seconds = resource.restarts[metric.name]
+        return "{}: {} restarts in {}s ({} per hour)".format(
+            name, restarts, round(seconds), metric.value
+        )
+
+
+# scope: flapping #############################################################
+
+
+class FlappingResource(Resource):
+    """The number of state changes of the selected units during the recent
+    runs of the check. The states of all units are appended to a
+    :class:`StateHistory` in the state directory on each run. Units without
+    state changes are not reported.
+
+    :param session: The session of the check.
+    """
+
+    units: dict[str, str]
+    """The names of the metrics and the corresponding unit names."""
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.units = {}
+
+    @property
+    def history_path(self) -> str:
+        options = repr((self.session.data_source, self.session.opts.with_user_units))
+        return os.path.join(
+            self.session.state_dir,
+            "history-{:08x}.bin".format(zlib.crc32(options.encode())),
+        )
+
+    def read_history_file(self) -> bytes:
+        try:
+            with open(self.history_path, "rb") as history_file:
+                return history_file.read()
+        except OSError:
+            return b""
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        session = self.session
+        data: bytes | None = None
+        if active_tape.get() is not None:
+            # The history is part of a recording. A replay uses the recorded
+            # history and does not update the local one.
+            data = acquire(
+                ["state", os.path.basename(self.history_path)],
+                self.read_history_file,
+            )
+        try:
+            with StateHistory(
+                self.history_path,
+                get_boot_id(),
+                data=data if is_replaying() else None,
+            ) as history:
+                history.record(session.unit_cache.list())
+                names, rows = history.names, history.rows
+        except OSError as e:
+            raise CheckError("Unable to update the state history: {}".format(e))
+        changes = count_state_changes(rows, session.opts.flapping_window)
+        selected = {unit.name for unit in session.list_units()}
+        for index, count in sorted(changes.items(), key=lambda item: names[item[0]]):
+            if names[index] not in selected:
+                continue
+            name = session.format_perfdata_label(names[index]) + "_state_changes"
+            self.units[name] = names[index]
+            yield Metric(name=name, value=count, min=0, context="flapping")
+
+
+class FlappingContext(UnitScalarContext):
+    """Evaluates the number of state changes of :class:`FlappingResource`
+    using the thresholds of the options ``--flapping-warning`` and
+    ``--flapping-critical``.
+
+    :param session: The session of the check.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        warning: str | None = None,
+        critical: str | None = None,
+    ):
+        super(FlappingContext, self).__init__(session, "flapping", warning, critical)
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        return "{}: {} state changes in the last {} runs".format(
+            resource.units[metric.name],
+            metric.value,
+            self.session.opts.flapping_window,
+        )
+
+
+# scope: transitions ##########################################################
+
+
+TRANSITIONAL_STATES: typing.Tuple[str, ...] = (
+    "activating",
+    "deactivating",
+    "reloading",
+)
+"""The active states in which a unit should only stay for a short time."""
+
+
+class TransitionsResource(Resource):
+    """The time the selected units have been in a transitional state
+    (``activating``, ``deactivating`` or ``reloading``). The property
+    ``StateChangeTimestampMonotonic`` is only fetched for the units in a
+    transitional state, in one batch, so the costs do not depend on the
+    total number of units.
+
+    :param session: The session of the check.
+    """
+
+    units: dict[str, str]
+    """The names of the metrics and the corresponding hints."""
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.units = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        session = self.session
+        names = [
+            unit.name
+            for unit in session.list_units()
+            if unit.active_state in TRANSITIONAL_STATES
+        ]
+        if not names:
+            return
+        now = int(read_clock("monotonic") * 1_000_000)
+        for unit in session.unit_cache.fetch_properties(
+            ("StateChangeTimestampMonotonic",), sorted(names)
+        ):
+            timestamp = unit.properties.get("StateChangeTimestampMonotonic")
+            if not timestamp:
+                continue
+            seconds = max(0, (now - timestamp) // 1_000_000)
+            name = session.format_perfdata_label(unit.name) + "_transition"
+            self.units[name] = "{}: {}".format(unit.name, unit.active_state)
+            yield Metric(
+                name=name, value=seconds, uom="s", min=0, context="transitions"
+            )
+
+
+class TransitionsContext(UnitScalarContext):
+    """Evaluates the times of :class:`TransitionsResource` using the
+    thresholds of the options ``--transitions-warning`` and
+    ``--transitions-critical``.
+
+    :param session: The session of the check.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        warning: str | None = None,
+        critical: str | None = None,
+    ):
+        super(TransitionsContext, self).__init__(
+            session, "transitions", warning, critical
+        )
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        return "{} for {}s".format(resource.units[metric.name], metric.value)
+
+
+# scope: journal_errors #######################################################
+
+
+JOURNAL_ERROR_PRIORITY = 3
+"""The syslog priority ``err``. Journal entries with this or a more severe
+priority (a lower number) are counted as errors."""
+
+JOURNAL_OUTPUT_FIELDS: typing.Tuple[str, ...] = (
+    "UNIT",
+    "_SYSTEMD_UNIT",
+    "PRIORITY",
+    "MESSAGE",
+)
+"""The fields that ``journalctl`` has to print. The cursor (``__CURSOR``)
+is always printed."""
+
+
+class JournalErrors:
+    """The error counter and the last error message of a unit."""
+
+    count: int
+
+    message: str
+    """The message of the last error."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.message = ""
+
+
+def iterate_lines(text: str) -> typing.Generator[str, None, None]:
+    """Iterate over the lines of a text without copying the whole text
+    (like ``str.splitlines`` or ``io.StringIO`` do)."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def scan_journal(
+    lines: typing.Iterable[str],
+) -> typing.Tuple[str | None, dict[str, JournalErrors]]:
+    """Count the errors per unit in the output of ``journalctl
+    --output=json``. The lines are consumed one by one, only the counters
+    and the last message of each unit are kept.
+
+    :param lines: One JSON object per line.
+
+    :return: The cursor of the last entry (``None`` if there is no entry)
+      and the errors per unit.
+    """
+    cursor: str | None = None
+    errors: dict[str, JournalErrors] = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(entry, dict):
+            continue
+        cursor = entry.get("__CURSOR", cursor)
+        try:
+            priority = int(entry.get("PRIORITY"))
+        except (TypeError, ValueError):
+            continue
+        name = entry.get("UNIT") or entry.get("_SYSTEMD_UNIT")
+        if priority > JOURNAL_ERROR_PRIORITY or not isinstance(name, str):
+            continue
+        unit_errors = errors.setdefault(name, JournalErrors())
+        unit_errors.count += 1
+        message = entry.get("MESSAGE")
+        if isinstance(message, str):
+            unit_errors.message = message
+    return cursor, errors
+
+
+class JournalErrorsResource(Resource):
+    """The error rates (errors per hour) of the selected units in the
+    journal. Only the errors written since the previous run are read:
+    ``journalctl --priority`` returns only errors and the cursor of the
+    last error is stored in the state directory and passed to
+    ``journalctl --after-cursor``, so the costs of a run depend on the
+    number of new errors and not on the size of the journal. Without a
+    cursor (no error yet) the time of the previous run is passed to
+    ``journalctl --since``. The first run only stores the time. If
+    ``journalctl`` fails, for example because the cursor is no longer
+    valid, the cursor is dropped, so the next run starts over. Units
+    without errors are not reported.
+
+    The output of ``journalctl`` is read with :func:`execute_cli` and is
+    therefore buffered completely (like every acquisition, so that it can
+    be recorded and replayed); only the scan is done line by line.
+
+    :param session: The session of the check.
+    """
+
+    units: dict[str, typing.Tuple[str, JournalErrors, float]]
+    """The names of the metrics and the corresponding unit names, errors
+    and intervals in seconds."""
+
+    state_name = "journal"
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.units = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        session = self.session
+        now = read_clock("time")
+        previous = session.read_state(self.state_name)
+        if not isinstance(previous, dict):
+            previous = {}
+        previous_cursor: str | None = previous.get("cursor")
+        previous_time: float | None = previous.get("time")
+
+        def store(cursor: str | None) -> None:
+            try:
+                session.write_state(self.state_name, {"cursor": cursor, "time": now})
+            except OSError as e:
+                raise CheckError("Unable to store the journal cursor: {}".format(e))
+
+        if previous_time is None or now <= previous_time:
+            store(None)
+            return
+        command = [
+            "journalctl",
+            "--no-pager",
+            "--quiet",
+            "--output=json",
+            "--output-fields={}".format(",".join(JOURNAL_OUTPUT_FIELDS)),
+            "--priority=0..{}".format(JOURNAL_ERROR_PRIORITY),
+        ]
+        if previous_cursor:
+            command.append("--after-cursor={}".format(previous_cursor))
+        else:
+            command.append("--since=@{}".format(int(previous_time)))
+        try:
+            stdout = execute_cli(command) or ""
+        except CheckError as e:
+            store(None)
+            raise CheckError("Unable to read the journal: {}".format(e))
+        cursor, errors = scan_journal(iterate_lines(stdout))
+        store(cursor or previous_cursor)
+
+        seconds = now - previous_time
+        selected = {unit.name for unit in session.list_units()}
+        for unit_name in sorted(errors):
+            if unit_name not in selected:
+                continue
+            unit_errors = errors[unit_name]
+            name = session.format_perfdata_label(unit_name) + "_journal_errors"
+            self.units[name] = (unit_name, unit_errors, seconds)
+            yield Metric(
+                name=name,
+                value=round(unit_errors.count * 3600 / seconds, 2),
+                min=0,
+                context="journal_errors",
+            )
+
+
+class JournalErrorsContext(UnitScalarContext):
+    """Evaluates the error rates of :class:`JournalErrorsResource` using
+    the thresholds of the options ``--journal-errors-warning`` and
+    ``--journal-errors-critical``.
+
+    :param session: The session of the check.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        warning: str | None = None,
+        critical: str | None = None,
+    ):
+        super(JournalErrorsContext, self).__init__(
+            session, "journal_errors", warning, critical
+        )
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        name, errors, seconds = resource.units[metric.name]
+        hint = "{}: {} journal errors in {}s ({} per hour)".format(
+            name, errors.count, round(seconds), metric.value
+        )
+        if errors.message:
+            # A pipe would separate the performance data.
+            hint += ", last: {}".format(errors.message.replace("|", "/"))
+        return hint
+
+
+# scope: timers ###############################################################
+
+
+class TimersResource(Resource):
+    """
+    Resource that calls ``systemctl list-timers --all`` on the command line to
+    get informations about dead / inactive timers. There is one type of systemd
+    “degradation” which is normally not detected: dead / inactive timers.
+
+    :param session: The session of the check.
+    :param machine: Check the timers of a container
+      (``systemctl --machine``).
+    :param label: A prefix for the names of the metrics, for example
+      ``web1``.
+    """
+
+    ages: dict[str, float]
+    """The seconds that have passed since the timers were last triggered.
+    Timers that have never been triggered are missing."""
+
+    def __init__(
+        self,
+        session: CheckSession,
+        machine: str | None = None,
+        label: str | None = None,
+    ):
+        super().__init__()
+        self.session = session
+        self.machine = machine
+        self.label = label
+        self.ages = {}
+
+    name = "SYSTEMD"
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        """
+        :return: generator that emits
+          :class:`~nagiosplugin.metric.Metric` objects
+        """
+        command = ["systemctl", "list-timers", "--all"]
+        if self.machine:
+            command.append("--machine={}".format(self.machine))
+        stdout = execute_cli(command)
+
+        # NEXT                          LEFT
+        # Sat 2020-05-16 15:11:15 CEST  34min left
+
+        # LAST                          PASSED
+        # Sat 2020-05-16 14:31:56 CEST  4min 20s ago
+
+        # UNIT             ACTIVATES
+        # apt-daily.timer  apt-daily.service
         if stdout:
-            # First line:
-            # Startup finished in 1.672s (kernel) + 21.378s (userspace) =
-            # 23.050s
+            table_parser = TableParser(stdout)
+            table_parser.check_header(("unit", "next", "passed"))
+            opts = self.session.opts
+            state = Ok
 
-            # On raspian no second line
-            # Second line:
-            # graphical.target reached after 1min 2.154s in userspace
-            match = re.search(r"reached after (.+) in userspace", stdout)
+            for row in table_parser.list_rows():
+                unit = row["unit"]
+                if match_multiple(unit, opts.exclude):
+                    continue
 
-            if not match:
-                match = re.search(r" = (.+)\n", stdout)
+                if row["passed"] != "n/a":
+                    self.ages[unit] = format_timespan_to_seconds(row["passed"])
 
-            # Output when boot process is not finished:
-            # Bootup is not yet finished. Please try again later.
-            if match:
-                yield Metric(
-                    name="startup_time",
-                    value=format_timespan_to_seconds(match.group(1)),
-                    context="startup_time",
-                )
+                if row["next"] == "n/a":
 
+                    if row["passed"] == "n/a":
+                        state = Critical
+                    else:
+                        passed = format_timespan_to_seconds(row["passed"])
 
-class StartupTimeContext(ScalarContext):
+                        if row["passed"] == "n/a" or passed >= opts.timers_critical:
+                            state = Critical
+                        elif passed >= opts.timers_warning:
+                            state = Warn
+
+                if self.label:
+                    unit = "{}/{}".format(self.label, unit)
+                yield Metric(name=unit, value=state, context="timers")
+
+
+class TimersContext(Context):
     def __init__(self):
+        super(TimersContext, self).__init__("timers")
+
+    def evaluate(self, metric: Metric, resource: Resource):
+        """Determines state of a given metric.
+
+        :param metric: associated metric that is to be evaluated
+        :param resource: resource that produced the associated metric
+            (may optionally be consulted)
+
+        :returns: :class:`~.result.Result`
+        """
+        return self.result_cls(metric.value, metric=metric, hint=metric.name)
+
+
+# scope: startup_time #########################################################
+
+
+def get_startup_time() -> float | None:
+    """Call ``systemd-analyze`` on the command line to get the startup time.
+
+    :return: The startup time in seconds or ``None`` if the boot has not
+      finished yet.
+    """
+    stdout = None
+    try:
+        stdout = execute_cli(["systemd-analyze"])
+    except CheckError:
+        pass
+
+    if stdout:
+        # First line:
+        # Startup finished in 1.672s (kernel) + 21.378s (userspace) =
+        # 23.050s
+
+        # On raspian no second line
+        # Second line:
+        # graphical.target reached after 1min 2.154s in userspace
+        match = re.search(r"reached after (.+) in userspace", stdout)
+
+        if not match:
+            match = re.search(r" = (.+)\n", stdout)
+
+        # Output when boot process is not finished:
+        # Bootup is not yet finished. Please try again later.
+        if match:
+            return format_timespan_to_seconds(match.group(1))
+    return None
+
+
+class StartupTimeResource(Resource):
+    """Resource that calls ``systemd-analyze`` on the command line to get
+    informations about the startup time. With ``--boot-cache`` the startup
+    time is only determined once per boot.
+
+    :param session: The session of the check.
+    """
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        """Query system state and return metrics.
+
+        :return: generator that emits
+          :class:`~nagiosplugin.metric.Metric` objects
+        """
+        if self.session.opts.boot_cache:
+            startup_time = self.session.cache_per_boot("startup-time", get_startup_time)
+        else:
+            startup_time = get_startup_time()
+
+        if startup_time is not None:
+            yield Metric(
+                name="startup_time",
+                value=startup_time,
+                context="startup_time",
+            )
+
+
+class StartupTimeContext(ScalarContext):
+    def __init__(self, session: CheckSession):
         super(StartupTimeContext, self).__init__("startup_time")
-        if opts.scope_startup_time:
-            self.warning = Range(opts.warning)
-            self.critical = Range(opts.critical)
+        self.session = session
+        if session.opts.scope_startup_time:
+            self.warning = Range(session.opts.warning)
+            self.critical = Range(session.opts.critical)
 
     def performance(self, metric: Metric, resource: Resource):
-        if not opts.performance_data:
+        if not self.session.opts.performance_data:
             return None
         return Performance(
             metric.name,
@@ -1011,38 +4128,291 @@ class StartupTimeContext(ScalarContext):
         )
 
 
+# scope: startup_profile ######################################################
+
+
+def parse_blame(stdout: str) -> list[typing.Tuple[str, float]]:
+    """Parse the output of ``systemd-analyze blame``.
+
+    :param stdout: The standard output, one unit per line, for example
+      ``1min 2.154s apt-daily.service``.
+
+    :return: The names of the units and their activation times in seconds,
+      the slowest unit first.
+    """
+    blame: list[typing.Tuple[str, float]] = []
+    for line in stdout.splitlines():
+        timespan, _, name = line.strip().rpartition(" ")
+        if timespan and name:
+            blame.append((name, format_timespan_to_seconds(timespan)))
+    blame.sort(key=lambda item: item[1], reverse=True)
+    return blame
+
+
+def get_startup_profile(session: CheckSession) -> list[typing.Tuple[str, float]]:
+    """Get the activation times of the units during the boot with one
+    ``systemd-analyze blame`` call. The profile does not change after the
+    boot has finished, so it is cached until the next boot (see
+    :meth:`CheckSession.cache_per_boot`).
+
+    :param session: The session of the check.
+
+    :return: The result of :func:`parse_blame` or an empty list if the boot
+      has not finished yet.
+    """
+
+    def fetch() -> list[typing.Tuple[str, float]]:
+        try:
+            # systemd-analyze blame fails until the boot has finished.
+            stdout = execute_cli(["systemd-analyze", "blame"])
+        except CheckError:
+            return []
+        return parse_blame(stdout or "")
+
+    blame = session.cache_per_boot("startup-profile", fetch)
+    return [(name, seconds) for name, seconds in blame or ()]
+
+
+class StartupProfileResource(Resource):
+    """The activation times of the selected units that were the slowest
+    ones during the boot and of the units with their own thresholds
+    (option ``--startup-profile-threshold``).
+
+    :param session: The session of the check.
+    """
+
+    units: dict[str, str]
+    """The names of the metrics and the corresponding unit names."""
+
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+        self.units = {}
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        opts = self.session.opts
+        blame = get_startup_profile(self.session)
+        selected = set(
+            UnitNameFilter(name for name, _ in blame).list(
+                include=opts.include, exclude=opts.exclude
+            )
+        )
+        watched = {name for name, _, _ in opts.startup_profile_thresholds}
+        top = [item for item in blame if item[0] in selected][
+            : opts.startup_profile_top
+        ]
+        top += [
+            item
+            for item in blame
+            if item[0] in selected and item[0] in watched and item not in top
+        ]
+        for name, seconds in top:
+            metric_name = self.session.format_perfdata_label(name) + "_startup_time"
+            self.units[metric_name] = name
+            yield Metric(
+                name=metric_name,
+                value=seconds,
+                uom="s",
+                min=0,
+                context="startup_profile",
+            )
+
+
+class StartupProfileContext(UnitScalarContext):
+    """Evaluates the activation times of :class:`StartupProfileResource`
+    using the thresholds of the options ``--startup-profile-warning`` and
+    ``--startup-profile-critical``. The thresholds of the option
+    ``--startup-profile-threshold`` take precedence for individual units.
+
+    :param session: The session of the check.
+    :param thresholds: The unit names and their warning and critical
+      thresholds. An empty string means no threshold.
+    """
+
+    thresholds: dict[str, typing.Tuple[Range, Range]]
+
+    def __init__(
+        self,
+        session: CheckSession,
+        warning: str | None = None,
+        critical: str | None = None,
+        thresholds: typing.Iterable[typing.Sequence[str]] = (),
+    ):
+        super(StartupProfileContext, self).__init__(
+            session, "startup_profile", warning, critical
+        )
+        self.thresholds = {
+            name: (Range(unit_warning), Range(unit_critical))
+            for name, unit_warning, unit_critical in thresholds
+        }
+
+    def get_ranges(
+        self, metric: Metric, resource: Resource
+    ) -> typing.Tuple[Range, Range]:
+        name = resource.units[metric.name]
+        if name in self.thresholds:
+            return self.thresholds[name]
+        return self.warning, self.critical
+
+    def hint(self, metric: Metric, resource: Resource) -> str:
+        return "{}: activated in {}s during boot".format(
+            resource.units[metric.name], metric.value
+        )
+
+
 # scope: performance_data #####################################################
 
 
 class PerformanceDataResource(Resource):
+    """
+    :param session: The session of the check.
+    :param cache: The unit cache to count. By default the unit cache of the
+      system service manager is used.
+    :param prefix: A prefix for the labels of the performance data, for
+      example ``user_1000_``.
+    """
+
+    def __init__(
+        self,
+        session: CheckSession,
+        cache: UnitCache | None = None,
+        prefix: str = "",
+    ):
+        super().__init__()
+        self.session = session
+        self.cache = cache
+        self.prefix = prefix
+
     def probe(self) -> typing.Generator[Metric, None, None]:
-        for state_spec, count in unit_cache.count_by_states(
+        cache = self.cache if self.cache is not None else self.session.unit_cache
+        for state_spec, count in cache.count_by_states(
             (
                 "active_state:failed",
                 "active_state:active",
                 "active_state:activating",
                 "active_state:inactive",
             ),
-            exclude=opts.exclude,
+            exclude=self.session.opts.exclude,
         ).items():
             yield Metric(
-                name="units_{}".format(state_spec.split(":")[1]),
+                name="{}units_{}".format(self.prefix, state_spec.split(":")[1]),
                 value=count,
                 context="performance_data",
             )
 
         yield Metric(
-            name="count_units", value=unit_cache.count, context="performance_data"
+            name="{}count_units".format(self.prefix),
+            value=cache.count,
+            context="performance_data",
         )
 
 
 class PerformanceDataDataSourceResource(Resource):
+    def __init__(self, session: CheckSession):
+        super().__init__()
+        self.session = session
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        yield Metric(
+            name="data_source",
+            value=self.session.data_source,
+            context="performance_data",
+        )
+
+
+class PerformanceDataChangesResource(Resource):
+    """
+    :param snapshot: The snapshot that contains the units whose state
+      changed since the previous run.
+    """
+
+    def __init__(self, snapshot: UnitSnapshot):
+        super().__init__()
+        self.snapshot = snapshot
+
     def probe(self) -> typing.Generator[Metric, None, None]:
         yield Metric(
-            name="data_source", value=opts.data_source, context="performance_data"
+            name="units_changed",
+            value=len(self.snapshot.changed),
+            context="performance_data",
         )
 
 
+class UnitPerformanceDataResource(Resource):
+    """Performance data per unit type and active state, per unit and per
+    timer. To protect time series databases on hosts with many units, the
+    number of labels is limited by the options ``--perfdata-top`` and
+    ``--perfdata-max-labels``.
+
+    :param session: The session of the check.
+    :param timers: The timers resource whose ages are reported. The timers
+      resource must be probed before this resource.
+    """
+
+    def __init__(self, session: CheckSession, timers: TimersResource | None = None):
+        super().__init__()
+        self.session = session
+        self.timers = timers
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        by_type: typing.Counter[typing.Tuple[str, str]] = collections.Counter()
+        units: list[Unit] = []
+        opts = self.session.opts
+        for unit in self.session.list_units():
+            by_type[(unit.type, unit.active_state)] += 1
+            if opts.perfdata_units:
+                units.append(unit)
+
+        metrics: list[Metric] = []
+        if opts.perfdata_types:
+            for (unit_type, active_state), count in sorted(by_type.items()):
+                metrics.append(
+                    Metric(
+                        name="units_{}_{}".format(unit_type, active_state),
+                        value=count,
+                        context="performance_data",
+                    )
+                )
+
+        def severity(unit: Unit) -> typing.Tuple[int, str]:
+            if unit.active_state in ACTIVE_STATE_SEVERITY:
+                return ACTIVE_STATE_SEVERITY.index(unit.active_state), unit.name
+            return len(ACTIVE_STATE_SEVERITY), unit.name
+
+        # The units with the most severe states first (failed, activating ...)
+        for unit in heapq.nsmallest(opts.perfdata_top or len(units), units, severity):
+            metrics.append(
+                Metric(
+                    name=self.session.format_perfdata_label(unit.name),
+                    value=ACTIVE_STATE_CODES.get(unit.active_state, 0),
+                    context="performance_data",
+                )
+            )
+
+        if self.timers and self.timers.ages:
+            # The oldest timers first
+            ages = self.timers.ages.items()
+            for name, age in heapq.nlargest(
+                opts.perfdata_top or len(ages), ages, key=lambda item: item[1]
+            ):
+                metrics.append(
+                    Metric(
+                        name=self.session.format_perfdata_label(name) + "_age",
+                        value=age,
+                        uom="s",
+                        context="performance_data",
+                    )
+                )
+
+        yield from metrics[: opts.perfdata_max_labels]
+        if len(metrics) > opts.perfdata_max_labels:
+            yield Metric(
+                name="perfdata_dropped",
+                value=len(metrics) - opts.perfdata_max_labels,
+                context="performance_data",
+            )
+
+
 class PerformanceDataContext(Context):
     def __init__(self):
         super(PerformanceDataContext, self).__init__("performance_data")
@@ -1057,7 +4427,262 @@ class PerformanceDataContext(Context):
 
         :returns: :class:`Perfdata` object
         """
-        return Performance(label=metric.name, value=metric.value)
+        return Performance(label=metric.name, value=metric.value, uom=metric.uom)
+
+
+# Output: passive check results ##############################################
+
+
+def format_passive_results(
+    units: typing.Iterable[Unit],
+    host: str,
+    service: str,
+    timestamp: int,
+    required: str | None = None,
+) -> list[dict[str, typing.Any]]:
+    """Convert the state of units into passive service check results.
+
+    :param units: The units to submit.
+    :param host: The host name of the monitoring object.
+    :param service: A template for the service description. The
+      placeholder ``{unit}`` is replaced with the name of the unit.
+    :param timestamp: The time of the check in seconds since the epoch.
+    :param required: The active state the units are required to be in
+      (option ``--required``).
+    """
+    results: list[dict[str, typing.Any]] = []
+    for unit in units:
+        results.append(
+            {
+                "timestamp": timestamp,
+                "host": host,
+                "service": service.format(unit=unit.name),
+                "exit_status": int(unit.convert_to_exitcode(required)),
+                "plugin_output": "{}: {}".format(unit.name, unit.active_state),
+            }
+        )
+    return results
+
+
+def join_lines(
+    lines: typing.Iterable[bytes], size: int
+) -> typing.Generator[bytes, None, None]:
+    """Join lines to chunks of at most ``size`` bytes. The lines are not
+    split, a line that is longer than ``size`` forms a chunk of its own.
+
+    :param lines: Lines including the line terminator.
+    :param size: The maximum size of a chunk.
+    """
+    chunk = b""
+    for line in lines:
+        if chunk and len(chunk) + len(line) > size:
+            yield chunk
+            chunk = b""
+        chunk += line
+    if chunk:
+        yield chunk
+
+
+def write_external_commands(path: str, results: list[dict[str, typing.Any]]) -> None:
+    """Write ``PROCESS_SERVICE_CHECK_RESULT`` lines to the external command
+    file of Nagios / Icinga. The command file is not created, because it
+    is usually a named pipe (FIFO) that is created by the monitoring core.
+
+    The lines are written in chunks of at most ``PIPE_BUF`` bytes, because
+    only such writes to a pipe are atomic: The lines of other processes
+    that write to the same pipe do not interleave with the lines of the
+    check. The pipe is opened in non-blocking mode, so the check does not
+    hang if the monitoring core is not reading.
+
+    :param path: The path of the external command file, for example
+      ``/var/lib/nagios3/rw/nagios.cmd``.
+    :param results: Results as returned by :func:`format_passive_results`.
+
+    :raises nagiosplugin.CheckError: If no process reads the named pipe.
+    """
+    lines = (
+        "[{timestamp}] PROCESS_SERVICE_CHECK_RESULT;{host};{service};"
+        "{exit_status};{plugin_output}\n".format(**result).encode()
+        for result in results
+    )
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno == errno.ENXIO:
+            raise CheckError(
+                "No process is reading the external command file {}".format(path)
+            )
+        raise
+    try:
+        # Only the opening must not block. A full pipe is emptied by the
+        # reader.
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+        for chunk in join_lines(lines, select.PIPE_BUF):
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+class PassiveResultsResource(Resource):
+    """Submit one passive service check result per selected unit. The
+    results are written to the external command file of the monitoring core
+    and / or to a JSON file. If a snapshot is specified (option
+    ``--changes-only``), only the units whose state changed since the
+    previous run are submitted.
+
+    :param session: The session of the check.
+    :param snapshot: The snapshot of the option ``--changes-only``.
+    """
+
+    def __init__(self, session: CheckSession, snapshot: UnitSnapshot | None = None):
+        super().__init__()
+        self.session = session
+        self.snapshot = snapshot
+
+    def probe(self) -> typing.Generator[Metric, None, None]:
+        opts = self.session.opts
+        units = self.session.list_units()
+        if self.snapshot:
+            units = (
+                self.session.unit_cache.get(name)
+                for name in sorted(self.snapshot.changed & self.snapshot.units.keys())
+            )
+        results = format_passive_results(
+            units,
+            host=opts.passive_host or socket.gethostname(),
+            service=opts.passive_service,
+            timestamp=int(time.time()),
+            required=opts.required,
+        )
+        try:
+            if opts.passive_command_file:
+                write_external_commands(opts.passive_command_file, results)
+            if opts.passive_json:
+                write_file_atomically(opts.passive_json, json.dumps(results))
+        except OSError as e:
+            raise CheckError("Passive check results: {}".format(e))
+
+        if opts.performance_data:
+            yield Metric(
+                name="passive_results", value=len(results), context="performance_data"
+            )
+
+
+# Output: OpenMetrics ########################################################
+
+
+def escape_label_value(value: str) -> str:
+    """Escape a label value of the OpenMetrics text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class OpenMetricsExporter:
+    """Write the monitoring data of a check run in the `OpenMetrics text
+    format <https://openmetrics.io>`_, for example for the textfile
+    collector of the Prometheus ``node_exporter``. The same unit cache and
+    the same results as for the Nagios / Icinga output are used, so systemd
+    has to be queried only once.
+
+    :param session: The session of the check.
+    :param path: The path of the text file. The file is replaced atomically.
+    """
+
+    def __init__(self, session: CheckSession, path: str):
+        self.session = session
+        self.path = path
+
+    def format(self, check: Check) -> str:
+        """Format the metrics of a check run.
+
+        :param check: A check that has already been run.
+        """
+        lines: list[str] = []
+
+        def family(name: str, description: str) -> None:
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} gauge".format(name))
+
+        states: typing.Counter[str] = collections.Counter()
+        types: typing.Counter[str] = collections.Counter()
+        unit_lines: list[str] = []
+        for unit in self.session.unit_cache.list(exclude=self.session.opts.exclude):
+            states[unit.active_state] += 1
+            types[unit.type] += 1
+            unit_lines.append(
+                'systemd_unit_state{{name="{}",type="{}",state="{}"}} 1'.format(
+                    escape_label_value(unit.name), unit.type, unit.active_state
+                )
+            )
+
+        family("systemd_units", "Number of units by active state.")
+        for state, count in sorted(states.items()):
+            lines.append('systemd_units{{state="{}"}} {}'.format(state, count))
+
+        family("systemd_units_by_type", "Number of units by unit type.")
+        for unit_type, count in sorted(types.items()):
+            lines.append(
+                'systemd_units_by_type{{type="{}"}} {}'.format(unit_type, count)
+            )
+
+        family("systemd_unit_state", "The active state of the unit.")
+        lines += unit_lines
+
+        ages: dict[str, float] = {}
+        for resource in check.resources:
+            if isinstance(resource, TimersResource) and not resource.label:
+                ages.update(resource.ages)
+        if ages:
+            family(
+                "systemd_timer_last_trigger_age_seconds",
+                "Seconds since the timer was last triggered.",
+            )
+            for name, age in sorted(ages.items()):
+                lines.append(
+                    'systemd_timer_last_trigger_age_seconds{{name="{}"}} {}'.format(
+                        escape_label_value(name), age
+                    )
+                )
+
+        if "startup_time" in check.results:
+            family("systemd_startup_time_seconds", "The startup time of the system.")
+            lines.append(
+                "systemd_startup_time_seconds {}".format(
+                    check.results["startup_time"].metric.value
+                )
+            )
+
+        family("systemd_check_state", "The exit code of the monitoring plugin.")
+        lines.append("systemd_check_state {}".format(check.exitcode))
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def export(self, check: Check) -> None:
+        write_file_atomically(self.path, self.format(check))
+
+
+class SystemdCheck(Check):
+    """A `Check
+    <https://nagiosplugin.readthedocs.io/en/stable/api/core.html#nagiosplugin-check>`_
+    that additionally passes the evaluated check to exporters (for example
+    :class:`OpenMetricsExporter`) after all resources have been probed."""
+
+    exporters: list[OpenMetricsExporter]
+
+    def __init__(self, *objects, **kwargs):
+        self.exporters = []
+        super().__init__(*objects, **kwargs)
+
+    def __call__(self):
+        super().__call__()
+        for exporter in self.exporters:
+            try:
+                exporter.export(self)
+            except OSError as e:
+                self.results.add(
+                    Result(Unknown, "{}: {}".format(type(exporter).__name__, e))
+                )
 
 
 # Presentation: *Summary ######################################################
@@ -1066,15 +4691,157 @@ class PerformanceDataContext(Context):
 class SystemdSummary(Summary):
     """Format the different status lines. A subclass of `nagiosplugin.Summary
     <https://github.com/mpounsett/nagiosplugin/blob/master/nagiosplugin/summary.py>`_.
+
+    :param session: The session of the check.
     """
 
+    def __init__(self, session: CheckSession):
+        self.session = session
+
+    significant_contexts: typing.Tuple[str, ...] = (
+        "startup_time",
+        "units",
+        "unit_groups",
+        "unit_files",
+        "cgroup_memory",
+        "cgroup_oom_kills",
+        "cgroup_tasks",
+        "restarts",
+        "flapping",
+        "startup_profile",
+        "transitions",
+        "journal_errors",
+        "timers",
+    )
+    """The names of the contexts whose results are shown in the status
+    line."""
+
+    @classmethod
+    def is_significant(cls, result: Result) -> bool:
+        """Check if a result should be shown in the status line. Results
+        without a metric are produced by resources that raise a
+        ``CheckError``, for example if a service manager could not be
+        queried.
+
+        :param result: A result of the check.
+        """
+        if result.metric is None:
+            return True
+        return bool(result.context) and result.context.name in (
+            cls.significant_contexts
+        )
+
+    @staticmethod
+    def group(results: typing.Sequence[Result]) -> typing.List[Result]:
+        """Group the results by service manager. The results of the host
+        come first, followed by the results of the additional service
+        managers (user service managers, containers) in the order in which
+        they were checked. Within a service manager the results are
+        ordered by resource and by name, so that the output is stable.
+
+        :param results: The results to group.
+        """
+        labels: dict[str | None, int] = {None: 0}
+        resources: dict[int, int] = {}
+        for result in results:
+            label = getattr(result.resource, "label", None)
+            if label not in labels:
+                labels[label] = len(labels)
+            resources.setdefault(id(result.resource), len(resources))
+
+        def key(result: Result) -> typing.Tuple[int, int, str]:
+            return (
+                labels[getattr(result.resource, "label", None)],
+                resources[id(result.resource)],
+                result.metric.name if result.metric is not None else "",
+            )
+
+        return sorted(results, key=key)
+
+    @staticmethod
+    def format_bounded(
+        results: typing.Sequence[Result], template: str, limit: int
+    ) -> typing.List[str]:
+        """Format at most ``limit`` results. The remaining results are only
+        counted and aggregated by state and unit type, for example
+        ``+312 more failed services``.
+
+        :param results: The results to format.
+        :param template: A format string. ``{0}`` is replaced with the state
+          and ``{1}`` with the result.
+        :param limit: The maximum number of results to format. ``0``
+          formats all results.
+        """
+        if not limit or len(results) <= limit:
+            return [template.format(result.state, result) for result in results]
+
+        lines = [template.format(result.state, result) for result in results[:limit]]
+        counter: typing.Counter[typing.Tuple[str, str]] = collections.Counter()
+        for result in results[limit:]:
+            if result.metric is not None and isinstance(result.metric.value, Unit):
+                unit = result.metric.value
+                counter[(unit.active_state + " ", unit.type)] += 1
+            elif result.context:
+                counter[("", result.context.name)] += 1
+            else:
+                counter[("", "error")] += 1
+        for (state, noun), count in counter.most_common():
+            if count > 1 and not noun.endswith("s"):
+                noun += "s"
+            lines.append("+{} more {}{}".format(count, state, noun))
+        return lines
+
+    def collapse_dependents(
+        self, results: typing.Sequence[Result], annotate: bool = False
+    ) -> typing.List[Result]:
+        """Collapse the units that failed because of another unit under their
+        root cause (option ``--suppress-dependents``), for example
+        ``mnt-data.mount: failed (+12 dependents)``.
+
+        :param results: The significant results.
+        :param annotate: Keep the dependents and add their root cause to
+          the hint instead, for example ``nginx.service: failed (root
+          cause: mnt-data.mount)``.
+        """
+        shown = {
+            result.metric.name
+            for result in results
+            if isinstance(result.resource, UnitsResource) and result.state != Ok
+        }
+        if len(shown) < 2:
+            return list(results)
+        root_causes = self.session.root_causes
+        dependents: typing.Counter[str] = collections.Counter(
+            root
+            for name, root in root_causes.items()
+            if name in shown and root in shown
+        )
+        collapsed: typing.List[Result] = []
+        for result in results:
+            name = result.metric.name if result.metric is not None else None
+            if name not in shown:
+                collapsed.append(result)
+            elif name in root_causes and (annotate or root_causes[name] not in shown):
+                hint = "{} (root cause: {})".format(result.hint, root_causes[name])
+                collapsed.append(Result(result.state, hint, result.metric))
+            elif name in root_causes:
+                continue
+            elif dependents[name] and not annotate:
+                hint = "{} (+{} dependent{})".format(
+                    result.hint, dependents[name], "s" if dependents[name] > 1 else ""
+                )
+                collapsed.append(Result(result.state, hint, result.metric))
+            else:
+                collapsed.append(result)
+        return collapsed
+
     def ok(self, results: Results) -> str:
         """Formats status line when overall state is ok.
 
         :param results: :class:`~nagiosplugin.result.Results` container
         :returns: status line
         """
-        if opts.include_unit:
+        if self.session.opts.include_unit:
             for result in results.most_significant:
                 if isinstance(result.context, UnitsContext):
                     return "{0}".format(result)
@@ -1088,14 +4855,14 @@ class SystemdSummary(Summary):
         :returns: status line
         """
         summary: typing.List[Result] = []
-        for result in results.most_significant:
-            if result.context and result.context.name in [
-                "startup_time",
-                "units",
-                "timers",
-            ]:
+        for result in self.group(results.most_significant):
+            if self.is_significant(result):
                 summary.append(result)
-        return ", ".join(["{0}".format(result) for result in summary])
+        if self.session.opts.suppress_dependents:
+            summary = self.collapse_dependents(summary)
+        return ", ".join(
+            self.format_bounded(summary, "{1}", self.session.opts.max_problems)
+        )
 
     def verbose(self, results: Results) -> typing.List[str]:
         """Provides extra lines if verbose plugin execution is requested.
@@ -1104,15 +4871,47 @@ class SystemdSummary(Summary):
 
         :returns: list of strings
         """
-        summary: typing.List[str] = []
-        for result in results.most_significant:
-            if result.context and result.context.name in [
-                "startup_time",
-                "units",
-                "timers",
-            ]:
-                summary.append("{0}: {1}".format(result.state, result))
-        return summary
+        summary: typing.List[Result] = []
+        for result in self.group(results.most_significant):
+            if self.is_significant(result):
+                summary.append(result)
+        if self.session.opts.suppress_dependents:
+            summary = self.collapse_dependents(summary, annotate=True)
+        # -v: as many lines as in the status line, -vv and -vvv: all lines
+        opts = self.session.opts
+        limit = opts.max_problems if opts.verbose < 2 else 0
+        lines = self.format_bounded(summary, "{0}: {1}", limit)
+        if opts.failure_details and opts.journal_lines:
+            lines = self.add_journal(summary, lines, limit)
+        return lines
+
+    def add_journal(
+        self, results: typing.Sequence[Result], lines: typing.List[str], limit: int
+    ) -> typing.List[str]:
+        """Insert the last journal messages of the failed units (option
+        ``--failure-details``) below their lines.
+
+        :param results: The results that have been formatted.
+        :param lines: The lines formatted by :meth:`format_bounded`.
+        :param limit: The limit passed to :meth:`format_bounded`. Only the
+          first ``limit`` lines belong to a result, the remaining lines
+          aggregate the results that have not been formatted.
+        """
+        if all(result.state == Ok for result in results):
+            return lines
+        details = self.session.failure_details
+        journal_lines: typing.List[str] = []
+        formatted = len(results) if not limit else min(limit, len(results))
+        for index, line in enumerate(lines):
+            journal_lines.append(line)
+            if index >= formatted or results[index].metric is None:
+                continue
+            name = results[index].metric.name
+            if isinstance(results[index].resource, UnitsResource) and name in details:
+                for message in details[name].journal:
+                    # "|" separates the performance data.
+                    journal_lines.append("  " + message.replace("|", "/"))
+        return journal_lines
 
 
 # Command line interface (argparse) ###########################################
@@ -1154,7 +4953,17 @@ def get_argparser():
         "  - units_activating\n"
         "  - units_active\n"
         "  - units_failed\n"
-        "  - units_inactive\n",
+        "  - units_inactive\n"
+        "  - units_changed (--changes-only)\n"
+        "  - unit_files_enabled_inactive (--unit-files)\n"
+        "  - unit_files_preset_drift (--unit-files-presets)\n"
+        "  - <unit>_memory, <unit>_oom_kills, <unit>_tasks, <unit>_cpu_usec "
+        "(--cgroups)\n"
+        "  - <unit>_restarts (--restarts)\n"
+        "  - <unit>_state_changes (--flapping)\n"
+        "  - <unit>_startup_time (--startup-profile)\n"
+        "  - <unit>_transition (--transitions)\n"
+        "  - <unit>_journal_errors (--journal-errors)\n",
     )
 
     parser.add_argument(
@@ -1172,6 +4981,77 @@ def get_argparser():
         version="%(prog)s {}".format(__version__),
     )
 
+    parser.add_argument(
+        "--max-problems",
+        dest="max_problems",
+        metavar="NUMBER",
+        type=int,
+        default=10,
+        help="The maximum number of problems that are listed in the status "
+        "line and with '-v' in the long output. Further problems are "
+        "aggregated by state and unit type, for example "
+        "'+312 more failed services'. Use 0 to list all problems "
+        "(by default 10). With '-vv' or '-vvv' all problems are listed "
+        "in the long output.",
+    )
+
+    parser.add_argument(
+        "--suppress-dependents",
+        dest="suppress_dependents",
+        action="store_true",
+        help="List units that failed because a unit they depend on "
+        "(Requires=, Requisite= or BindsTo= combined with After=) failed "
+        "or is activating only under their root cause in the status line, "
+        "for example 'mnt-data.mount: failed (+12 dependents)'. The long "
+        "output names the root cause of each dependent. The exit code is "
+        "not changed.",
+    )
+
+    # Failure details #########################################################
+
+    failure_details = parser.add_argument_group("Failure details")
+
+    failure_details.add_argument(
+        "--failure-details",
+        dest="failure_details",
+        action="store_true",
+        help="Explain why the selected units failed: the result and the "
+        "exit status of the main process are added to the hints, for "
+        "example 'nginx.service: failed (exit-code, status=1)', and the "
+        "last journal messages to the long output ('-v'). The details "
+        "are only fetched for failed units.",
+    )
+
+    failure_details.add_argument(
+        "--failure-details-max",
+        dest="failure_details_max",
+        metavar="NUMBER",
+        type=int,
+        default=10,
+        help="The maximum number of failed units whose details are fetched "
+        "(default: 10).",
+    )
+
+    failure_details.add_argument(
+        "--failure-details-timeout",
+        dest="failure_details_timeout",
+        metavar="SECONDS",
+        type=float,
+        default=5.0,
+        help="The time budget to fetch the details in seconds (default: 5). "
+        "The journal messages are left out if it is exhausted.",
+    )
+
+    failure_details.add_argument(
+        "--journal-lines",
+        dest="journal_lines",
+        metavar="NUMBER",
+        type=int,
+        default=3,
+        help="The number of journal messages per failed unit (default: 3). "
+        "Use 0 to fetch no journal messages.",
+    )
+
     # Scope: units ############################################################
 
     units = parser.add_argument_group(
@@ -1244,6 +5124,56 @@ def get_argparser():
         help="One or more unit types (for example: 'service', 'timer')",
     )
 
+    units.add_argument(
+        "--compact",
+        dest="compact",
+        action="store_true",
+        default=False,
+        help="Evaluate only the units with a problem individually and fold "
+        "all healthy units into one aggregated result. This reduces the "
+        "run time on hosts with many units. The exit code, the status line "
+        "and the performance data stay the same, but the healthy units are "
+        "no longer listed in the verbose output (-v).",
+    )
+
+    units.add_argument(
+        "--group",
+        metavar=("NAME", "REGEXP"),
+        nargs=2,
+        action="append",
+        default=[],
+        help="Evaluate all units whose names match the regular expression "
+        "as one group instead of individually, for example: "
+        "--group scopes 'run-.*\\.scope'. One result and one set of "
+        "performance data is reported per group. This option can be "
+        "applied multiple times.",
+    )
+
+    units.add_argument(
+        "--group-type",
+        metavar=("NAME", "UNIT_TYPE"),
+        nargs=2,
+        action="append",
+        default=[],
+        help="Evaluate all units of a unit type as one group, for example: "
+        "--group-type mounts mount.",
+    )
+
+    units.add_argument(
+        "--group-warning",
+        metavar="PERCENT",
+        help="The percentage of failed group members to result in a "
+        "warning status, for example 2. Nagios range syntax can be used.",
+    )
+
+    units.add_argument(
+        "--group-critical",
+        metavar="PERCENT",
+        default="0",
+        help="The percentage of failed group members to result in a "
+        "critical status (by default 0: any failed member).",
+    )
+
     units.add_argument(
         "--required",
         type=str,
@@ -1298,6 +5228,243 @@ def get_argparser():
         "critical state (by default 7 days).",
     )
 
+    # Scope: unit_files #######################################################
+
+    unit_files = parser.add_argument_group("Unit files related options")
+
+    unit_files.add_argument(
+        "--unit-files",
+        dest="scope_unit_files",
+        action="store_true",
+        help="Detect enabled unit files whose units are not loaded or "
+        "inactive. Units that are triggered by another unit (socket, timer "
+        "or path units) and oneshot services without RemainAfterExit=yes "
+        "are expected to be inactive and are skipped. The output of "
+        "'systemctl list-unit-files' is cached in the state directory and "
+        "only renewed if one of the unit directories has been modified.",
+    )
+
+    unit_files.add_argument(
+        "--unit-files-presets",
+        dest="unit_files_presets",
+        action="store_true",
+        help="Additionally detect unit files whose enablement state "
+        "(enabled / disabled) differs from the vendor preset. "
+        "Implies '--unit-files'.",
+    )
+
+    # Scope: cgroups ##########################################################
+
+    cgroups = parser.add_argument_group("Control group (cgroup v2) related options")
+
+    cgroups.add_argument(
+        "--cgroups",
+        dest="scope_cgroups",
+        action="store_true",
+        help="Check the memory usage, the number of OOM kills and the "
+        "number of tasks of the selected services and report their CPU "
+        "time. The values are read directly from the cgroup v2 "
+        "directories of the services (memory.current, memory.events, "
+        "cpu.stat, pids.current).",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-root",
+        dest="cgroup_root",
+        metavar="PATH",
+        default="/sys/fs/cgroup",
+        help="The mount point of the cgroup v2 hierarchy "
+        "(by default /sys/fs/cgroup).",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-memory-warning",
+        dest="cgroup_memory_warning",
+        metavar="BYTES",
+        help="The warning threshold (Nagios range) of the memory usage in bytes "
+        "of a service.",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-memory-critical",
+        dest="cgroup_memory_critical",
+        metavar="BYTES",
+        help="The critical threshold (Nagios range) of the memory usage in bytes "
+        "of a service.",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-oom-kills-warning",
+        dest="cgroup_oom_kills_warning",
+        metavar="NUMBER",
+        default="0",
+        help="The warning threshold (Nagios range) of the number of OOM kills "
+        "of a service since its start. By default any OOM kill results in a "
+        "warning.",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-oom-kills-critical",
+        dest="cgroup_oom_kills_critical",
+        metavar="NUMBER",
+        help="The critical threshold (Nagios range) of the number of OOM kills "
+        "of a service.",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-tasks-warning",
+        dest="cgroup_tasks_warning",
+        metavar="NUMBER",
+        help="The warning threshold (Nagios range) of the number of tasks "
+        "of a service.",
+    )
+
+    cgroups.add_argument(
+        "--cgroup-tasks-critical",
+        dest="cgroup_tasks_critical",
+        metavar="NUMBER",
+        help="The critical threshold (Nagios range) of the number of tasks "
+        "of a service.",
+    )
+
+    # Scope: restarts #########################################################
+
+    restarts = parser.add_argument_group("Restart loop related options")
+
+    restarts.add_argument(
+        "--restarts",
+        dest="scope_restarts",
+        action="store_true",
+        help="Check the restart rates of the selected services. The number "
+        "of automatic restarts (property NRestarts) is compared with the "
+        "number of the previous run, which is stored in the state directory. "
+        "The first run after a boot only stores the numbers.",
+    )
+
+    restarts.add_argument(
+        "--restarts-warning",
+        dest="restarts_warning",
+        metavar="RESTARTS_PER_HOUR",
+        default="12",
+        help="The warning threshold (Nagios range) of the restarts per hour "
+        "of a service (default: 12).",
+    )
+
+    restarts.add_argument(
+        "--restarts-critical",
+        dest="restarts_critical",
+        metavar="RESTARTS_PER_HOUR",
+        help="The critical threshold (Nagios range) of the restarts per hour "
+        "of a service.",
+    )
+
+    # Scope: flapping #########################################################
+
+    flapping = parser.add_argument_group("Flapping related options")
+
+    flapping.add_argument(
+        "--flapping",
+        dest="scope_flapping",
+        action="store_true",
+        help="Check whether the selected units change their state "
+        "frequently. The states of all units are stored in a history "
+        "file in the state directory on each run. The history is reset "
+        "on each boot.",
+    )
+
+    flapping.add_argument(
+        "--flapping-window",
+        dest="flapping_window",
+        metavar="RUNS",
+        type=int,
+        default=10,
+        choices=range(2, HISTORY_CAPACITY + 1),
+        help="The number of recent runs in which the state changes are "
+        "counted (default: 10, maximum: {}).".format(HISTORY_CAPACITY),
+    )
+
+    flapping.add_argument(
+        "--flapping-warning",
+        dest="flapping_warning",
+        metavar="STATE_CHANGES",
+        default="3",
+        help="The warning threshold (Nagios range) of the state changes of "
+        "a unit in the recent runs (default: 3).",
+    )
+
+    flapping.add_argument(
+        "--flapping-critical",
+        dest="flapping_critical",
+        metavar="STATE_CHANGES",
+        help="The critical threshold (Nagios range) of the state changes of "
+        "a unit in the recent runs.",
+    )
+
+    # Scope: transitions ######################################################
+
+    transitions = parser.add_argument_group("Transitional states related options")
+
+    transitions.add_argument(
+        "--transitions",
+        dest="scope_transitions",
+        action="store_true",
+        help="Check how long the selected units have been activating, "
+        "deactivating or reloading. Units can hang in these states "
+        "forever, for example if a start job waits for a device that "
+        "never appears.",
+    )
+
+    transitions.add_argument(
+        "--transitions-warning",
+        dest="transitions_warning",
+        metavar="SECONDS",
+        default="300",
+        help="The warning threshold (Nagios range) of the time a unit has "
+        "been in a transitional state (default: 300).",
+    )
+
+    transitions.add_argument(
+        "--transitions-critical",
+        dest="transitions_critical",
+        metavar="SECONDS",
+        default="1800",
+        help="The critical threshold (Nagios range) of the time a unit has "
+        "been in a transitional state (default: 1800).",
+    )
+
+    # Scope: journal_errors ###################################################
+
+    journal_errors = parser.add_argument_group("Journal related options")
+
+    journal_errors.add_argument(
+        "--journal-errors",
+        dest="scope_journal_errors",
+        action="store_true",
+        help="Check the error rates (messages with the priority err or "
+        "higher per hour) of the selected units in the journal. Only the "
+        "journal entries since the previous run are read, the cursor is "
+        "stored in the state directory. The output of journalctl is "
+        "buffered in memory, so a burst of errors since the previous run "
+        "increases the memory usage accordingly.",
+    )
+
+    journal_errors.add_argument(
+        "--journal-errors-warning",
+        dest="journal_errors_warning",
+        metavar="ERRORS_PER_HOUR",
+        default="60",
+        help="The warning threshold (Nagios range) of the journal errors per "
+        "hour of a unit (default: 60).",
+    )
+
+    journal_errors.add_argument(
+        "--journal-errors-critical",
+        dest="journal_errors_critical",
+        metavar="ERRORS_PER_HOUR",
+        help="The critical threshold (Nagios range) of the journal errors per "
+        "hour of a unit.",
+    )
+
     # Scope: startup_time #####################################################
 
     startup_time = parser.add_argument_group("Startup time related options")
@@ -1332,6 +5499,55 @@ def get_argparser():
         " default is 120 seconds.",
     )
 
+    startup_time.add_argument(
+        "--startup-profile",
+        dest="scope_startup_profile",
+        action="store_true",
+        help="Report the activation times of the selected units that were "
+        "the slowest ones during the boot (systemd-analyze blame). The "
+        "profile is stored in the state directory until the next boot.",
+    )
+
+    startup_time.add_argument(
+        "--startup-profile-top",
+        dest="startup_profile_top",
+        metavar="NUMBER",
+        type=int,
+        default=5,
+        help="The number of the slowest units that are reported " "(default: 5).",
+    )
+
+    startup_time.add_argument(
+        "--startup-profile-warning",
+        dest="startup_profile_warning",
+        metavar="SECONDS",
+        help="The warning threshold (Nagios range) of the activation time of "
+        "a unit.",
+    )
+
+    startup_time.add_argument(
+        "--startup-profile-critical",
+        dest="startup_profile_critical",
+        metavar="SECONDS",
+        help="The critical threshold (Nagios range) of the activation time "
+        "of a unit.",
+    )
+
+    startup_time.add_argument(
+        "--startup-profile-threshold",
+        dest="startup_profile_thresholds",
+        metavar=("UNIT", "WARNING", "CRITICAL"),
+        nargs=3,
+        action="append",
+        default=[],
+        help="The warning and the critical threshold (Nagios ranges) of the "
+        "activation time of one unit, for example: "
+        "--startup-profile-threshold nginx.service 10 30. An empty string "
+        "disables a threshold. The unit is reported even if it is not "
+        "among the slowest units. This option can be applied multiple "
+        "times.",
+    )
+
     # Backend #################################################################
 
     acquisition = parser.add_argument_group("Monitoring data acquisition")
@@ -1349,6 +5565,18 @@ def get_argparser():
         "only partially implemented.",
     )
 
+    acquisition_exclusive_group.add_argument(
+        "--data-source",
+        dest="data_source",
+        choices=("auto", "dbus", "cli"),
+        help="The data source to monitor systemd. 'auto' probes once per "
+        "boot which data sources work on this host (D-Bus bindings, "
+        "reachability of the system bus, JSON output of systemctl) and "
+        "selects the cheapest one for the enabled features. The selected "
+        "data source is reported "
+        "in the performance data (data_source).",
+    )
+
     acquisition_exclusive_group.add_argument(
         "--cli",
         dest="data_source",
@@ -1366,6 +5594,149 @@ def get_argparser():
         help="Also show user (systemctl --user) units.",
     )
 
+    acquisition.add_argument(
+        "--user-managers",
+        dest="user_managers",
+        action="store_true",
+        default=False,
+        help="Check the units of all running user service managers "
+        "(user@UID.service) in addition to the system units. The user "
+        "service managers are queried concurrently using "
+        "'systemctl --user --machine=USER@'.",
+    )
+
+    acquisition.add_argument(
+        "--machines",
+        dest="machines",
+        metavar="MACHINE",
+        nargs="*",
+        help="Check the units (and the timers if '--timers' is specified) "
+        "of local containers in addition to the units of the host. The "
+        "containers are queried concurrently using "
+        "'systemctl --machine=MACHINE'. If no machine names are "
+        "specified, all running containers listed by 'machinectl list' "
+        "are checked.",
+    )
+
+    acquisition.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        metavar="NUMBER",
+        type=int,
+        default=8,
+        help="The maximum number of service managers that are queried "
+        "concurrently (by default 8).",
+    )
+
+    record_replay = acquisition.add_mutually_exclusive_group()
+
+    record_replay.add_argument(
+        "--record",
+        dest="record",
+        metavar="FILE",
+        help="Record the raw output of all commands and the replies of the "
+        "D-Bus API into a compact file, for example to reproduce a check "
+        "on another host with '--replay'.",
+    )
+
+    record_replay.add_argument(
+        "--replay",
+        dest="replay",
+        metavar="FILE",
+        help="Evaluate the data of a file written by '--record' instead of "
+        "querying systemd. The same options (for example '--dbus', "
+        "'--timers') as for the recording have to be specified.",
+    )
+
+    # Passive check results ###################################################
+
+    passive = parser.add_argument_group(
+        "Passive check results",
+        "Submit one passive service check result per selected unit in "
+        "addition to the\nnormal plugin output.",
+    )
+
+    passive.add_argument(
+        "--passive-command-file",
+        dest="passive_command_file",
+        metavar="FILE",
+        help="The external command file (FIFO) of Nagios / Icinga to which "
+        "the PROCESS_SERVICE_CHECK_RESULT commands are written, for "
+        "example /var/run/icinga2/cmd/icinga2.cmd.",
+    )
+
+    passive.add_argument(
+        "--passive-json",
+        dest="passive_json",
+        metavar="FILE",
+        help="Write the passive check results as a JSON list into this " "file.",
+    )
+
+    passive.add_argument(
+        "--passive-host",
+        dest="passive_host",
+        metavar="HOST",
+        help="The host name of the passive check results (by default the "
+        "host name of this machine).",
+    )
+
+    passive.add_argument(
+        "--passive-service",
+        dest="passive_service",
+        metavar="TEMPLATE",
+        default="{unit}",
+        help="A template for the service description of the passive check "
+        "results. The placeholder '{unit}' is replaced with the name of "
+        "the unit (by default '{unit}').",
+    )
+
+    # OpenMetrics #############################################################
+
+    openmetrics = parser.add_argument_group("OpenMetrics")
+
+    openmetrics.add_argument(
+        "--openmetrics-file",
+        dest="openmetrics_file",
+        metavar="FILE",
+        help="Additionally write the monitoring data in the OpenMetrics text "
+        "format into this file, for example for the textfile collector of "
+        "the Prometheus node_exporter. The file is replaced atomically.",
+    )
+
+    # Persistent state ########################################################
+
+    state = parser.add_argument_group("Persistent state")
+
+    state.add_argument(
+        "--state-dir",
+        dest="state_dir",
+        metavar="DIRECTORY",
+        help="The directory in which data is stored between two runs of "
+        "the plugin (by default /var/tmp/check_systemd-UID).",
+    )
+
+    state.add_argument(
+        "--changes-only",
+        dest="changes_only",
+        action="store_true",
+        default=False,
+        help="Store a digest of the unit states in the state directory and "
+        "evaluate only the units whose state changed since the last run "
+        "and the units that had a problem. The number of changed units is "
+        "reported as the performance data 'units_changed'.",
+    )
+
+    state.add_argument(
+        "--boot-cache",
+        dest="boot_cache",
+        action="store_true",
+        default=False,
+        help="Store the startup time in the state directory after it has "
+        "been determined once. It does not change until the next boot, so "
+        "'systemd-analyze' is not executed again. The startup time of an "
+        "unfinished boot is not stored.",
+    )
+
     # Performance data ########################################################
 
     perf_data = parser.add_argument_group("Performance data")
@@ -1388,11 +5759,64 @@ def get_argparser():
         help="Attach performance data to the plugin output.",
     )
 
+    perf_data.add_argument(
+        "--perfdata-units",
+        dest="perfdata_units",
+        action="store_true",
+        default=False,
+        help="Attach the active state of each selected unit as a numeric "
+        "code (active=0, reloading=1, inactive=2, failed=3, activating=4, "
+        "deactivating=5) and the age of each timer in seconds (with "
+        "'--timers').",
+    )
+
+    perf_data.add_argument(
+        "--perfdata-types",
+        dest="perfdata_types",
+        action="store_true",
+        default=False,
+        help="Attach the number of selected units per unit type and active "
+        "state, for example 'units_service_failed'.",
+    )
+
+    perf_data.add_argument(
+        "--perfdata-top",
+        dest="perfdata_top",
+        metavar="NUMBER",
+        type=int,
+        default=0,
+        help="Attach the performance data of '--perfdata-units' only for "
+        "the units with the most severe states and for the oldest timers "
+        "(by default 0: all units).",
+    )
+
+    perf_data.add_argument(
+        "--perfdata-max-labels",
+        dest="perfdata_max_labels",
+        metavar="NUMBER",
+        type=int,
+        default=100,
+        help="The maximum number of labels of '--perfdata-units' and "
+        "'--perfdata-types'. The number of dropped labels is reported as "
+        "'perfdata_dropped' (by default 100).",
+    )
+
+    perf_data.add_argument(
+        "--perfdata-label-template",
+        dest="perfdata_label_template",
+        metavar="TEMPLATE",
+        default="unit_{name}",
+        help="The template for the labels of '--perfdata-units'. The "
+        "placeholders '{name}' (nginx.service), '{stem}' (nginx) and "
+        "'{type}' (service) are replaced (by default 'unit_{name}').",
+    )
+
     return parser
 
 
 def normalize_argparser(opts: argparse.Namespace) -> argparse.Namespace:
-    if opts.data_source == "dbus" and not is_gi:
+    # A recording of the D-Bus API can be replayed without D-Bus bindings.
+    if opts.data_source == "dbus" and not is_gi and not opts.replay:
         opts.data_source = "cli"
 
     opts.include = convert_to_regexp_list(
@@ -1407,14 +5831,24 @@ def normalize_argparser(opts: argparse.Namespace) -> argparse.Namespace:
     del opts.exclude_type
     del opts.exclude_unit
 
+    opts.groups = [tuple(group) for group in opts.group]
+    for name, unit_type in opts.group_type:
+        opts.groups.append((name, SystemdUnitTypesList(unit_type).convert_to_regexp()))
+    del opts.group
+    del opts.group_type
+
+    if opts.unit_files_presets:
+        opts.scope_unit_files = True
+
     return opts
 
 
-@nagiosplugin.guarded(verbose=0)
-def main():
-    """The main entry point of the monitoring plugin. First the command line
-    arguments are read into the variable ``opts``. The configuration of this
-    ``opts`` object decides which instances of the `Resource
+# Python API ##################################################################
+
+
+def create_check(session: CheckSession) -> SystemdCheck:
+    """Assemble the check. The options of the session decide which
+    instances of the `Resource
     <https://github.com/mpounsett/nagiosplugin/blob/master/nagiosplugin/resource.py>`_,
     `Context
     <https://github.com/mpounsett/nagiosplugin/blob/master/nagiosplugin/context.py>`_
@@ -1424,45 +5858,238 @@ def main():
     the main class of the ``nagiosplugin`` library: the `Check
     <https://nagiosplugin.readthedocs.io/en/stable/api/core.html#nagiosplugin-check>`_
     class.
+
+    :param session: The session of the check.
     """
-    global opts
-    opts = get_argparser().parse_args()
-    opts = normalize_argparser(opts)
+    opts = session.opts
 
-    global unit_cache
-    if opts.data_source == "dbus":
-        unit_cache = DbusUnitCache()
-    else:
-        unit_cache = CliUnitCache(with_user_units=opts.with_user_units)
+    snapshot = None
+    if opts.changes_only and not opts.include_unit:
+        snapshot = UnitSnapshot(
+            session, session.list_units(exclude=session.units_exclude)
+        )
 
     tasks: typing.List[object] = [
-        UnitsResource(),
-        UnitsContext(),
-        SystemdSummary(),
+        UnitsResource(
+            session, snapshot, compact=opts.compact and not opts.include_unit
+        ),
+        UnitsContext(session),
+        UnitsHealthyContext(),
+        SystemdSummary(session),
     ]
 
+    if opts.groups:
+        tasks += [
+            UnitGroupsResource(session),
+            UnitGroupsContext(session),
+        ]
+
+    if opts.scope_unit_files:
+        tasks += [
+            UnitFilesResource(session),
+            UnitFilesContext(),
+        ]
+
+    if opts.scope_cgroups:
+        tasks += [
+            CgroupsResource(session),
+            CgroupContext(
+                session,
+                "cgroup_memory",
+                "{unit}: memory {value}B",
+                opts.cgroup_memory_warning,
+                opts.cgroup_memory_critical,
+            ),
+            CgroupContext(
+                session,
+                "cgroup_oom_kills",
+                "{unit}: {value} OOM kills",
+                opts.cgroup_oom_kills_warning,
+                opts.cgroup_oom_kills_critical,
+            ),
+            CgroupContext(
+                session,
+                "cgroup_tasks",
+                "{unit}: {value} tasks",
+                opts.cgroup_tasks_warning,
+                opts.cgroup_tasks_critical,
+            ),
+        ]
+
+    if opts.scope_restarts:
+        tasks += [
+            RestartsResource(session),
+            RestartsContext(session, opts.restarts_warning, opts.restarts_critical),
+        ]
+
+    if opts.scope_flapping:
+        tasks += [
+            FlappingResource(session),
+            FlappingContext(session, opts.flapping_warning, opts.flapping_critical),
+        ]
+
+    if opts.scope_transitions:
+        tasks += [
+            TransitionsResource(session),
+            TransitionsContext(
+                session, opts.transitions_warning, opts.transitions_critical
+            ),
+        ]
+
+    if opts.scope_journal_errors:
+        tasks += [
+            JournalErrorsResource(session),
+            JournalErrorsContext(
+                session, opts.journal_errors_warning, opts.journal_errors_critical
+            ),
+        ]
+
+    if opts.scope_startup_profile:
+        tasks += [
+            StartupProfileResource(session),
+            StartupProfileContext(
+                session,
+                opts.startup_profile_warning,
+                opts.startup_profile_critical,
+                opts.startup_profile_thresholds,
+            ),
+        ]
+
     if opts.scope_startup_time:
         tasks += [
-            StartupTimeResource(),
-            StartupTimeContext(),
+            StartupTimeResource(session),
+            StartupTimeContext(session),
         ]
 
+    timers_resource = None
     if opts.scope_timers:
+        timers_resource = TimersResource(session)
         tasks += [
-            TimersResource(),
+            timers_resource,
             TimersContext(),
         ]
 
     if opts.performance_data:
         tasks += [
-            PerformanceDataResource(),
-            PerformanceDataDataSourceResource(),
+            PerformanceDataResource(session),
+            PerformanceDataDataSourceResource(session),
             PerformanceDataContext(),
         ]
+        if snapshot:
+            tasks.append(PerformanceDataChangesResource(snapshot))
+        if opts.perfdata_units or opts.perfdata_types:
+            tasks.append(UnitPerformanceDataResource(session, timers_resource))
+
+    if opts.passive_command_file or opts.passive_json:
+        tasks.append(PassiveResultsResource(session, snapshot))
+
+    if opts.user_managers:
+        caches = get_user_manager_caches(session.unit_cache, opts.max_workers)
+        for label, cache in caches.items():
+            tasks.append(ManagerUnitsResource(session, label, cache))
+            if opts.performance_data and isinstance(cache, UnitCache):
+                tasks.append(
+                    PerformanceDataResource(
+                        session, cache, prefix=re.sub(r"\W", "_", label) + "_"
+                    )
+                )
 
-    check = Check(*tasks)
+    if opts.machines is not None:
+        machines = opts.machines or get_machines()
+        caches = get_machine_caches(machines, opts.max_workers)
+        for machine, cache in caches.items():
+            tasks.append(ManagerUnitsResource(session, machine, cache))
+            if opts.scope_timers and isinstance(cache, UnitCache):
+                tasks.append(TimersResource(session, machine=machine, label=machine))
+            if opts.performance_data and isinstance(cache, UnitCache):
+                tasks.append(
+                    PerformanceDataResource(
+                        session, cache, prefix=re.sub(r"\W", "_", machine) + "_"
+                    )
+                )
+
+    check = SystemdCheck(*tasks)
     check.name = "systemd"
-    check.main(opts.verbose)
+    if opts.openmetrics_file:
+        check.exporters.append(OpenMetricsExporter(session, opts.openmetrics_file))
+    return check
+
+
+class CheckResult:
+    """The structured result of a check run, as returned by
+    :func:`run_check`.
+
+    :param check: A check that has already been run.
+    """
+
+    state: ServiceState
+    """The overall state, for example ``Critical``."""
+
+    exitcode: int
+    """The Nagios compatible exit code: 0, 1, 2, 3"""
+
+    summary: str
+    """The status line without the performance data."""
+
+    details: list[str]
+    """The additional lines of the verbose output."""
+
+    performance_data: list[str]
+    """The performance data sorted by label, for example
+    ``units_failed=1``."""
+
+    results: Results
+    """The results of all contexts."""
+
+    def __init__(self, check: SystemdCheck):
+        self.state = check.state
+        self.exitcode = check.exitcode
+        self.summary = check.summary_str
+        self.details = list(check.verbose_str or [])
+        self.performance_data = check.perfdata
+        self.results = check.results
+
+    def __repr__(self) -> str:
+        return "CheckResult({}: {})".format(self.state, self.summary)
+
+
+def run_check(
+    argv: typing.Sequence[str] = (), unit_cache: UnitCache | None = None
+) -> CheckResult:
+    """Run a check without printing the output and without exiting the
+    Python process. Each call has its own :class:`CheckSession`, so checks
+    with different options can be run concurrently, for example in a
+    thread pool of a resident agent.
+
+    .. code-block:: python
+
+        result = run_check(["--unit", "nginx.service"])
+        if result.exitcode != 0:
+            print(result.summary)
+
+    :param argv: The command line arguments, for example
+      ``["--exclude", "user@.*"]``.
+    :param unit_cache: An already filled unit cache. By default the unit
+      cache is filled using the data source of the options.
+    """
+    opts = normalize_argparser(get_argparser().parse_args(list(argv)))
+    session = CheckSession(opts, unit_cache)
+    with session.acquisition():
+        check = create_check(session)
+        check()
+    return CheckResult(check)
+
+
+@nagiosplugin.guarded(verbose=0)
+def main():
+    """The main entry point of the monitoring plugin. The command line
+    arguments are read into a :class:`CheckSession` and the check assembled
+    by :func:`create_check` is run by the runtime of the ``nagiosplugin``
+    library, which prints the output and exits with the exit code."""
+    opts = normalize_argparser(get_argparser().parse_args())
+    session = CheckSession(opts)
+    with session.acquisition():
+        create_check(session).main(opts.verbose)
 
 
 if __name__ == "__main__":
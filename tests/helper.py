@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import collections
+import contextlib
+import fnmatch
 import io
+import json
 import os
+import tempfile
+import threading
 import typing
 from contextlib import redirect_stderr, redirect_stdout
 from os import path
@@ -31,7 +37,7 @@ class AddBin(object):
         BIN = os.path.abspath(os.path.join(os.path.dirname(__file__), self.bin_path))
         os.environ["PATH"] = BIN + ":" + os.environ["PATH"]
 
-    def __exit__(self) -> None:
+    def __exit__(self, *args: object) -> None:
         os.environ["PATH"] = self.old_path
 
 
@@ -227,6 +233,370 @@ def execute_main(
     )
 
 
+def execute_main_with_bin(
+    argv: list[str] = ["check_systemd.py"], bin_path: str = "bin"
+) -> MockResult:
+    """Execute the main function with stand-in binaries instead of a mocked
+    ``subprocess.Popen``. The stand-in binaries (for example ``systemctl``)
+    are shell scripts that print the text files of the folder
+    ``cli_output``.
+
+    :param argv: A list of command line arguments.
+
+    :param bin_path: The folder of the stand-in binaries relative to the
+        test folder.
+    """
+    if not argv or argv[0] != "check_systemd.py":
+        argv.insert(0, "check_systemd.py")
+    with mock.patch("sys.exit") as sys_exit, mock.patch("sys.argv", argv), AddBin(
+        bin_path
+    ):
+        file_stdout: io.StringIO = io.StringIO()
+        file_stderr: io.StringIO = io.StringIO()
+        with redirect_stdout(file_stdout), redirect_stderr(file_stderr):
+            check_systemd.main()
+
+    return MockResult(
+        sys_exit_mock=sys_exit,
+        stdout=file_stdout.getvalue(),
+        stderr=file_stderr.getvalue(),
+    )
+
+
+SERVICE_PROPERTIES = (
+    "NRestarts",
+    "ExecMainStartTimestampMonotonic",
+    "ExecMainStatus",
+    "ExecMainCode",
+    "Result",
+)
+"""Properties of the interface ``org.freedesktop.systemd1.Service``."""
+
+
+class FakeSystemd:
+    """An in-process stand-in for the system service manager. The command
+    line interface (as a side effect of ``subprocess.Popen``) and the D-Bus
+    API (as a replacement of ``DBusProxy``) are served from the same
+    units, so both data sources can be compared on identical data.
+
+    :param units: The units as dictionaries with the D-Bus property names
+      ``Id``, ``LoadState``, ``ActiveState``, ``SubState`` and
+      ``Description`` and optionally further properties, for example
+      ``NRestarts``.
+    """
+
+    units: dict[str, dict[str, typing.Any]]
+
+    calls: typing.Counter[str]
+    """The number of round trips per data source (``cli`` and ``dbus``)."""
+
+    commands: list[list[str]]
+    """The executed commands."""
+
+    version: str = "252.22-1~deb12u1"
+    """The version of systemd."""
+
+    json_output: bool = True
+    """Support ``systemctl list-units --output=json``."""
+
+    journal: list[dict[str, typing.Any]]
+    """The entries of the journal as printed by ``journalctl
+    --output=json``. The cursor of an entry is its index. ``--since``
+    compares ``__REALTIME_TIMESTAMP`` (microseconds) if it is set."""
+
+    def __init__(self, units: typing.Iterable[dict[str, typing.Any]]) -> None:
+        self.units = {unit["Id"]: unit for unit in units}
+        self.calls = collections.Counter()
+        self.commands = []
+        self.journal = []
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def unit(
+        name: str, active_state: str = "active", **properties: typing.Any
+    ) -> dict[str, typing.Any]:
+        """Build a loaded unit. The sub state is derived from the active
+        state, further properties (for example ``NRestarts``) are passed as
+        keyword arguments.
+
+        :param name: The name of the unit, for example ``nginx.service``.
+        :param active_state: The active state of the unit, for example
+          ``failed``.
+        """
+        return dict(
+            {
+                "Id": name,
+                "LoadState": "loaded",
+                "ActiveState": active_state,
+                "SubState": {"active": "running", "inactive": "dead"}.get(
+                    active_state, active_state
+                ),
+                "Description": name,
+            },
+            **properties,
+        )
+
+    @classmethod
+    def from_fixture(cls, file_name: str) -> FakeSystemd:
+        """Load the units from a ``systemctl list-units`` text file of the
+        folder ``cli_output``."""
+        table = check_systemd.TableParser(convert_to_bytes(file_name).decode())
+        return cls(
+            {
+                "Id": row["unit"],
+                "LoadState": row["load"],
+                "ActiveState": row["active"],
+                "SubState": row["sub"],
+                "Description": row["description"],
+            }
+            for row in table.list_rows()
+        )
+
+    @classmethod
+    def generate(cls, count: int) -> FakeSystemd:
+        """Generate synthetic units: every 50th unit is failed, every 7th
+        unit is inactive."""
+        types = ("service", "socket", "timer", "mount", "target")
+        units: list[dict[str, typing.Any]] = []
+        for i in range(count):
+            active_state, sub_state = "active", "running"
+            if i % 50 == 49:
+                active_state, sub_state = "failed", "failed"
+            elif i % 7 == 6:
+                active_state, sub_state = "inactive", "dead"
+            units.append(
+                {
+                    "Id": "unit{:05d}.{}".format(i, types[i % len(types)]),
+                    "LoadState": "loaded",
+                    "ActiveState": active_state,
+                    "SubState": sub_state,
+                    "Description": "Synthetic unit {}".format(i),
+                }
+            )
+        return cls(units)
+
+    def __count(self, data_source: str) -> None:
+        with self.__lock:
+            self.calls[data_source] += 1
+
+    def get_properties(self, name: str, interface: str) -> dict[str, typing.Any]:
+        unit = self.units[name]
+        if interface == "Unit":
+            return {k: v for k, v in unit.items() if k not in SERVICE_PROPERTIES}
+        if interface == "Service":
+            properties = {"NRestarts": 0}
+            properties.update((k, unit[k]) for k in SERVICE_PROPERTIES if k in unit)
+            return properties
+        return {}
+
+    # Command line interface
+
+    def select_units(self, args: list[str]) -> list[dict[str, typing.Any]]:
+        """Apply the options ``--type=`` and the patterns of ``systemctl
+        list-units``."""
+        units = list(self.units.values())
+        for arg in args:
+            if arg.startswith("--type="):
+                types = arg.split("=", 1)[1].split(",")
+                units = [u for u in units if u["Id"].rsplit(".", 1)[-1] in types]
+        if "--" in args:
+            patterns = args[args.index("--") + 1 :]
+            units = [
+                u for u in units if any(fnmatch.fnmatch(u["Id"], p) for p in patterns)
+            ]
+        return units
+
+    def format_list_units(self, units: list[dict[str, typing.Any]]) -> str:
+        if not units:
+            return "0 loaded units listed.\n"
+        columns = ("Id", "LoadState", "ActiveState", "SubState")
+        headers = ("UNIT", "LOAD", "ACTIVE", "SUB")
+        widths = [
+            max([len(header)] + [len(unit[column]) for unit in units]) + 1
+            for column, header in zip(columns, headers)
+        ]
+        lines = ["".join(h.ljust(w) for h, w in zip(headers, widths)) + "DESCRIPTION"]
+        for unit in units:
+            lines.append(
+                "".join(unit[c].ljust(w) for c, w in zip(columns, widths))
+                + unit["Description"]
+            )
+        lines += ["", "{} loaded units listed.".format(len(units))]
+        return "\n".join(lines) + "\n"
+
+    def format_list_units_json(self, units: list[dict[str, typing.Any]]) -> str:
+        return json.dumps(
+            [
+                {
+                    "unit": unit["Id"],
+                    "load": unit["LoadState"],
+                    "active": unit["ActiveState"],
+                    "sub": unit["SubState"],
+                    "description": unit["Description"],
+                }
+                for unit in units
+            ]
+        )
+
+    def format_show(self, properties: list[str], names: list[str]) -> str:
+        records: list[str] = []
+        for name in names:
+            values = self.get_properties(name, "Unit")
+            values.update(self.get_properties(name, name.rsplit(".", 1)[-1].title()))
+            records.append(
+                "".join(
+                    "{}={}\n".format(p, self.format_show_value(values[p]))
+                    for p in properties
+                    if p in values
+                )
+            )
+        return "\n".join(records)
+
+    @staticmethod
+    def format_show_value(value: typing.Any) -> str:
+        if isinstance(value, list):
+            return " ".join(value)
+        if isinstance(value, bool):
+            return "yes" if value else "no"
+        return str(value)
+
+    def popen(self, args: list[str], **kwargs: typing.Any) -> Mock:
+        """Use this method as the side effect of ``subprocess.Popen``."""
+        self.__count("cli")
+        self.commands.append(args)
+        if args == ["systemctl", "--version"]:
+            return MPopen(
+                stdout="systemd {} ({})".format(self.version[:3], self.version)
+            )
+        if args[:2] == ["systemctl", "list-units"]:
+            units = self.select_units(args)
+            if "--output=json" in args and self.json_output:
+                return MPopen(stdout=self.format_list_units_json(units))
+            return MPopen(stdout=self.format_list_units(units))
+        if args[:2] == ["systemctl", "show"]:
+            properties = args[2].split("=", 1)[1].split(",")
+            names = args[args.index("--") + 1 :]
+            return MPopen(stdout=self.format_show(properties, names))
+        if args[0] == "journalctl":
+            return MPopen(stdout=self.format_journal(args))
+        raise AssertionError("Unexpected command: {}".format(args))
+
+    def format_journal(self, args: typing.Sequence[str]) -> str:
+        options = dict(a[2:].split("=", 1) for a in args if "=" in a)
+        units = [a.split("=", 1)[1] for a in args if a.startswith("--unit=")]
+        entries = [
+            dict(entry, __CURSOR=str(index))
+            for index, entry in enumerate(self.journal)
+            if not units or entry.get("UNIT", entry.get("_SYSTEMD_UNIT")) in units
+        ]
+        if "after-cursor" in options:
+            entries = [
+                e for e in entries if int(e["__CURSOR"]) > int(options["after-cursor"])
+            ]
+        if "priority" in options:
+            low, high = options["priority"].split("..")
+            entries = [
+                e for e in entries if int(low) <= int(e.get("PRIORITY", 6)) <= int(high)
+            ]
+        if "since" in options:
+            since = int(options["since"].lstrip("@")) * 1_000_000
+            entries = [
+                e for e in entries if int(e.get("__REALTIME_TIMESTAMP", since)) >= since
+            ]
+        if "lines" in options:
+            entries = entries[-int(options["lines"]) :]
+        return "\n".join(json.dumps(entry) for entry in entries)
+
+    # D-Bus
+
+    def new_for_bus_sync(
+        self,
+        bus_type: object,
+        flags: int,
+        info: object,
+        name: str,
+        object_path: str,
+        interface_name: str,
+        cancellable: object,
+    ) -> Mock:
+        """Use this method as a replacement of
+        ``DBusProxy.new_for_bus_sync``."""
+        proxy = Mock()
+        if interface_name == "org.freedesktop.systemd1.Manager":
+            proxy.ListUnits.side_effect = self.__list_units
+            proxy.GetUnit.side_effect = self.__get_unit
+            proxy.get_cached_property.side_effect = lambda name: Mock(
+                unpack=Mock(return_value=self.version)
+            )
+        else:
+            unit_name = object_path.rsplit("/", 1)[-1]
+            proxy.GetAll.side_effect = lambda signature, interface, **kwargs: (
+                self.__get_all(unit_name, interface)
+            )
+        return proxy
+
+    def __list_units(self) -> list[tuple]:
+        self.__count("dbus")
+        return [
+            (
+                unit["Id"],
+                unit["Description"],
+                unit["LoadState"],
+                unit["ActiveState"],
+                unit["SubState"],
+                "",
+                "/org/freedesktop/systemd1/unit/" + unit["Id"],
+                0,
+                "",
+                "/",
+            )
+            for unit in self.units.values()
+        ]
+
+    def __get_unit(self, signature: str, name: str, **kwargs: typing.Any) -> str:
+        self.__count("dbus")
+        return "/org/freedesktop/systemd1/unit/" + name
+
+    def __get_all(self, unit_name: str, interface: str) -> dict[str, typing.Any]:
+        self.__count("dbus")
+        return self.get_properties(unit_name, interface.rsplit(".", 1)[-1])
+
+    @contextlib.contextmanager
+    def serve(self) -> typing.Iterator[None]:
+        """Patch ``subprocess.Popen`` and the D-Bus bindings."""
+        proxy_class = Mock()
+        proxy_class.new_for_bus_sync.side_effect = self.new_for_bus_sync
+        with mock.patch(
+            "check_systemd.subprocess.Popen", side_effect=self.popen
+        ), mock.patch("check_systemd.is_gi", True), mock.patch(
+            "check_systemd.DBusProxy", proxy_class, create=True
+        ), mock.patch(
+            "check_systemd.BusType", Mock(), create=True
+        ):
+            with mock.patch("check_systemd.dbus_manager", check_systemd.DbusManager()):
+                yield
+
+
+class StateDirTestCase(TestCase):
+    """A test case with a temporary state directory (``self.tmp.name``)
+    and a boot ID file (``self.boot_id``) that replaces
+    ``check_systemd.BOOT_ID_PATH`` during the tests."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.boot_id = path.join(self.tmp.name, "boot_id")
+        self.set_boot_id("c0ffee")
+        boot_id_path = mock.patch("check_systemd.BOOT_ID_PATH", self.boot_id)
+        boot_id_path.start()
+        self.addCleanup(boot_id_path.stop)
+
+    def set_boot_id(self, boot_id: str) -> None:
+        """Simulate a reboot."""
+        with open(self.boot_id, "w") as boot_id_file:
+            boot_id_file.write(boot_id + "\n")
+
+
 class Expected:
     startup_time = "startup_time=12.345;60;120"
     """``startup_time=12.345;60;120``"""
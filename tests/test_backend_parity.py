@@ -0,0 +1,103 @@
+"""Compare the data sources ``--cli`` and ``--dbus`` on identical data
+served by :class:`FakeSystemd`. The costs of the data sources are
+asserted as round trips to the fake, which unlike wall time are
+deterministic."""
+
+from __future__ import annotations
+
+import typing
+import unittest
+
+import check_systemd
+from check_systemd import CheckResult, CheckSession, run_check
+
+from .helper import FakeSystemd
+
+
+def measure(fake: FakeSystemd, data_source: str, callback: typing.Callable):
+    fake.calls.clear()
+    with fake.serve():
+        result = callback()
+    return result, fake.calls[data_source]
+
+
+class TestBackendParity(unittest.TestCase):
+    def assert_parity(self, fake: FakeSystemd, argv: list[str] = []):
+        results: dict[str, CheckResult] = {}
+        for data_source in ("cli", "dbus"):
+            result, calls = measure(
+                fake,
+                data_source,
+                lambda: run_check(
+                    ["--" + data_source, "--no-startup-time", "-v"] + argv
+                ),
+            )
+            results[data_source] = result
+            # The units are listed with a single call.
+            self.assertEqual(1, calls, data_source)
+
+        cli, dbus = results["cli"], results["dbus"]
+        self.assertEqual(cli.exitcode, dbus.exitcode)
+        self.assertEqual(cli.summary, dbus.summary)
+        self.assertEqual(cli.details, dbus.details)
+        self.assertEqual(
+            [p for p in cli.performance_data if not p.startswith("data_source=")],
+            [p for p in dbus.performance_data if not p.startswith("data_source=")],
+        )
+        return cli
+
+    def test_fixture_3units(self) -> None:
+        fake = FakeSystemd.from_fixture("systemctl-list-units_3units.txt")
+        self.assertEqual(0, self.assert_parity(fake).exitcode)
+
+    def test_fixture_failed(self) -> None:
+        fake = FakeSystemd.from_fixture("systemctl-list-units_failed.txt")
+        self.assertEqual(2, self.assert_parity(fake).exitcode)
+
+    def test_fixture_ok_with_options(self) -> None:
+        fake = FakeSystemd.from_fixture("systemctl-list-units_ok.txt")
+        self.assert_parity(fake, ["--perfdata-types", "-e", "ssh.*"])
+
+    def test_generated(self) -> None:
+        fake = FakeSystemd.generate(5000)
+        result = self.assert_parity(fake, ["--max-problems", "5"])
+        self.assertEqual(2, result.exitcode)
+        self.assertIn("+95 more failed", result.summary)
+
+    def test_fetch_properties(self) -> None:
+        fake = FakeSystemd.generate(1000)
+        properties: dict[str, dict] = {}
+        calls: dict[str, int] = {}
+        for data_source in ("cli", "dbus"):
+            argv = ["--" + data_source]
+
+            def fetch():
+                # Normalize inside of serve(): The D-Bus bindings are patched.
+                opts = check_systemd.normalize_argparser(
+                    check_systemd.get_argparser().parse_args(argv)
+                )
+                session = CheckSession(opts)
+                units = session.unit_cache.fetch_properties(
+                    ["NRestarts", "Description"]
+                )
+                return {unit.name: unit.properties for unit in units}
+
+            properties[data_source], calls[data_source] = measure(
+                fake, data_source, fetch
+            )
+        # The command line interface always fetches the property Id
+        for values in properties["cli"].values():
+            del values["Id"]
+        self.assertEqual(properties["cli"], properties["dbus"])
+        self.assertEqual(
+            {"NRestarts": 0, "Description": "Synthetic unit 0"},
+            properties["dbus"]["unit00000.service"],
+        )
+        # systemctl show is called in batches, D-Bus lists the units once and
+        # then needs two calls per unit.
+        self.assertLess(calls["cli"], 10)
+        self.assertEqual(1 + 2 * 1000, calls["dbus"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Tests related to the scope ``cgroups`` (``--cgroups``)."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+import check_systemd
+from check_systemd import UnitCache, find_unit_cgroups, run_check
+
+
+def write_cgroup(root: str, path: str, files: dict[str, str]) -> str:
+    directory = os.path.join(root, path)
+    os.makedirs(directory, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(content)
+    return directory
+
+
+def get_cgroup_files(
+    memory: int = 1024, oom_kills: int = 0, tasks: int = 3
+) -> dict[str, str]:
+    return {
+        "memory.current": "{}\n".format(memory),
+        "memory.events": "low 0\nhigh 0\nmax 0\noom {0}\noom_kill {0}\n".format(
+            oom_kills
+        ),
+        "cpu.stat": "usage_usec 123456\nuser_usec 100000\nsystem_usec 23456\n",
+        "pids.current": "{}\n".format(tasks),
+    }
+
+
+def get_unit_cache() -> UnitCache:
+    unit_cache = UnitCache()
+    unit_cache.add_unit(name="nginx.service", active_state="active")
+    unit_cache.add_unit(name="mysql.service", active_state="active")
+    unit_cache.add_unit(name="backup.service", active_state="inactive")
+    unit_cache.add_unit(name="session-1.scope", active_state="active")
+    return unit_cache
+
+
+class TestCgroups(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        write_cgroup(self.root, "init.scope", get_cgroup_files())
+        write_cgroup(self.root, "system.slice/nginx.service", get_cgroup_files())
+        write_cgroup(
+            self.root,
+            "system.slice/mysql.service",
+            get_cgroup_files(memory=4096, tasks=30),
+        )
+        # Sub-cgroups of services are not descended into.
+        write_cgroup(
+            self.root, "system.slice/mysql.service/worker.service", get_cgroup_files()
+        )
+        write_cgroup(
+            self.root,
+            "user.slice/user-1000.slice/session-1.scope",
+            get_cgroup_files(),
+        )
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def run_check(self, *argv: str):
+        return run_check(
+            ["--no-startup-time", "--cgroups", "--cgroup-root", self.root] + list(argv),
+            unit_cache=get_unit_cache(),
+        )
+
+    def test_find_unit_cgroups(self) -> None:
+        self.assertEqual(
+            {
+                "init.scope": os.path.join(self.root, "init.scope"),
+                "system.slice": os.path.join(self.root, "system.slice"),
+                "nginx.service": os.path.join(self.root, "system.slice/nginx.service"),
+                "mysql.service": os.path.join(self.root, "system.slice/mysql.service"),
+                "user.slice": os.path.join(self.root, "user.slice"),
+                "user-1000.slice": os.path.join(
+                    self.root, "user.slice/user-1000.slice"
+                ),
+                "session-1.scope": os.path.join(
+                    self.root, "user.slice/user-1000.slice/session-1.scope"
+                ),
+            },
+            find_unit_cgroups(self.root),
+        )
+
+    def test_find_unit_cgroups_missing_root(self) -> None:
+        self.assertEqual({}, find_unit_cgroups(os.path.join(self.root, "missing")))
+
+    def test_read_cgroup_files(self) -> None:
+        path = os.path.join(self.root, "system.slice/nginx.service")
+        os.remove(os.path.join(path, "pids.current"))
+        self.assertEqual(
+            {
+                "memory": 1024,
+                "oom_kills": 0,
+                "cpu_usec": 123456,
+            },
+            check_systemd.parse_cgroup_files(check_systemd.read_cgroup_files(path)),
+        )
+
+    def test_ok(self) -> None:
+        result = self.run_check()
+        self.assertEqual(0, result.exitcode)
+        self.assertIn("'unit_nginx.service_memory'=1024B;;;0", result.performance_data)
+        self.assertIn("'unit_mysql.service_tasks'=30;;;0", result.performance_data)
+        self.assertIn("'unit_nginx.service_cpu_usec'=123456c", result.performance_data)
+        self.assertFalse([p for p in result.performance_data if "session-1.scope" in p])
+
+    def test_memory_critical(self) -> None:
+        result = self.run_check("--cgroup-memory-critical", "2048")
+        self.assertEqual(2, result.exitcode)
+        self.assertEqual("mysql.service: memory 4096B", result.summary)
+
+    def test_tasks_warning(self) -> None:
+        result = self.run_check("--cgroup-tasks-warning", "10")
+        self.assertEqual(1, result.exitcode)
+        self.assertEqual("mysql.service: 30 tasks", result.summary)
+
+    def test_oom_kills(self) -> None:
+        write_cgroup(
+            self.root, "system.slice/nginx.service", get_cgroup_files(oom_kills=2)
+        )
+        result = self.run_check()
+        self.assertEqual(1, result.exitcode)
+        self.assertEqual("nginx.service: 2 OOM kills", result.summary)
+
+    def test_no_performance_data(self) -> None:
+        result = self.run_check("--no-performance-data")
+        self.assertFalse([p for p in result.performance_data if "nginx.service" in p])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Tests related to the check session and the Python API."""
+
+import concurrent.futures
+import tempfile
+import unittest
+
+from nagiosplugin.state import Critical, Ok
+
+import check_systemd
+from check_systemd import CheckSession, UnitCache, run_check
+
+
+def get_unit_cache() -> UnitCache:
+    unit_cache = UnitCache()
+    unit_cache.add_unit(name="nginx.service", active_state="active")
+    unit_cache.add_unit(name="smartd.service", active_state="failed")
+    unit_cache.add_unit(name="backup.service", active_state="inactive")
+    return unit_cache
+
+
+class TestClassCheckSession(unittest.TestCase):
+    def test_unit_cache(self) -> None:
+        unit_cache = get_unit_cache()
+        opts = check_systemd.normalize_argparser(
+            check_systemd.get_argparser().parse_args([])
+        )
+        session = CheckSession(opts, unit_cache)
+        self.assertIs(unit_cache, session.unit_cache)
+
+    def test_list_units(self) -> None:
+        opts = check_systemd.normalize_argparser(
+            check_systemd.get_argparser().parse_args(["--exclude", "smartd.service"])
+        )
+        session = CheckSession(opts, get_unit_cache())
+        self.assertEqual(
+            ["backup.service", "nginx.service"],
+            sorted(unit.name for unit in session.list_units()),
+        )
+
+    def test_state_dir(self) -> None:
+        opts = check_systemd.normalize_argparser(
+            check_systemd.get_argparser().parse_args(["--state-dir", "/tmp/state"])
+        )
+        self.assertEqual("/tmp/state", CheckSession(opts).state_dir)
+
+
+class TestFunctionRunCheck(unittest.TestCase):
+    def test_critical(self) -> None:
+        result = run_check(["--no-startup-time"], unit_cache=get_unit_cache())
+        self.assertEqual(Critical, result.state)
+        self.assertEqual(2, result.exitcode)
+        self.assertEqual("smartd.service: failed", result.summary)
+        self.assertIn("units_failed=1", [str(perf) for perf in result.performance_data])
+
+    def test_ok(self) -> None:
+        result = run_check(
+            ["--no-startup-time", "--exclude", "smartd.service"],
+            unit_cache=get_unit_cache(),
+        )
+        self.assertEqual(Ok, result.state)
+        self.assertEqual("all", result.summary)
+
+    def test_property_fetching_scopes(self) -> None:
+        # A plain UnitCache has no data source for additional properties.
+        for option in (
+            "--failure-details",
+            "--transitions",
+            "--restarts",
+            "--suppress-dependents",
+        ):
+            with self.subTest(option=option), tempfile.TemporaryDirectory() as tmp:
+                result = run_check(
+                    ["--no-startup-time", "--state-dir", tmp, option],
+                    unit_cache=get_unit_cache(),
+                )
+                self.assertEqual(2, result.exitcode)
+                self.assertTrue(result.summary.startswith("smartd.service: failed"))
+
+    def test_concurrent_sessions_with_different_options(self) -> None:
+        argvs = [
+            ["--no-startup-time"],
+            ["--no-startup-time", "--exclude", "smartd.service"],
+            ["--no-startup-time", "--required", "inactive", "-u", "backup.service"],
+            ["--no-startup-time", "--required", "active", "-u", "backup.service"],
+        ] * 10
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(
+                    lambda argv: run_check(argv, unit_cache=get_unit_cache()), argvs
+                )
+            )
+        self.assertEqual([2, 0, 0, 2] * 10, [result.exitcode for result in results])
+
+
+if __name__ == "__main__":
+    unittest.main()
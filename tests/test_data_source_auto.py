@@ -0,0 +1,130 @@
+"""Tests related to the automatic selection of the data source
+(``--data-source auto``)."""
+
+import os
+import tempfile
+import typing
+import unittest
+from unittest.mock import patch
+
+import check_systemd
+from check_systemd import parse_systemd_version, run_check, select_data_source
+
+from .helper import FakeSystemd
+
+
+class TestFunctionParseSystemdVersion(unittest.TestCase):
+    def test_cli(self) -> None:
+        self.assertEqual(252, parse_systemd_version("systemd 252 (252.22-1)\n+PAM"))
+
+    def test_dbus(self) -> None:
+        self.assertEqual(245, parse_systemd_version("245.4-4ubuntu3.22"))
+
+    def test_invalid(self) -> None:
+        self.assertEqual(None, parse_systemd_version("unknown"))
+
+
+class TestFunctionSelectDataSource(unittest.TestCase):
+    def test_dbus(self) -> None:
+        self.assertEqual("dbus", select_data_source({"dbus": True}))
+
+    def test_user_units(self) -> None:
+        self.assertEqual("cli", select_data_source({"dbus": True}, True))
+
+    def test_no_dbus(self) -> None:
+        self.assertEqual("cli", select_data_source({"dbus": False, "json": True}))
+
+    def test_fetches_properties(self) -> None:
+        capabilities = {"dbus": True, "json": True}
+        self.assertEqual("cli", select_data_source(capabilities, False, True))
+
+    def test_fetches_properties_without_json(self) -> None:
+        capabilities = {"dbus": True, "json": False}
+        self.assertEqual("dbus", select_data_source(capabilities, False, True))
+
+
+class TestDataSourceAuto(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.boot_id = os.path.join(self.tmp.name, "boot_id")
+        self.reboot()
+        self.fake = FakeSystemd.from_fixture("systemctl-list-units_failed.txt")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def reboot(self) -> None:
+        with open(self.boot_id, "w") as boot_id:
+            boot_id.write(os.urandom(16).hex() + "\n")
+
+    def run_check(self, *patches, argv: typing.Sequence[str] = ()):
+        with patch("check_systemd.BOOT_ID_PATH", self.boot_id), self.fake.serve():
+            for p in patches:
+                p.start()
+            try:
+                return run_check(
+                    [
+                        "--data-source",
+                        "auto",
+                        "--no-startup-time",
+                        "--state-dir",
+                        self.tmp.name,
+                    ]
+                    + list(argv)
+                )
+            finally:
+                for p in patches:
+                    p.stop()
+
+    def test_argparse(self) -> None:
+        opts = check_systemd.get_argparser().parse_args(["--data-source", "auto"])
+        self.assertEqual("auto", opts.data_source)
+
+    def test_dbus(self) -> None:
+        result = self.run_check()
+        self.assertEqual(2, result.exitcode)
+        self.assertIn("data_source=dbus", result.performance_data)
+
+    def test_restarts(self) -> None:
+        result = self.run_check(argv=["--restarts"])
+        self.assertIn("data_source=cli", result.performance_data)
+
+    def test_no_bindings(self) -> None:
+        result = self.run_check(patch("check_systemd.is_gi", False))
+        self.assertEqual(2, result.exitcode)
+        self.assertIn("data_source=cli", result.performance_data)
+
+    def test_json_output(self) -> None:
+        self.run_check(patch("check_systemd.is_gi", False))
+        self.assertEqual(
+            [
+                ["systemctl", "--version"],
+                ["systemctl", "list-units", "--all", "--output=json", "init.scope"],
+                ["systemctl", "list-units", "--all", "--output=json"],
+            ],
+            self.fake.commands,
+        )
+
+    def test_no_json_output(self) -> None:
+        self.fake.json_output = False
+        result = self.run_check(patch("check_systemd.is_gi", False))
+        self.assertEqual(["systemctl", "list-units", "--all"], self.fake.commands[-1])
+        self.assertEqual(2, result.exitcode)
+
+    def test_probe_once_per_boot(self) -> None:
+        def probes() -> int:
+            commands = self.fake.commands
+            self.fake.commands = []
+            return sum(1 for command in commands if "init.scope" in command)
+
+        self.run_check()
+        self.assertEqual(1, probes())
+        self.run_check()
+        self.assertEqual(0, probes())
+        self.reboot()
+        self.run_check()
+        self.assertEqual(1, probes())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,8 @@ from unittest.mock import patch
 
 import check_systemd
 
+from .helper import FakeSystemd
+
 
 class TestDbus(unittest.TestCase):
     def test_mocking(self) -> None:
@@ -15,5 +17,25 @@ class TestDbus(unittest.TestCase):
             check_systemd.main()
 
 
+class TestDbusUnitCache(unittest.TestCase):
+    def test_list_units(self) -> None:
+        fake = FakeSystemd.from_fixture("systemctl-list-units_failed.txt")
+        with fake.serve():
+            unit_cache = check_systemd.DbusUnitCache()
+        self.assertEqual(fake.calls["dbus"], 1)
+        self.assertEqual(len(fake.units), unit_cache.count)
+        unit = unit_cache.get("smartd.service")
+        self.assertEqual("failed", unit.active_state)
+        self.assertEqual("masked", unit.load_state)
+
+    def test_main(self) -> None:
+        fake = FakeSystemd.from_fixture("systemctl-list-units_failed.txt")
+        with fake.serve():
+            result = check_systemd.run_check(["--dbus", "--no-startup-time"])
+        self.assertEqual(2, result.exitcode)
+        self.assertIn("data_source=dbus", result.performance_data)
+        self.assertEqual(0, fake.calls["cli"])
+
+
 if __name__ == "__main__":
     unittest.main()
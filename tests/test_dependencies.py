@@ -0,0 +1,127 @@
+"""Tests related to the dependency-aware output
+(``--suppress-dependents``)."""
+
+import unittest
+
+from check_systemd import find_root_causes, get_causal_dependencies, run_check
+
+from .helper import FakeSystemd
+
+
+class TestFunctionGetCausalDependencies(unittest.TestCase):
+    def test_requires_and_after(self) -> None:
+        self.assertEqual(
+            ["a.mount", "c.service"],
+            get_causal_dependencies(
+                {
+                    "Requires": ["a.mount", "b.service"],
+                    "BindsTo": ["c.service"],
+                    "After": ["a.mount", "c.service", "d.service"],
+                },
+                {"a.mount", "b.service", "c.service", "d.service"},
+            ),
+        )
+
+    def test_no_ordering(self) -> None:
+        self.assertEqual(
+            [], get_causal_dependencies({"Requires": ["a.mount"]}, {"a.mount"})
+        )
+
+    def test_not_a_candidate(self) -> None:
+        self.assertEqual(
+            [],
+            get_causal_dependencies(
+                {"Requires": ["a.mount"], "After": ["a.mount"]}, {"b.mount"}
+            ),
+        )
+
+
+class TestFunctionFindRootCauses(unittest.TestCase):
+    def test_chain(self) -> None:
+        self.assertEqual(
+            {"b": "a", "c": "a", "d": "a"},
+            find_root_causes({"a": [], "b": ["a"], "c": ["b"], "d": ["a"]}),
+        )
+
+    def test_cycle(self) -> None:
+        self.assertEqual(
+            {"b": "a", "c": "a"}, find_root_causes({"a": ["b"], "b": ["c"], "c": ["a"]})
+        )
+
+    def test_long_chain(self) -> None:
+        count = 100000
+        dependencies = {str(i): [str(i - 1)] if i else [] for i in range(count)}
+        root_causes = find_root_causes(dependencies)
+        self.assertEqual(count - 1, len(root_causes))
+        self.assertEqual("0", root_causes[str(count - 1)])
+
+
+class TestSuppressDependents(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fake = FakeSystemd(
+            [
+                FakeSystemd.unit("mnt-data.mount", "failed"),
+                FakeSystemd.unit(
+                    "nginx.service",
+                    "failed",
+                    After=["mnt-data.mount"],
+                    Requires=["mnt-data.mount"],
+                ),
+                FakeSystemd.unit(
+                    "php.service",
+                    "failed",
+                    After=["nginx.service"],
+                    BindsTo=["nginx.service"],
+                ),
+                FakeSystemd.unit("smartd.service", "failed"),
+                FakeSystemd.unit("ssh.service"),
+            ]
+        )
+
+    def run_check(self, *argv: str, data_source: str = "cli"):
+        with self.fake.serve():
+            return run_check(["--" + data_source, "--no-startup-time"] + list(argv))
+
+    def test_without_option(self) -> None:
+        result = self.run_check()
+        self.assertEqual(
+            "mnt-data.mount: failed, nginx.service: failed, php.service: failed, "
+            "smartd.service: failed",
+            result.summary,
+        )
+        self.assertFalse([c for c in self.fake.commands if c[1] == "show"])
+
+    def test_suppress_dependents(self) -> None:
+        for data_source in ("cli", "dbus"):
+            with self.subTest(data_source=data_source):
+                result = self.run_check(
+                    "--suppress-dependents", "-v", data_source=data_source
+                )
+                self.assertEqual(2, result.exitcode)
+                self.assertEqual(
+                    "mnt-data.mount: failed (+2 dependents), smartd.service: failed",
+                    result.summary,
+                )
+                self.assertIn(
+                    "critical: php.service: failed (root cause: mnt-data.mount)",
+                    result.details,
+                )
+
+    def test_root_cause_excluded(self) -> None:
+        result = self.run_check("--suppress-dependents", "--exclude", "mnt-data.mount")
+        self.assertEqual(
+            "nginx.service: failed (root cause: mnt-data.mount), "
+            "php.service: failed (root cause: mnt-data.mount), "
+            "smartd.service: failed",
+            result.summary,
+        )
+
+    def test_batched_fetch(self) -> None:
+        self.run_check("--suppress-dependents")
+        shows = [c for c in self.fake.commands if c[1] == "show"]
+        self.assertEqual(1, len(shows))
+        self.assertNotIn("ssh.service", shows[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""Tests related to the failure details (``--failure-details``)."""
+
+import subprocess
+import unittest
+from unittest.mock import Mock, patch
+
+from nagiosplugin import CheckError
+
+import check_systemd
+from check_systemd import FailureDetails, execute_cli, run_check
+
+from .helper import FakeSystemd
+
+
+class TestClassFailureDetails(unittest.TestCase):
+    def test_exit_code(self) -> None:
+        details = FailureDetails(
+            {"Result": "exit-code", "ExecMainCode": 1, "ExecMainStatus": 1}
+        )
+        self.assertEqual("exit-code, status=1", details.reason)
+
+    def test_signal(self) -> None:
+        details = FailureDetails(
+            {"Result": "signal", "ExecMainCode": 2, "ExecMainStatus": 9}
+        )
+        self.assertEqual("signal, signal=9", details.reason)
+
+    def test_timeout(self) -> None:
+        details = FailureDetails(
+            {"Result": "timeout", "ExecMainCode": 1, "ExecMainStatus": 0}
+        )
+        self.assertEqual("timeout", details.reason)
+
+
+class TestFunctionParseJournalJson(unittest.TestCase):
+    def test_last_lines(self) -> None:
+        stdout = "\n".join(
+            [
+                '{"_SYSTEMD_UNIT": "a.service", "MESSAGE": "1"}',
+                '{"UNIT": "a.service", "MESSAGE": "2"}',
+                '{"_SYSTEMD_UNIT": "b.service", "MESSAGE": "3"}',
+                '{"_SYSTEMD_UNIT": "a.service", "MESSAGE": [1, 2]}',
+                "invalid",
+                '{"_SYSTEMD_UNIT": "a.service", "MESSAGE": "4"}',
+            ]
+        )
+        self.assertEqual(
+            {"a.service": ["2", "4"]},
+            check_systemd.parse_journal_json(stdout, {"a.service"}, 2),
+        )
+
+
+class TestFunctionExecuteCli(unittest.TestCase):
+    def test_timeout(self) -> None:
+        process = Mock(returncode=0)
+        process.communicate.side_effect = [
+            subprocess.TimeoutExpired("journalctl", 1),
+            (b"", b""),
+        ]
+        with patch("check_systemd.subprocess.Popen", return_value=process):
+            with self.assertRaisesRegex(CheckError, "timed out"):
+                execute_cli(["journalctl"], timeout=1)
+        process.kill.assert_called_once()
+
+
+class TestFailureDetails(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fake = FakeSystemd(
+            [
+                FakeSystemd.unit(
+                    "nginx.service",
+                    "failed",
+                    Result="exit-code",
+                    ExecMainCode=1,
+                    ExecMainStatus=1,
+                ),
+                FakeSystemd.unit("cron.service", "failed", Result="exit-code"),
+                FakeSystemd.unit("ssh.service", Result="success"),
+            ]
+        )
+        self.fake.journal = [
+            {"_SYSTEMD_UNIT": "nginx.service", "MESSAGE": "bind() failed | port 80"},
+            {"UNIT": "nginx.service", "MESSAGE": "Main process exited"},
+            {"_SYSTEMD_UNIT": "ssh.service", "MESSAGE": "Accepted publickey"},
+        ]
+
+    def run_check(self, *argv: str, data_source: str = "cli"):
+        self.fake.commands = []
+        with self.fake.serve():
+            return run_check(["--" + data_source, "--no-startup-time"] + list(argv))
+
+    def test_details(self) -> None:
+        for data_source in ("cli", "dbus"):
+            with self.subTest(data_source=data_source):
+                result = self.run_check(
+                    "--failure-details", "-v", data_source=data_source
+                )
+                self.assertEqual(
+                    "cron.service: failed (exit-code), "
+                    "nginx.service: failed (exit-code, status=1)",
+                    result.summary,
+                )
+                self.assertEqual(
+                    [
+                        "critical: cron.service: failed (exit-code)",
+                        "critical: nginx.service: failed (exit-code, status=1)",
+                        "  bind() failed / port 80",
+                        "  Main process exited",
+                    ],
+                    result.details,
+                )
+
+    def test_max_problems(self) -> None:
+        # The journal of nginx.service must not follow the aggregated line.
+        result = self.run_check("--failure-details", "-v", "--max-problems", "1")
+        self.assertEqual(
+            ["critical: cron.service: failed (exit-code)", "+1 more failed service"],
+            result.details,
+        )
+
+    def test_batched_and_failed_only(self) -> None:
+        self.run_check("--failure-details")
+        self.assertEqual(
+            [
+                "systemctl",
+                "show",
+                "--property=Id,Result,ExecMainCode,ExecMainStatus",
+                "--",
+                "cron.service",
+                "nginx.service",
+            ],
+            self.fake.commands[1],
+        )
+        self.assertEqual(
+            ["--unit=cron.service", "--unit=nginx.service"],
+            self.fake.commands[2][-2:],
+        )
+        self.assertEqual(3, len(self.fake.commands))
+
+    def test_max(self) -> None:
+        result = self.run_check("--failure-details", "--failure-details-max", "1")
+        self.assertEqual(
+            "cron.service: failed (exit-code), nginx.service: failed",
+            result.summary,
+        )
+
+    def test_time_budget_exhausted(self) -> None:
+        result = self.run_check("--failure-details", "--failure-details-timeout", "0")
+        self.assertEqual(1, len(self.fake.commands))
+        self.assertEqual("cron.service: failed, nginx.service: failed", result.summary)
+
+    def test_time_budget_passed_to_commands(self) -> None:
+        with patch(
+            "check_systemd.execute_cli", wraps=check_systemd.execute_cli
+        ) as execute:
+            self.run_check("--failure-details", "--failure-details-timeout", "7")
+        timeouts = {
+            args[0][0][1]: args[1].get("timeout") for args in execute.call_args_list
+        }
+        self.assertLessEqual(timeouts["show"], 7)
+        self.assertLessEqual(timeouts["--no-pager"], 7)
+        self.assertIsNone(timeouts["list-units"])
+
+    def test_healthy(self) -> None:
+        self.run_check("--failure-details", "-v", "-u", "ssh.service")
+        self.assertEqual(1, len(self.fake.commands))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""Tests related to the state history and the scope ``flapping``
+(``--flapping``)."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import check_systemd
+from check_systemd import StateHistory, Unit, UnitCache, run_check
+
+from .helper import StateDirTestCase
+
+
+def get_units(**states: str) -> list[Unit]:
+    return [
+        Unit(name=name.replace("_", "."), active_state=state)
+        for name, state in states.items()
+    ]
+
+
+class TestClassStateHistory(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "history.bin")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def record(self, boot_id: str = "c0ffee", capacity: int = 4, **states: str):
+        with StateHistory(self.path, boot_id, capacity) as history:
+            history.record(get_units(**states))
+            return history.names, history.rows
+
+    def test_interned_names(self) -> None:
+        self.record(a_service="active")
+        names, rows = self.record(a_service="failed", b_service="active")
+        self.assertEqual(["a.service", "b.service"], names)
+        self.assertEqual(2, len(rows))
+        self.assertEqual(b"\x01\x00", rows[0][:2])
+        self.assertEqual(b"\x04\x01", rows[1][:2])
+
+    def test_append_in_place(self) -> None:
+        self.record(a_service="active")
+        size = os.path.getsize(self.path)
+        self.record(a_service="failed")
+        self.assertEqual(size, os.path.getsize(self.path))
+
+    def test_ring_buffer(self) -> None:
+        for state in ("active", "failed", "active", "inactive", "failed", "active"):
+            names, rows = self.record(a_service=state)
+        self.assertEqual([b"\x01", b"\x03", b"\x04", b"\x01"], [r[:1] for r in rows])
+
+    def test_new_names_in_place(self) -> None:
+        self.record(a_service="active")
+        with patch.object(StateHistory, "_StateHistory__rewrite") as rewrite:
+            names, rows = self.record(a_service="failed", b_service="active")
+        rewrite.assert_not_called()
+        self.assertEqual(["a.service", "b.service"], names)
+        names, rows = self.record(b_service="failed")
+        self.assertEqual([b"\x01\x00", b"\x04\x01", b"\x00\x04"], [r[:2] for r in rows])
+
+    def test_prune_vanished_units(self) -> None:
+        for i in range(200):
+            names, rows = self.record(**{"run-{}_scope".format(i): "active"})
+        self.assertLessEqual(len(names), 64)
+        self.assertEqual(64, len(rows[0]))
+        self.assertEqual(
+            ["run-196.scope", "run-197.scope", "run-198.scope", "run-199.scope"],
+            names[-4:],
+        )
+        self.assertEqual(
+            [names.index("run-{}.scope".format(i)) for i in range(196, 200)],
+            [row.index(b"\x01") for row in rows],
+        )
+
+    def test_in_memory(self) -> None:
+        self.record(a_service="active")
+        with open(self.path, "rb") as history_file:
+            data = history_file.read()
+        with StateHistory(self.path + ".copy", "c0ffee", 4, data=data) as history:
+            history.record(get_units(a_service="failed"))
+            self.assertEqual([b"\x01", b"\x04"], [r[:1] for r in history.rows])
+        self.assertFalse(os.path.exists(self.path + ".copy"))
+        with open(self.path, "rb") as history_file:
+            self.assertEqual(data, history_file.read())
+
+    def test_many_units(self) -> None:
+        self.record(a_service="active")
+        states = {"u{}_service".format(i): "active" for i in range(100)}
+        names, rows = self.record(a_service="failed", **states)
+        self.assertEqual(101, len(names))
+        self.assertEqual(b"\x01", rows[0][:1])
+        self.assertEqual(
+            check_systemd.HISTORY_HEADER.size
+            + 4 * len(rows[0])
+            + len("\n".join(names)),
+            os.path.getsize(self.path),
+        )
+
+    def test_reset_on_boot(self) -> None:
+        self.record(a_service="active")
+        names, rows = self.record(boot_id="decaf", b_service="active")
+        self.assertEqual(["b.service"], names)
+        self.assertEqual(1, len(rows))
+
+    def test_invalid_file(self) -> None:
+        with open(self.path, "wb") as history:
+            history.write(b"\xff" * 100)
+        names, rows = self.record(a_service="active")
+        self.assertEqual(1, len(rows))
+
+
+class TestFunctionCountStateChanges(unittest.TestCase):
+    def test_changes(self) -> None:
+        rows = [b"\x01\x01", b"\x04\x01", b"\x04\x01", b"\x01\x01", b"\x04\x00"]
+        self.assertEqual({0: 3}, check_systemd.count_state_changes(rows, 10))
+
+    def test_window(self) -> None:
+        rows = [b"\x01", b"\x04", b"\x01", b"\x01"]
+        self.assertEqual({}, check_systemd.count_state_changes(rows, 2))
+
+
+class TestFlapping(StateDirTestCase):
+    def run_check(self, state: str, *argv: str):
+        unit_cache = UnitCache()
+        unit_cache.add_unit(name="nginx.service", active_state="active")
+        unit_cache.add_unit(name="flappy.service", active_state=state)
+        return run_check(
+            ["--no-startup-time", "--flapping", "--state-dir", self.tmp.name]
+            + list(argv),
+            unit_cache=unit_cache,
+        )
+
+    def test_flapping(self) -> None:
+        for state in ("active", "activating", "active", "activating"):
+            result = self.run_check(state)
+            self.assertEqual(0, result.exitcode)
+        result = self.run_check("active")
+        self.assertEqual(1, result.exitcode)
+        self.assertEqual(
+            "flappy.service: 4 state changes in the last 10 runs", result.summary
+        )
+        self.assertIn(
+            "'unit_flappy.service_state_changes'=4;3;;0", result.performance_data
+        )
+        self.assertFalse([p for p in result.performance_data if "nginx" in p])
+
+    def test_window(self) -> None:
+        for state in ("active", "activating", "active", "activating", "active"):
+            result = self.run_check(state, "--flapping-window", "3")
+        self.assertEqual(0, result.exitcode)
+        self.assertIn(
+            "'unit_flappy.service_state_changes'=2;3;;0", result.performance_data
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
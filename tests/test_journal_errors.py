@@ -0,0 +1,169 @@
+"""Tests related to the scope ``journal_errors`` (``--journal-errors``)."""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from check_systemd import iterate_lines, run_check, scan_journal
+
+from .helper import FakeSystemd
+
+
+def entry(name: str, message: str, priority: int = 3, seconds: int = 0) -> dict:
+    return {
+        "_SYSTEMD_UNIT": name,
+        "PRIORITY": str(priority),
+        "MESSAGE": message,
+        "__REALTIME_TIMESTAMP": str(seconds * 1_000_000),
+    }
+
+
+class TestFunctionScanJournal(unittest.TestCase):
+    def test_scan(self) -> None:
+        cursor, errors = scan_journal(
+            [
+                '{"__CURSOR": "s=1", "_SYSTEMD_UNIT": "a.service", "PRIORITY": "3",'
+                ' "MESSAGE": "first"}',
+                '{"__CURSOR": "s=2", "UNIT": "a.service", "PRIORITY": "2",'
+                ' "MESSAGE": "second"}',
+                '{"__CURSOR": "s=3", "_SYSTEMD_UNIT": "b.service", "PRIORITY": "6",'
+                ' "MESSAGE": "info"}',
+                "invalid",
+                '{"__CURSOR": "s=4", "PRIORITY": "0", "MESSAGE": "kernel"}',
+            ]
+        )
+        self.assertEqual("s=4", cursor)
+        self.assertEqual(["a.service"], list(errors))
+        self.assertEqual(2, errors["a.service"].count)
+        self.assertEqual("second", errors["a.service"].message)
+
+    def test_empty(self) -> None:
+        self.assertEqual((None, {}), scan_journal([]))
+
+
+class TestFunctionIterateLines(unittest.TestCase):
+    def test_lines(self) -> None:
+        self.assertEqual(["a", "", "b"], list(iterate_lines("a\n\nb\n")))
+        self.assertEqual(["a"], list(iterate_lines("a")))
+        self.assertEqual([], list(iterate_lines("")))
+
+
+class TestJournalErrors(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fake = FakeSystemd(
+            [
+                FakeSystemd.unit("nginx.service"),
+                FakeSystemd.unit("ssh.service"),
+                FakeSystemd.unit("cron.service"),
+            ]
+        )
+        self.fake.journal = [entry("nginx.service", "old error", seconds=500)] * 1000
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def run_check(self, seconds: float, *argv: str):
+        self.fake.commands = []
+        with patch("check_systemd.time.time", return_value=seconds), self.fake.serve():
+            return run_check(
+                [
+                    "--cli",
+                    "--no-startup-time",
+                    "--journal-errors",
+                    "--state-dir",
+                    self.tmp.name,
+                ]
+                + list(argv)
+            )
+
+    def journalctl(self) -> list:
+        commands = [c for c in self.fake.commands if c[0] == "journalctl"]
+        self.assertEqual(1, len(commands))
+        self.assertIn("--priority=0..3", commands[0])
+        return commands[0]
+
+    def test_first_run(self) -> None:
+        result = self.run_check(1000)
+        self.assertEqual(0, result.exitcode)
+        self.assertFalse([c for c in self.fake.commands if c[0] == "journalctl"])
+        self.assertFalse([p for p in result.performance_data if "journal" in p])
+
+    def test_only_new_entries(self) -> None:
+        self.run_check(1000)
+        self.fake.journal += [
+            entry("nginx.service", "bind() failed | port 80", seconds=1200),
+            entry("nginx.service", "worker died", seconds=1200),
+            entry("ssh.service", "connection closed", 6, seconds=1200),
+            entry("cron.service", "job failed", seconds=1200),
+        ]
+        result = self.run_check(1600, "--journal-errors-warning", "10")
+        self.assertEqual("--since=@1000", self.journalctl()[-1])
+        self.assertEqual(1, result.exitcode)
+        self.assertEqual(
+            "nginx.service: 2 journal errors in 600s (12.0 per hour), "
+            "last: worker died",
+            result.summary,
+        )
+        self.assertIn(
+            "'unit_nginx.service_journal_errors'=12.0;10;;0", result.performance_data
+        )
+        self.assertIn(
+            "'unit_cron.service_journal_errors'=6.0;10;;0", result.performance_data
+        )
+
+        # The entries are read only once.
+        result = self.run_check(2200)
+        self.assertEqual("--after-cursor=1003", self.journalctl()[-1])
+        self.assertFalse([p for p in result.performance_data if "journal" in p])
+
+    def test_cursor_kept_without_new_entries(self) -> None:
+        self.run_check(1000)
+        self.fake.journal.append(entry("cron.service", "job failed", seconds=1200))
+        self.run_check(1600)
+        self.run_check(2200)
+        self.run_check(2800)
+        self.assertEqual("--after-cursor=1000", self.journalctl()[-1])
+
+    def test_since_without_errors(self) -> None:
+        self.run_check(1000)
+        self.run_check(1600)
+        self.run_check(2200)
+        self.assertEqual("--since=@1600", self.journalctl()[-1])
+
+    def test_reset_on_failure(self) -> None:
+        self.run_check(1000)
+        self.fake.journal.append(entry("cron.service", "job failed", seconds=1200))
+        self.run_check(1600)
+        with patch.object(
+            self.fake, "format_journal", side_effect=OSError("Failed to seek")
+        ):
+            result = self.run_check(2200)
+        self.assertEqual(3, result.exitcode)
+        self.assertIn("Unable to read the journal", result.summary)
+        result = self.run_check(2800)
+        self.assertEqual(0, result.exitcode)
+        self.assertEqual("--since=@2200", self.journalctl()[-1])
+
+    def test_unselected_units(self) -> None:
+        self.run_check(1000)
+        self.fake.journal.append(entry("cron.service", "job failed", seconds=1200))
+        result = self.run_check(1600, "--exclude", "cron.service")
+        self.assertFalse([p for p in result.performance_data if "journal" in p])
+
+    def test_pipe_in_message(self) -> None:
+        self.run_check(1000)
+        self.fake.journal.append(
+            entry("nginx.service", "bind() failed | port 80", seconds=1010)
+        )
+        result = self.run_check(1036, "--journal-errors-critical", "50")
+        self.assertEqual(2, result.exitcode)
+        self.assertEqual(
+            "nginx.service: 1 journal errors in 36s (100.0 per hour), "
+            "last: bind() failed / port 80",
+            result.summary,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
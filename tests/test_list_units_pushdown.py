@@ -0,0 +1,120 @@
+"""Tests related to the selection of units by ``systemctl list-units``
+itself (pushdown of the options ``--include*``)."""
+
+from __future__ import annotations
+
+import unittest
+
+import check_systemd
+from check_systemd import CheckSession, convert_regexp_to_globs, run_check
+
+from .helper import FakeSystemd
+
+
+class TestFunctionConvertRegexpToGlobs(unittest.TestCase):
+    def test_unit_name(self) -> None:
+        self.assertEqual(["nginx.service*"], convert_regexp_to_globs(r"nginx\.service"))
+
+    def test_anchored(self) -> None:
+        self.assertEqual(["nginx.service"], convert_regexp_to_globs(r"nginx\.service$"))
+
+    def test_wildcards(self) -> None:
+        self.assertEqual(["ssh*.?ocket*"], convert_regexp_to_globs(r"ssh.*\..ocket"))
+
+    def test_unit_types(self) -> None:
+        self.assertEqual(
+            ["*.service", "*.timer"], convert_regexp_to_globs(r".*\.(service|timer)$")
+        )
+
+    def test_not_convertible(self) -> None:
+        for regexp in (r"user@\d+", "a[bc]", "a|b", "a+", r"a\*"):
+            with self.subTest(regexp=regexp):
+                self.assertIsNone(convert_regexp_to_globs(regexp))
+
+
+def get_patterns(*argv: str):
+    opts = check_systemd.normalize_argparser(
+        check_systemd.get_argparser().parse_args(list(argv))
+    )
+    return CheckSession(opts).list_units_patterns
+
+
+class TestListUnitsPatterns(unittest.TestCase):
+    def test_no_include(self) -> None:
+        self.assertIsNone(get_patterns("--no-performance-data"))
+
+    def test_performance_data(self) -> None:
+        self.assertIsNone(get_patterns("--include-type", "service"))
+
+    def test_include_unit(self) -> None:
+        self.assertEqual(
+            ["nginx.service*"],
+            get_patterns("--no-performance-data", "-u", "nginx.service"),
+        )
+
+    def test_regexp(self) -> None:
+        self.assertIsNone(get_patterns("--no-performance-data", "-I", r"user@\d+"))
+
+
+class TestPushdown(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fake = FakeSystemd.generate(200)
+
+    def assert_identical(self, *argv: str) -> list[str]:
+        """Compare the results with the results of the D-Bus API, which
+        always lists all units."""
+        results = []
+        for data_source in ("cli", "dbus"):
+            self.fake.commands = []
+            with self.fake.serve():
+                results.append(
+                    run_check(
+                        ["--" + data_source, "--no-startup-time", "-vvv"] + list(argv)
+                    )
+                )
+        cli, dbus = results
+        self.assertEqual(dbus.exitcode, cli.exitcode)
+        self.assertEqual(dbus.summary, cli.summary)
+        self.assertEqual(dbus.details, cli.details)
+        return results
+
+    def list_units_command(self) -> list[str]:
+        self.fake.commands = []
+        with self.fake.serve():
+            run_check(
+                ["--cli", "--no-startup-time", "--no-performance-data"] + self.argv
+            )
+        return [c for c in self.fake.commands if c[1] == "list-units"][0]
+
+    def test_include_type(self) -> None:
+        self.argv = ["--include-type", "service", "timer"]
+        self.assert_identical("--no-performance-data", *self.argv)
+        self.assertIn("--type=service,timer", self.list_units_command())
+
+    def test_include_unit(self) -> None:
+        self.argv = ["-u", "unit00049.target"]
+        cli, _ = self.assert_identical("--no-performance-data", *self.argv)
+        self.assertEqual(2, cli.exitcode)
+        self.assertEqual(["--", "unit00049.target*"], self.list_units_command()[-2:])
+
+    def test_include_regexp_and_type(self) -> None:
+        self.argv = ["-I", r"unit0001.*", "--include-type", "mount"]
+        self.assert_identical("--no-performance-data", *self.argv)
+        self.assertEqual(["--", "*.mount", "unit0001*"], self.list_units_command()[-3:])
+
+    def test_no_match(self) -> None:
+        self.argv = ["-I", "missing"]
+        with self.assertRaisesRegex(ValueError, "Please verify"):
+            self.list_units_command()
+
+    def test_not_convertible(self) -> None:
+        self.argv = ["-I", r"unit0\d+\.service"]
+        self.assert_identical("--no-performance-data", *self.argv)
+        self.assertEqual(
+            ["systemctl", "list-units", "--all"],
+            self.list_units_command(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
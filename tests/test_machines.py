@@ -0,0 +1,72 @@
+"""Tests related to the checking of containers (option ``--machines``). The
+tests use the stand-in binaries of the folder ``bin``."""
+
+from __future__ import annotations
+
+import unittest
+from unittest.mock import Mock
+
+from nagiosplugin import Critical, Result
+
+from check_systemd import SystemdSummary
+
+from .helper import execute_main_with_bin
+
+
+class TestOptionMachines(unittest.TestCase):
+    def test_enumerate_machines(self) -> None:
+        result = execute_main_with_bin(["--machines", "--no-performance-data"])
+        result.assert_critical()
+        result.assert_first_line("SYSTEMD CRITICAL - web2/smartd.service: failed")
+
+    def test_machine_list(self) -> None:
+        result = execute_main_with_bin(["--machines", "web1", "--no-performance-data"])
+        result.assert_ok()
+        result.assert_first_line("SYSTEMD OK - all")
+
+    def test_performance_data(self) -> None:
+        result = execute_main_with_bin(["--machines", "web1", "web2"])
+        result.assert_critical()
+        self.assertIn("web1_count_units=3", result.first_line)
+        self.assertIn("web2_units_failed=1", result.first_line)
+        self.assertIn(" count_units=386", result.first_line)
+
+    def test_timers(self) -> None:
+        result = execute_main_with_bin(
+            ["--machines", "web1", "web2", "--timers", "--no-performance-data"]
+        )
+        result.assert_critical()
+        result.assert_first_line(
+            "SYSTEMD CRITICAL - web2/smartd.service: failed, "
+            "web2/phpsessionclean.timer"
+        )
+
+    def test_unreachable_machine(self) -> None:
+        result = execute_main_with_bin(
+            ["--machines", "web1", "web3", "--no-performance-data"]
+        )
+        result.assert_unknown()
+        self.assertIn("web3", result.first_line)
+
+
+class TestMethodGroup(unittest.TestCase):
+    def test_group_by_label(self) -> None:
+        def result(name: str, label: str | None) -> Result:
+            metric = Mock(resource=Mock(label=label))
+            metric.name = name
+            return Result(Critical, hint=name, metric=metric)
+
+        results = [
+            result("web1/a.service", "web1"),
+            result("web2/b.service", "web2"),
+            result("c.service", None),
+            result("web1/d.timer", "web1"),
+        ]
+        self.assertEqual(
+            ["c.service", "web1/a.service", "web1/d.timer", "web2/b.service"],
+            [r.hint for r in SystemdSummary.group(results)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Tests related to the OpenMetrics text file export."""
+
+import os
+import tempfile
+import unittest
+
+from check_systemd import escape_label_value
+
+from .helper import execute_main
+
+
+class TestOpenMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "systemd.prom")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def read(self) -> str:
+        with open(self.path) as prom_file:
+            return prom_file.read()
+
+    def test_units_and_startup_time(self) -> None:
+        result = execute_main(
+            argv=["--openmetrics-file", self.path],
+            stdout=["systemctl-list-units_failed.txt", "systemd-analyze_12.345.txt"],
+        )
+        result.assert_critical()
+        self.assertEqual(
+            "# HELP systemd_units Number of units by active state.\n"
+            "# TYPE systemd_units gauge\n"
+            'systemd_units{state="active"} 1\n'
+            'systemd_units{state="failed"} 1\n'
+            'systemd_units{state="inactive"} 1\n'
+            "# HELP systemd_units_by_type Number of units by unit type.\n"
+            "# TYPE systemd_units_by_type gauge\n"
+            'systemd_units_by_type{type="service"} 3\n'
+            "# HELP systemd_unit_state The active state of the unit.\n"
+            "# TYPE systemd_unit_state gauge\n",
+            self.read().split('systemd_unit_state{name="')[0],
+        )
+        self.assertIn(
+            'systemd_unit_state{name="smartd.service",type="service",'
+            'state="failed"} 1\n',
+            self.read(),
+        )
+        self.assertIn("systemd_startup_time_seconds 12.345\n", self.read())
+        self.assertIn("systemd_check_state 2\n", self.read())
+        self.assertTrue(self.read().endswith("# EOF\n"))
+
+    def test_timers(self) -> None:
+        execute_main(
+            argv=["--openmetrics-file", self.path, "--timers"],
+            stdout=[
+                "systemctl-list-units_3units.txt",
+                "systemd-analyze_12.345.txt",
+                "systemctl-list-timers_1.txt",
+            ],
+        )
+        self.assertIn(
+            'systemd_timer_last_trigger_age_seconds{name="phpsessionclean.timer"}',
+            self.read(),
+        )
+
+    def test_write_error(self) -> None:
+        open(self.path, "w").close()
+        result = execute_main(
+            argv=["--openmetrics-file", os.path.join(self.path, "x", "y")],
+        )
+        result.assert_unknown()
+        self.assertIn("OpenMetricsExporter", result.first_line)
+
+    def test_escape_label_value(self) -> None:
+        self.assertEqual('a\\"b\\\\c\\n', escape_label_value('a"b\\c\n'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Tests related to the option ``--changes-only``."""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from .helper import execute_main
+
+
+class TestOptionChangesOnly(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.state_dir.cleanup()
+
+    def execute(self, list_units: str, argv: list = []):
+        return execute_main(
+            argv=["--changes-only", "--state-dir", self.state_dir.name] + argv,
+            stdout=[
+                "systemctl-list-units_{}.txt".format(list_units),
+                "systemd-analyze_12.345.txt",
+            ],
+        )
+
+    def test_first_run(self) -> None:
+        result = self.execute("3units")
+        result.assert_ok()
+        self.assertIn("units_changed=3", result.first_line)
+
+    def test_unchanged(self) -> None:
+        self.execute("3units")
+        with patch("check_systemd.Unit.convert_to_exitcode") as convert:
+            result = self.execute("3units")
+            convert.assert_not_called()
+        result.assert_ok()
+        result.assert_first_line(
+            "SYSTEMD OK - all | count_units=3 data_source=cli "
+            "startup_time=12.345;60;120 units_activating=0 units_active=3 "
+            "units_changed=0 units_failed=0 units_inactive=0"
+        )
+
+    def test_problem_persists(self) -> None:
+        result = self.execute("failed", ["--no-performance-data"])
+        result.assert_critical()
+        result.assert_first_line("SYSTEMD CRITICAL - smartd.service: failed")
+        result = self.execute("failed", ["--no-performance-data"])
+        result.assert_critical()
+        result.assert_first_line("SYSTEMD CRITICAL - smartd.service: failed")
+
+    def test_changed(self) -> None:
+        self.execute("failed")
+        result = self.execute("3units")
+        result.assert_ok()
+        self.assertIn("units_changed=6", result.first_line)
+
+    def test_options_are_part_of_the_state(self) -> None:
+        self.execute("3units")
+        result = self.execute("3units", ["--exclude", "swap.target"])
+        self.assertIn("units_changed=2", result.first_line)
+
+
+class TestOptionChangesOnlyWithoutOtherResults(unittest.TestCase):
+    def test_unchanged_ok(self) -> None:
+        with tempfile.TemporaryDirectory() as state_dir:
+            argv = ["--changes-only", "--state-dir", state_dir, "-n", "-p"]
+            execute_main(argv=list(argv), stdout=["systemctl-list-units_ok.txt"])
+            result = execute_main(
+                argv=list(argv), stdout=["systemctl-list-units_ok.txt"]
+            )
+        result.assert_ok()
+        result.assert_first_line("SYSTEMD OK - all")
+
+
+if __name__ == "__main__":
+    unittest.main()
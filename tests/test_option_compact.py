@@ -0,0 +1,51 @@
+"""Tests related to the compact evaluation mode (option ``--compact``)."""
+
+import unittest
+from unittest.mock import patch
+
+import check_systemd
+from check_systemd import UnitCache, run_check
+
+from .helper import execute_main
+
+
+def execute(argv: list, list_units: str):
+    return execute_main(
+        argv=argv,
+        stdout=[
+            "systemctl-list-units_{}.txt".format(list_units),
+            "systemd-analyze_12.345.txt",
+        ],
+    )
+
+
+class TestOptionCompact(unittest.TestCase):
+    def test_same_output(self) -> None:
+        for list_units in ("ok", "failed", "multiple-failure", "3units"):
+            for argv in ([], ["--required", "inactive"], ["-e", "smartd.service"]):
+                expected = execute(list(argv), list_units)
+                result = execute(["--compact"] + argv, list_units)
+                self.assertEqual(expected.exitcode, result.exitcode)
+                self.assertEqual(expected.first_line, result.first_line)
+
+    def test_metrics_only_for_problems(self) -> None:
+        with patch("check_systemd.Metric", wraps=check_systemd.Metric) as metric:
+            execute(["--compact", "-n", "-p"], "failed")
+            names = [call[1]["name"] for call in metric.call_args_list]
+        self.assertEqual(["smartd.service", "units_healthy"], names)
+
+    def test_include_unit(self) -> None:
+        result = execute(["--compact", "-u", "nginx.service", "-p"], "ok")
+        result.assert_first_line("SYSTEMD OK - nginx.service: active")
+
+    def test_verbose_without_healthy_units(self) -> None:
+        for argv, details in (([], ["ok: nginx.service: active"]), (["--compact"], [])):
+            unit_cache = UnitCache()
+            unit_cache.add_unit(name="nginx.service", active_state="active")
+            result = run_check(argv + ["-n", "-v"], unit_cache=unit_cache)
+            self.assertEqual("all", result.summary)
+            self.assertEqual(details, result.details)
+
+
+if __name__ == "__main__":
+    unittest.main()
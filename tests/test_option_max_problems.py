@@ -0,0 +1,67 @@
+"""Tests related to the bounded status line (option ``--max-problems``)."""
+
+import unittest
+
+from .helper import execute_main
+
+
+def list_units(*units: tuple) -> str:
+    """Generate the output of ``systemctl list-units``.
+
+    :param units: Tuples of the unit name and the active state.
+    """
+    row = "{:<40}{:<10}{:<9}{:<10}{}"
+    lines = [row.format("UNIT", "LOAD", "ACTIVE", "SUB", "DESCRIPTION")]
+    for name, active_state in units:
+        lines.append(row.format(name, "loaded", active_state, "dead", name))
+    return "\n".join(lines) + "\n\n"
+
+
+def execute(argv: list, count_services: int = 5, count_mounts: int = 2):
+    units = [("failed-{}.service".format(i), "failed") for i in range(count_services)]
+    units += [("failed-{}.mount".format(i), "failed") for i in range(count_mounts)]
+    units += [("ok.service", "active")]
+    return execute_main(
+        argv=argv + ["--no-performance-data"],
+        stdout=[list_units(*units), "systemd-analyze_12.345.txt"],
+    )
+
+
+class TestOptionMaxProblems(unittest.TestCase):
+    def test_bounded(self) -> None:
+        result = execute(["--max-problems", "2"])
+        result.assert_critical()
+        result.assert_first_line(
+            "SYSTEMD CRITICAL - failed-0.mount: failed, failed-0.service: failed, "
+            "+4 more failed services, +1 more failed mount"
+        )
+
+    def test_unbounded(self) -> None:
+        result = execute(["--max-problems", "0"])
+        self.assertEqual(7, len(result.first_line.split(", ")))
+        self.assertNotIn("more", result.first_line)
+
+    def test_default(self) -> None:
+        result = execute([], count_services=20, count_mounts=0)
+        self.assertIn("+10 more failed services", result.first_line)
+
+    def test_verbose(self) -> None:
+        result = execute(["--max-problems", "2", "-v"])
+        self.assertIn("\n+4 more failed services\n", result.output)
+
+    def test_very_verbose(self) -> None:
+        result = execute(["--max-problems", "2", "-vv"])
+        self.assertIn(
+            "critical: failed-0.mount: failed\n"
+            "critical: failed-0.service: failed\n"
+            "critical: failed-1.mount: failed\n"
+            "critical: failed-1.service: failed\n"
+            "critical: failed-2.service: failed\n"
+            "critical: failed-3.service: failed\n"
+            "critical: failed-4.service: failed\n",
+            result.output,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
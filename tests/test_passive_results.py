@@ -0,0 +1,137 @@
+"""Tests related to the submission of passive check results."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from check_systemd import join_lines
+
+from .helper import execute_main
+
+
+class TestFunctionJoinLines(unittest.TestCase):
+    def test_chunks(self) -> None:
+        self.assertEqual(
+            [b"a\nb\n", b"c\n", b"long line\n", b"d\n"],
+            list(join_lines([b"a\n", b"b\n", b"c\n", b"long line\n", b"d\n"], 5)),
+        )
+
+    def test_empty(self) -> None:
+        self.assertEqual([], list(join_lines([], 5)))
+
+
+class TestPassiveResults(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.command_file = os.path.join(self.tmp_dir.name, "icinga2.cmd")
+        open(self.command_file, "w").close()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def execute(self, argv: list, list_units: str = "failed"):
+        with patch("check_systemd.time.time", return_value=1600000000):
+            return execute_main(
+                argv=argv + ["--passive-host", "host1"],
+                stdout=[
+                    "systemctl-list-units_{}.txt".format(list_units),
+                    "systemd-analyze_12.345.txt",
+                ],
+            )
+
+    def read_command_file(self) -> list:
+        with open(self.command_file) as command_file:
+            return command_file.read().splitlines()
+
+    def test_command_file(self) -> None:
+        result = self.execute(["--passive-command-file", self.command_file])
+        result.assert_critical()
+        self.assertIn("passive_results=3", result.first_line)
+        self.assertEqual(
+            [
+                "[1600000000] PROCESS_SERVICE_CHECK_RESULT;host1;"
+                "rtkit-daemon.service;0;rtkit-daemon.service: inactive",
+                "[1600000000] PROCESS_SERVICE_CHECK_RESULT;host1;"
+                "setvtrgb.service;0;setvtrgb.service: active",
+                "[1600000000] PROCESS_SERVICE_CHECK_RESULT;host1;"
+                "smartd.service;2;smartd.service: failed",
+            ],
+            sorted(self.read_command_file()),
+        )
+
+    def test_named_pipe(self) -> None:
+        os.remove(self.command_file)
+        os.mkfifo(self.command_file)
+        reader = os.open(self.command_file, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            result = self.execute(["--passive-command-file", self.command_file])
+            lines = os.read(reader, 65536).decode().splitlines()
+        finally:
+            os.close(reader)
+        result.assert_critical()
+        self.assertEqual(3, len(lines))
+
+    def test_named_pipe_without_reader(self) -> None:
+        os.remove(self.command_file)
+        os.mkfifo(self.command_file)
+        result = self.execute(["--passive-command-file", self.command_file])
+        result.assert_unknown()
+        self.assertIn("No process is reading", result.first_line)
+
+    def test_service_template_and_json(self) -> None:
+        json_file = os.path.join(self.tmp_dir.name, "results.json")
+        self.execute(
+            [
+                "--passive-json",
+                json_file,
+                "--passive-service",
+                "systemd {unit}",
+                "--include",
+                "smartd.service",
+            ]
+        )
+        with open(json_file) as json_file_object:
+            self.assertEqual(
+                [
+                    {
+                        "timestamp": 1600000000,
+                        "host": "host1",
+                        "service": "systemd smartd.service",
+                        "exit_status": 2,
+                        "plugin_output": "smartd.service: failed",
+                    }
+                ],
+                json.load(json_file_object),
+            )
+
+    def test_changes_only(self) -> None:
+        argv = [
+            "--passive-command-file",
+            self.command_file,
+            "--changes-only",
+            "--state-dir",
+            self.tmp_dir.name,
+        ]
+        self.execute(argv)
+        self.assertEqual(3, len(self.read_command_file()))
+        self.execute(argv, list_units="3units")
+        self.assertEqual(6, len(self.read_command_file()))
+        self.execute(argv, list_units="3units")
+        self.assertEqual(6, len(self.read_command_file()))
+
+    def test_missing_command_file(self) -> None:
+        result = self.execute(
+            [
+                "--passive-command-file",
+                os.path.join(self.tmp_dir.name, "missing.cmd"),
+            ],
+            list_units="3units",
+        )
+        result.assert_unknown()
+        self.assertIn("Passive check results", result.first_line)
+
+
+if __name__ == "__main__":
+    unittest.main()
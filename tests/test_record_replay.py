@@ -0,0 +1,177 @@
+"""Tests related to the options ``--record`` and ``--replay``."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nagiosplugin import CheckError
+
+import check_systemd
+from check_systemd import AcquisitionReplay, AcquisitionTape, run_check
+
+from .helper import FakeSystemd, execute_main
+
+
+def no_popen(*args, **kwargs):
+    raise AssertionError("systemd must not be queried during a replay")
+
+
+class TestFunctionEncodeRecordedValue(unittest.TestCase):
+    def test_bytes(self) -> None:
+        value = ["ok", [0, b"\xff\x00stdout", None]]
+        self.assertEqual(
+            value,
+            check_systemd.decode_recorded_value(
+                check_systemd.encode_recorded_value(value)
+            ),
+        )
+
+
+class TestClassAcquisitionTape(unittest.TestCase):
+    def test_abstract(self) -> None:
+        with self.assertRaises(TypeError):
+            AcquisitionTape()  # type: ignore
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.recording = os.path.join(self.tmp.name, "recording")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_cli(self) -> None:
+        result = execute_main(
+            argv=["--record", self.recording, "--timers"],
+            stdout=[
+                "systemctl-list-units_failed.txt",
+                "systemd-analyze_12.345.txt",
+                "systemctl-list-timers_1.txt",
+            ],
+        )
+        result.assert_critical()
+        self.assertEqual(
+            [
+                '["cli", ["systemctl", "list-units", "--all"]]',
+                '["cli", ["systemd-analyze"]]',
+                '["cli", ["systemctl", "list-timers", "--all"]]',
+            ],
+            AcquisitionReplay(self.recording).keys,
+        )
+
+        replayed = execute_main(
+            argv=["--replay", self.recording, "--timers"], popen=no_popen
+        )
+        replayed.assert_critical()
+        self.assertEqual(result.first_line, replayed.first_line)
+
+    def test_dbus(self) -> None:
+        with patch("check_systemd.is_gi", True), patch(
+            "check_systemd.dbus_manager", create=True
+        ) as dbus_manager:
+            dbus_manager.manager.ListUnits.return_value = [
+                ("a.service", "", "loaded", "failed", "failed", "", "", 0, "", "")
+            ]
+            result = run_check(
+                ["--dbus", "--no-startup-time", "--record", self.recording]
+            )
+        self.assertEqual("a.service: failed", result.summary)
+
+        with patch("check_systemd.is_gi", False), patch(
+            "check_systemd.dbus_manager", None
+        ):
+            replayed = run_check(
+                ["--dbus", "--no-startup-time", "--replay", self.recording]
+            )
+        self.assertEqual("a.service: failed", replayed.summary)
+        self.assertIn("data_source=dbus", [str(p) for p in replayed.performance_data])
+
+    def test_state_and_clock(self) -> None:
+        boot_id = os.path.join(self.tmp.name, "boot_id")
+        with open(boot_id, "w") as boot_id_file:
+            boot_id_file.write("c0ffee\n")
+        state_dir = os.path.join(self.tmp.name, "state")
+        fake = FakeSystemd(
+            [
+                {
+                    "Id": "nginx.service",
+                    "LoadState": "loaded",
+                    "ActiveState": "active",
+                    "SubState": "running",
+                    "Description": "nginx",
+                    "NRestarts": 0,
+                    "ExecMainStartTimestampMonotonic": 1_000_000,
+                    "StateChangeTimestampMonotonic": 1_000_000,
+                }
+            ]
+        )
+        argv = ["--cli", "--no-startup-time", "--restarts", "--restarts-warning", "1"]
+        argv += ["--state-dir", state_dir]
+
+        def check(seconds: float, *extra: str):
+            with patch("check_systemd.BOOT_ID_PATH", boot_id), patch(
+                "check_systemd.time.monotonic", return_value=seconds
+            ):
+                return run_check(argv + list(extra))
+
+        with fake.serve():
+            check(100)
+            fake.units["nginx.service"].update(
+                NRestarts=2, StateChangeTimestampMonotonic=2_000_000_000
+            )
+            recorded = check(3700, "--record", self.recording)
+        self.assertEqual(
+            "nginx.service: 2 restarts in 3600s (2.0 per hour)", recorded.summary
+        )
+        with open(os.path.join(state_dir, "restarts.json")) as state_file:
+            state = state_file.read()
+
+        # Another boot, another time and another state on the local host
+        with open(boot_id, "w") as boot_id_file:
+            boot_id_file.write("decaf\n")
+        with patch("check_systemd.subprocess.Popen", side_effect=no_popen):
+            replayed = check(99999, "--replay", self.recording)
+        self.assertEqual(recorded.summary, replayed.summary)
+        with open(os.path.join(state_dir, "restarts.json")) as state_file:
+            self.assertEqual(state, state_file.read())
+
+    def test_missing_data(self) -> None:
+        execute_main(
+            argv=["--record", self.recording, "--no-startup-time"],
+            stdout=["systemctl-list-units_ok.txt"],
+        )
+        result = execute_main(
+            argv=["--replay", self.recording, "--timers"], popen=no_popen
+        )
+        result.assert_unknown()
+        self.assertIn("No recorded data", result.first_line)
+
+    def test_invalid_file(self) -> None:
+        with open(self.recording, "w") as recording:
+            recording.write("no recording")
+        with self.assertRaises(CheckError):
+            AcquisitionReplay(self.recording)
+
+    def test_empty_file(self) -> None:
+        open(self.recording, "w").close()
+        result = execute_main(argv=["--replay", self.recording], popen=no_popen)
+        result.assert_unknown()
+        self.assertIn("is empty", result.first_line)
+
+    def test_truncated_file(self) -> None:
+        execute_main(
+            argv=["--record", self.recording, "--no-startup-time"],
+            stdout=["systemctl-list-units_ok.txt"],
+        )
+        size = os.path.getsize(self.recording)
+        for length in (size - 1, len(check_systemd.RECORDING_MAGIC) + 3):
+            with self.subTest(length=length):
+                os.truncate(self.recording, length)
+                with self.assertRaisesRegex(CheckError, "truncated at byte"):
+                    AcquisitionReplay(self.recording)
+
+
+if __name__ == "__main__":
+    unittest.main()
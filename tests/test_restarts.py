@@ -0,0 +1,106 @@
+"""Tests related to the scope ``restarts`` (``--restarts``)."""
+
+import unittest
+from unittest.mock import patch
+
+from check_systemd import count_restarts, run_check
+
+from .helper import FakeSystemd, StateDirTestCase
+
+
+class TestFunctionCountRestarts(unittest.TestCase):
+    def test_increased(self) -> None:
+        self.assertEqual(3, count_restarts([2, 100], [5, 200]))
+
+    def test_unchanged(self) -> None:
+        self.assertEqual(0, count_restarts([2, 100], [2, 100]))
+
+    def test_reset_by_manual_start(self) -> None:
+        self.assertEqual(1, count_restarts([5, 100], [1, 200]))
+
+
+class TestRestarts(StateDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.fake = FakeSystemd(
+            [
+                self.service("nginx.service", 0),
+                self.service("crashing.service", 0),
+                FakeSystemd.unit("ssh.socket", SubState="listening"),
+            ]
+        )
+
+    @staticmethod
+    def service(name: str, n_restarts: int, timestamp: int = 1_000_000) -> dict:
+        return FakeSystemd.unit(
+            name,
+            NRestarts=n_restarts,
+            ExecMainStartTimestampMonotonic=timestamp,
+            StateChangeTimestampMonotonic=timestamp,
+        )
+
+    def run_check(self, seconds: float, data_source: str = "cli", *argv: str):
+        with patch(
+            "check_systemd.time.monotonic", return_value=seconds
+        ), self.fake.serve():
+            return run_check(
+                [
+                    "--" + data_source,
+                    "--no-startup-time",
+                    "--restarts",
+                    "--state-dir",
+                    self.tmp.name,
+                ]
+                + list(argv)
+            )
+
+    def restart(self, name: str, n_restarts: int, seconds: float) -> None:
+        self.fake.units[name] = self.service(name, n_restarts, int(seconds * 1_000_000))
+
+    def test_first_run(self) -> None:
+        result = self.run_check(100)
+        self.assertEqual(0, result.exitcode)
+        self.assertFalse([p for p in result.performance_data if "_restarts" in p])
+
+    def test_restart_loop(self) -> None:
+        for data_source in ("cli", "dbus"):
+            with self.subTest(data_source=data_source):
+                self.restart("crashing.service", 0, 50)
+                self.run_check(100, data_source)
+                self.restart("crashing.service", 4, 350)
+                result = self.run_check(400, data_source)
+                self.assertEqual(1, result.exitcode)
+                self.assertEqual(
+                    "crashing.service: 4 restarts in 300s (48.0 per hour)",
+                    result.summary,
+                )
+                self.assertIn(
+                    "'unit_nginx.service_restarts'=0.0;12;;0", result.performance_data
+                )
+                self.assertFalse(
+                    [p for p in result.performance_data if "ssh.socket" in p]
+                )
+
+    def test_critical(self) -> None:
+        self.run_check(100)
+        self.restart("crashing.service", 100, 350)
+        result = self.run_check(400, "cli", "--restarts-critical", "60")
+        self.assertEqual(2, result.exitcode)
+
+    def test_unchanged_state(self) -> None:
+        self.run_check(100)
+        # The state did not change since the previous run.
+        self.fake.units["crashing.service"]["NRestarts"] = 4
+        result = self.run_check(400)
+        self.assertEqual(0, result.exitcode)
+
+    def test_new_boot(self) -> None:
+        self.run_check(100)
+        self.set_boot_id("decaf")
+        self.restart("crashing.service", 4, 50)
+        result = self.run_check(60)
+        self.assertEqual(0, result.exitcode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from .helper import execute_main
+from .helper import MPopen, StateDirTestCase, execute_main
 
 
 class TestScopeStartupTime(unittest.TestCase):
@@ -28,3 +28,29 @@ class TestScopeStartupTime(unittest.TestCase):
     def test_option_no_startup_time_short(self) -> None:
         result = execute_main(argv=["-c", "1", "-n"])
         result.assert_ok()
+
+
+class TestOptionBootCache(StateDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.argv = ["--boot-cache", "-w", "2", "--state-dir", self.tmp.name]
+
+    def test_cached(self) -> None:
+        execute_main(argv=list(self.argv)).assert_warn()
+        # systemd-analyze is not executed again.
+        result = execute_main(
+            argv=list(self.argv), stdout=["systemctl-list-units_ok.txt"]
+        )
+        result.assert_warn()
+        self.assertIn("startup_time is 12.35", result.first_line)
+
+    def test_not_finished(self) -> None:
+        execute_main(
+            argv=list(self.argv),
+            popen=(
+                MPopen(stdout="systemctl-list-units_ok.txt"),
+                MPopen(returncode=1, stderr="systemd-analyze_not-finished.txt"),
+            ),
+        ).assert_ok()
+        result = execute_main(argv=list(self.argv))
+        result.assert_warn()
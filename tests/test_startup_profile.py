@@ -0,0 +1,126 @@
+"""Tests related to the scope ``startup_profile`` (``--startup-profile``)."""
+
+import os
+import unittest
+from unittest.mock import patch
+
+from check_systemd import UnitCache, parse_blame, run_check
+
+from .helper import MPopen, StateDirTestCase, convert_to_bytes
+
+
+class TestFunctionParseBlame(unittest.TestCase):
+    def test_parse(self) -> None:
+        blame = parse_blame(convert_to_bytes("systemd-analyze-blame.txt").decode())
+        self.assertEqual(("apt-daily-upgrade.service", 62.154), blame[0])
+        self.assertEqual(("nginx.service", 0.89), blame[4])
+        self.assertEqual(7, len(blame))
+
+
+class TestStartupProfile(StateDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.popen = patch(
+            "check_systemd.subprocess.Popen",
+            return_value=MPopen(stdout="systemd-analyze-blame.txt"),
+        )
+
+    def run_check(self, *argv: str):
+        unit_cache = UnitCache()
+        unit_cache.add_unit(name="nginx.service", active_state="active")
+        with self.popen as popen:
+            result = run_check(
+                ["--no-startup-time", "--startup-profile", "--state-dir", self.tmp.name]
+                + list(argv),
+                unit_cache=unit_cache,
+            )
+        self.commands = [call[0][0] for call in popen.call_args_list]
+        return result
+
+    def test_top(self) -> None:
+        result = self.run_check("--startup-profile-top", "2")
+        self.assertEqual(0, result.exitcode)
+        self.assertEqual([["systemd-analyze", "blame"]], self.commands)
+        self.assertIn(
+            "'unit_apt-daily-upgrade.service_startup_time'=62.154s;;;0",
+            result.performance_data,
+        )
+        self.assertIn(
+            "'unit_NetworkManager-wait-online.service_startup_time'=12.345s;;;0",
+            result.performance_data,
+        )
+        self.assertEqual(
+            2, len([p for p in result.performance_data if "_startup" in p])
+        )
+
+    def test_thresholds(self) -> None:
+        result = self.run_check(
+            "--startup-profile-warning", "10", "--startup-profile-critical", "60"
+        )
+        self.assertEqual(2, result.exitcode)
+        self.assertEqual(
+            "apt-daily-upgrade.service: activated in 62.154s during boot",
+            result.summary,
+        )
+
+    def test_unit_thresholds(self) -> None:
+        result = self.run_check(
+            "--startup-profile-top",
+            "2",
+            "--startup-profile-warning",
+            "10",
+            "--startup-profile-threshold",
+            "apt-daily-upgrade.service",
+            "",
+            "120",
+            "--startup-profile-threshold",
+            "nginx.service",
+            "0.5",
+            "",
+        )
+        self.assertEqual(1, result.exitcode)
+        self.assertEqual(
+            "NetworkManager-wait-online.service: activated in 12.345s during boot, "
+            "nginx.service: activated in 0.89s during boot",
+            result.summary,
+        )
+        self.assertIn(
+            "'unit_apt-daily-upgrade.service_startup_time'=62.154s;;120;0",
+            result.performance_data,
+        )
+        # Reported although it is not among the two slowest units
+        self.assertIn(
+            "'unit_nginx.service_startup_time'=0.89s;0.5;;0",
+            result.performance_data,
+        )
+
+    def test_exclude(self) -> None:
+        result = self.run_check(
+            "--startup-profile-critical", "10", "--exclude", "apt-daily.*"
+        )
+        self.assertEqual(
+            "NetworkManager-wait-online.service: activated in 12.345s during boot",
+            result.summary,
+        )
+
+    def test_cached_per_boot(self) -> None:
+        self.run_check()
+        self.assertEqual(1, len(self.commands))
+        self.run_check()
+        self.assertEqual(0, len(self.commands))
+
+    def test_not_finished(self) -> None:
+        self.popen = patch(
+            "check_systemd.subprocess.Popen",
+            return_value=MPopen(returncode=1, stderr="Bootup is not yet finished."),
+        )
+        result = self.run_check()
+        self.assertEqual(0, result.exitcode)
+        self.assertFalse([p for p in result.performance_data if "_startup" in p])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tmp.name, "startup-profile.json"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Tests related to the scope ``transitions`` (``--transitions``)."""
+
+import unittest
+from unittest.mock import patch
+
+from check_systemd import run_check
+
+from .helper import FakeSystemd
+
+
+class TestTransitions(unittest.TestCase):
+    def setUp(self) -> None:
+        # The state changed the given number of seconds after the boot.
+        self.fake = FakeSystemd(
+            FakeSystemd.unit(name, state, StateChangeTimestampMonotonic=since * 10**6)
+            for name, state, since in (
+                ("nginx.service", "active", 10),
+                ("mnt-nfs.mount", "activating", 100),
+                ("backup.service", "deactivating", 1000),
+                ("php.service", "reloading", 1190),
+            )
+        )
+
+    def run_check(self, *argv: str, data_source: str = "cli"):
+        self.fake.commands = []
+        with patch(
+            "check_systemd.time.monotonic", return_value=1200
+        ), self.fake.serve():
+            return run_check(
+                ["--" + data_source, "--no-startup-time", "--transitions"] + list(argv)
+            )
+
+    def test_stuck(self) -> None:
+        for data_source in ("cli", "dbus"):
+            with self.subTest(data_source=data_source):
+                result = self.run_check("-v", data_source=data_source)
+                self.assertEqual(1, result.exitcode)
+                self.assertEqual("mnt-nfs.mount: activating for 1100s", result.summary)
+                self.assertIn(
+                    "'unit_backup.service_transition'=200s;300;1800;0",
+                    result.performance_data,
+                )
+                self.assertIn(
+                    "'unit_php.service_transition'=10s;300;1800;0",
+                    result.performance_data,
+                )
+
+    def test_fetch_only_transitional(self) -> None:
+        self.run_check()
+        self.assertEqual(
+            [
+                "systemctl",
+                "show",
+                "--property=Id,StateChangeTimestampMonotonic",
+                "--",
+                "backup.service",
+                "mnt-nfs.mount",
+                "php.service",
+            ],
+            self.fake.commands[-1],
+        )
+
+    def test_critical(self) -> None:
+        result = self.run_check("--transitions-critical", "1000")
+        self.assertEqual(2, result.exitcode)
+
+    def test_no_transitional_units(self) -> None:
+        result = self.run_check("--include", "nginx.*")
+        self.assertEqual(0, result.exitcode)
+        self.assertFalse([c for c in self.fake.commands if c[1] == "show"])
+
+
+if __name__ == "__main__":
+    unittest.main()
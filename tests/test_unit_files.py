@@ -0,0 +1,190 @@
+"""Tests related to the scope ``unit_files`` (options ``--unit-files`` and
+``--unit-files-presets``)."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import check_systemd
+from check_systemd import get_unit_paths_fingerprint, parse_unit_files
+
+from .helper import FakeSystemd, MPopen, execute_main
+
+
+class TestFunctionParseUnitFiles(unittest.TestCase):
+    def test_with_preset(self) -> None:
+        self.assertEqual(
+            {"nginx.service": ("enabled", "enabled"), "sound.target": ("static", None)},
+            parse_unit_files(
+                "nginx.service  enabled  enabled\nsound.target  static  -\n"
+            ),
+        )
+
+    def test_without_preset(self) -> None:
+        self.assertEqual(
+            {"nginx.service": ("enabled", None)},
+            parse_unit_files("nginx.service enabled\n"),
+        )
+
+
+class TestFunctionIsExpectedInactive(unittest.TestCase):
+    def test_triggered(self) -> None:
+        self.assertTrue(
+            check_systemd.is_expected_inactive({"TriggeredBy": ["nginx.socket"]})
+        )
+
+    def test_oneshot(self) -> None:
+        self.assertTrue(check_systemd.is_expected_inactive({"Type": "oneshot"}))
+        self.assertFalse(
+            check_systemd.is_expected_inactive(
+                {"Type": "oneshot", "RemainAfterExit": True}
+            )
+        )
+
+    def test_simple(self) -> None:
+        self.assertFalse(
+            check_systemd.is_expected_inactive({"Type": "simple", "TriggeredBy": []})
+        )
+
+
+class TestFunctionGetUnitPathsFingerprint(unittest.TestCase):
+    def test_wants_directory(self) -> None:
+        with tempfile.TemporaryDirectory() as unit_dir:
+            wants = os.path.join(unit_dir, "multi-user.target.wants")
+            os.mkdir(wants)
+            fingerprint = get_unit_paths_fingerprint([unit_dir, "/nonexistent"])
+            self.assertEqual(fingerprint, get_unit_paths_fingerprint([unit_dir]))
+            os.utime(wants, ns=(0, 0))
+            self.assertNotEqual(fingerprint, get_unit_paths_fingerprint([unit_dir]))
+
+
+class TestFunctionGetUserUnitSearchPath(unittest.TestCase):
+    def test_xdg(self) -> None:
+        environ = {"XDG_CONFIG_HOME": "/home/alice/.config", "XDG_RUNTIME_DIR": "/r"}
+        with patch.dict("os.environ", environ):
+            paths = check_systemd.get_user_unit_search_path()
+        self.assertIn("/home/alice/.config/systemd/user", paths)
+        self.assertIn("/r/systemd/transient", paths)
+        self.assertIn("/usr/lib/systemd/user", paths)
+
+
+class TestScopeUnitFiles(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.unit_dir = tempfile.TemporaryDirectory()
+        self.calls: list = []
+
+    def tearDown(self) -> None:
+        self.state_dir.cleanup()
+        self.unit_dir.cleanup()
+
+    def popen(self, args, **kwargs):
+        self.calls.append(args)
+        if args[:2] == ["systemctl", "list-unit-files"]:
+            return MPopen(stdout="systemctl-list-unit-files.txt")
+        return MPopen(stdout="systemctl-list-units_3units.txt")
+
+    def execute(self, argv: list = ["--unit-files"]):
+        with patch("check_systemd.UNIT_SEARCH_PATH", (self.unit_dir.name,)):
+            return execute_main(
+                argv=argv + ["--state-dir", self.state_dir.name, "--no-startup-time"],
+                popen=self.popen,
+            )
+
+    def test_enabled_inactive(self) -> None:
+        result = self.execute()
+        result.assert_warn()
+        self.assertIn(
+            "SYSTEMD WARNING - nginx.service: enabled but inactive", result.first_line
+        )
+        self.assertIn("unit_files_enabled_inactive=1", result.first_line)
+
+    def test_presets(self) -> None:
+        result = self.execute(["--unit-files-presets", "--no-performance-data"])
+        result.assert_warn()
+        result.assert_first_line(
+            "SYSTEMD WARNING - backup.service: disabled (preset enabled), "
+            "nginx.service: enabled but inactive"
+        )
+
+    def test_exclude(self) -> None:
+        result = self.execute(["--unit-files", "--exclude", "nginx.service"])
+        result.assert_ok()
+
+    def test_cache(self) -> None:
+        def count() -> int:
+            return sum(1 for args in self.calls if "list-unit-files" in args)
+
+        self.execute()
+        self.assertEqual(1, count())
+        self.execute()
+        self.assertEqual(1, count())
+        os.mkdir(os.path.join(self.unit_dir.name, "multi-user.target.wants"))
+        result = self.execute()
+        self.assertEqual(2, count())
+        result.assert_warn()
+
+
+class TestScopeUnitFilesInactive(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.state_dir.cleanup)
+        self.fake = FakeSystemd(
+            [
+                FakeSystemd.unit("nginx.service", "inactive", Type="notify"),
+                FakeSystemd.unit(
+                    "cups.service", "inactive", TriggeredBy=["cups.socket"]
+                ),
+                FakeSystemd.unit("cups.socket"),
+                FakeSystemd.unit("apt-daily.service", "inactive", Type="oneshot"),
+                FakeSystemd.unit(
+                    "nftables.service",
+                    "inactive",
+                    Type="oneshot",
+                    RemainAfterExit=True,
+                ),
+            ]
+        )
+        self.unit_files = "".join(
+            "{} enabled enabled\n".format(name)
+            for name in list(self.fake.units) + ["ssh.service"]
+        )
+
+    def popen(self, args, **kwargs):
+        if args[:2] == ["systemctl", "list-unit-files"]:
+            self.fake.commands.append(args)
+            return MPopen(stdout=self.unit_files)
+        return self.fake.popen(args, **kwargs)
+
+    def run_check(self, *argv: str):
+        with self.fake.serve(), patch(
+            "check_systemd.subprocess.Popen", side_effect=self.popen
+        ), patch("check_systemd.UNIT_SEARCH_PATH", ()), patch(
+            "check_systemd.get_user_unit_search_path", return_value=()
+        ):
+            return check_systemd.run_check(
+                ["--cli", "--no-startup-time", "--unit-files"]
+                + ["--state-dir", self.state_dir.name]
+                + list(argv)
+            )
+
+    def test_expected_inactive_skipped(self) -> None:
+        result = self.run_check("--no-performance-data")
+        self.assertEqual(
+            "nftables.service: enabled but inactive, "
+            "nginx.service: enabled but inactive, "
+            "ssh.service: enabled but inactive",
+            result.summary,
+        )
+        shows = [c for c in self.fake.commands if c[1] == "show"]
+        self.assertEqual(1, len(shows))
+
+    def test_user(self) -> None:
+        self.run_check("--user")
+        commands = [c for c in self.fake.commands if "list-unit-files" in c]
+        self.assertEqual(["--user"], commands[0][3:])
+
+
+if __name__ == "__main__":
+    unittest.main()
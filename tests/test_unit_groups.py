@@ -0,0 +1,59 @@
+"""Tests related to the unit groups (options ``--group`` and
+``--group-type``)."""
+
+import unittest
+
+from .helper import execute_main
+
+
+def execute(argv: list, list_units: str = "regexp-excludes"):
+    return execute_main(
+        argv=argv + ["--no-startup-time"],
+        stdout=["systemctl-list-units_{}.txt".format(list_units)],
+    )
+
+
+class TestUnitGroups(unittest.TestCase):
+    def test_group_members_are_not_evaluated_individually(self) -> None:
+        result = execute(["--group", "failed", ".*", "-p"])
+        result.assert_critical()
+        result.assert_first_line("SYSTEMD CRITICAL - failed: 3/5 failed (60%)")
+
+    def test_group_warning(self) -> None:
+        result = execute(
+            [
+                "--group-type",
+                "services",
+                "service",
+                "--group-warning",
+                "30",
+                "--group-critical",
+                "50",
+                "-p",
+            ],
+            list_units="failed",
+        )
+        result.assert_warn()
+        result.assert_first_line("SYSTEMD WARNING - services: 1/3 failed (33.333%)")
+
+    def test_group_ok(self) -> None:
+        result = execute(
+            ["--group", "smart", "smartd", "--group-critical", "100", "-p"],
+            list_units="failed",
+        )
+        result.assert_ok()
+
+    def test_performance_data(self) -> None:
+        result = execute(["--group", "services", r".*\.service"], list_units="failed")
+        self.assertIn("services_count=3", result.first_line)
+        self.assertIn("services_failed=1", result.first_line)
+        self.assertIn("services_failed_percent=33.333%;;0;0;100", result.first_line)
+        self.assertIn("count_units=3", result.first_line)
+
+    def test_no_units(self) -> None:
+        result = execute(["--group", "x", ".*", "--include", "XXX"])
+        result.assert_unknown()
+
+
+if __name__ == "__main__":
+    unittest.main()
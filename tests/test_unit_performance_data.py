@@ -0,0 +1,78 @@
+"""Tests related to the performance data per unit and per unit type."""
+
+import unittest
+
+from check_systemd import UnitCache, run_check
+
+from .helper import execute_main
+
+
+def execute(argv: list, list_units: str = "failed", timers: bool = False):
+    stdout = ["systemctl-list-units_{}.txt".format(list_units)]
+    if timers:
+        argv = argv + ["--timers"]
+        stdout.append("systemctl-list-timers_1.txt")
+    return execute_main(argv=argv + ["--no-startup-time"], stdout=stdout)
+
+
+def perfdata(first_line: str) -> list:
+    return first_line.split(" | ")[1].split()
+
+
+class TestPerformanceDataUnits(unittest.TestCase):
+    def test_units(self) -> None:
+        result = execute(["--perfdata-units"])
+        self.assertIn("'unit_smartd.service'=3", perfdata(result.first_line))
+        self.assertIn("'unit_setvtrgb.service'=0", perfdata(result.first_line))
+        self.assertIn("'unit_rtkit-daemon.service'=2", perfdata(result.first_line))
+
+    def test_label_template(self) -> None:
+        result = execute(["--perfdata-units", "--perfdata-label-template", "{stem}"])
+        self.assertIn("smartd=3", perfdata(result.first_line))
+
+    def test_top(self) -> None:
+        result = execute(["--perfdata-units", "--perfdata-top", "1"])
+        self.assertIn("'unit_smartd.service'=3", perfdata(result.first_line))
+        self.assertNotIn("'unit_setvtrgb.service'=0", perfdata(result.first_line))
+
+    def test_top_severity(self) -> None:
+        unit_cache = UnitCache()
+        unit_cache.add_unit(name="a.service", active_state="failed")
+        unit_cache.add_unit(name="b.service", active_state="deactivating")
+        unit_cache.add_unit(name="c.service", active_state="inactive")
+        unit_cache.add_unit(name="d.service", active_state="reloading")
+        result = run_check(
+            ["--no-startup-time", "--perfdata-units", "--perfdata-top", "3"],
+            unit_cache=unit_cache,
+        )
+        self.assertEqual(
+            ["'unit_a.service'=3", "'unit_b.service'=5", "'unit_d.service'=1"],
+            [p for p in result.performance_data if p.startswith("'unit_")],
+        )
+
+    def test_types(self) -> None:
+        result = execute(["--perfdata-types"])
+        self.assertIn("units_service_failed=1", perfdata(result.first_line))
+        self.assertIn("units_service_active=1", perfdata(result.first_line))
+        self.assertIn("units_service_inactive=1", perfdata(result.first_line))
+
+    def test_max_labels(self) -> None:
+        result = execute(
+            ["--perfdata-units", "--perfdata-types", "--perfdata-max-labels", "4"]
+        )
+        labels = [p for p in perfdata(result.first_line) if "service" in p]
+        self.assertEqual(4, len(labels))
+        self.assertIn("perfdata_dropped=2", perfdata(result.first_line))
+
+    def test_timer_ages(self) -> None:
+        result = execute(
+            ["--perfdata-units", "--perfdata-top", "1"],
+            list_units="3units",
+            timers=True,
+        )
+        ages = [p for p in perfdata(result.first_line) if "_age" in p]
+        self.assertEqual(["'unit_phpsessionclean.timer_age'=5529600.0s"], ages)
+
+
+if __name__ == "__main__":
+    unittest.main()
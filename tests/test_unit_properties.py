@@ -0,0 +1,140 @@
+"""Tests related to the bulk fetching of additional unit properties."""
+
+import unittest
+from unittest.mock import patch
+
+import check_systemd
+from check_systemd import convert_property_value, parse_show_output
+
+from .helper import FakeSystemd, MPopen
+
+
+class TestFunctionConvertPropertyValue(unittest.TestCase):
+    def test_int(self) -> None:
+        self.assertEqual(3, convert_property_value("NRestarts", "3"))
+
+    def test_bool(self) -> None:
+        self.assertEqual(True, convert_property_value("CanStart", "yes"))
+        self.assertEqual(False, convert_property_value("CanStart", "no"))
+
+    def test_not_set(self) -> None:
+        self.assertEqual(None, convert_property_value("MemoryCurrent", "[not set]"))
+        self.assertEqual(None, convert_property_value("StatusText", ""))
+
+    def test_list(self) -> None:
+        self.assertEqual(
+            ["sysinit.target", "network.target"],
+            convert_property_value("After", "sysinit.target network.target"),
+        )
+        self.assertEqual([], convert_property_value("Requires", ""))
+
+    def test_str(self) -> None:
+        self.assertEqual("exit-code", convert_property_value("Result", "exit-code"))
+
+
+class TestFunctionParseShowOutput(unittest.TestCase):
+    def test_multiple_records(self) -> None:
+        records = list(
+            parse_show_output(
+                "Id=a.service\nNRestarts=1\n\nId=b.service\nNRestarts=2\n"
+            )
+        )
+        self.assertEqual(
+            [
+                {"Id": "a.service", "NRestarts": 1},
+                {"Id": "b.service", "NRestarts": 2},
+            ],
+            records,
+        )
+
+    def test_empty(self) -> None:
+        self.assertEqual([], list(parse_show_output("")))
+
+
+def get_unit_cache() -> check_systemd.CliUnitCache:
+    with patch("check_systemd.subprocess.Popen") as Popen:
+        Popen.return_value = MPopen(stdout="systemctl-list-units_3units.txt")
+        return check_systemd.CliUnitCache()
+
+
+class TestMethodFetchProperties(unittest.TestCase):
+    def test_single_chunk(self) -> None:
+        unit_cache = get_unit_cache()
+        with patch("check_systemd.subprocess.Popen") as Popen:
+            Popen.return_value = MPopen(
+                stdout="Id=sound.target\nResult=success\n\n"
+                "Id=swap.target\nResult=exit-code\n"
+            )
+            units = unit_cache.fetch_properties(
+                ["Result"], names=["sound.target", "swap.target"]
+            )
+            self.assertEqual(
+                [
+                    "systemctl",
+                    "show",
+                    "--property=Id,Result",
+                    "--",
+                    "sound.target",
+                    "swap.target",
+                ],
+                Popen.call_args[0][0],
+            )
+        self.assertEqual(2, len(units))
+        self.assertEqual("success", unit_cache.get("sound.target").properties["Result"])
+        self.assertEqual(
+            "exit-code", unit_cache.get("swap.target").properties["Result"]
+        )
+
+    def test_multiple_chunks(self) -> None:
+        unit_cache = get_unit_cache()
+
+        def show(args, **kwargs):
+            names = args[args.index("--") + 1 :]
+            return MPopen(
+                stdout="\n".join("Id={}\nNRestarts=4\n".format(n) for n in names)
+            )
+
+        with patch("check_systemd.PROPERTY_CHUNK_SIZE", 1), patch(
+            "check_systemd.subprocess.Popen"
+        ) as Popen:
+            Popen.side_effect = show
+            unit_cache.fetch_properties(["NRestarts"])
+            self.assertEqual(3, Popen.call_count)
+        for unit in unit_cache.list():
+            self.assertEqual(4, unit.properties["NRestarts"])
+            self.assertEqual(unit.name, unit.properties["Id"])
+
+
+class TestDbusFetchProperties(unittest.TestCase):
+    def test_get_all(self) -> None:
+        with patch("check_systemd.dbus_manager", create=True) as dbus_manager:
+            dbus_manager.manager.ListUnits.return_value = [
+                ("a.service", "", "loaded", "active", "running", "", "", 0, "", "")
+            ]
+            dbus_manager.get_unit_properties.return_value = {
+                "NRestarts": 2,
+                "Result": "success",
+            }
+            unit_cache = check_systemd.DbusUnitCache()
+            unit_cache.fetch_properties(["NRestarts"])
+        self.assertEqual({"NRestarts": 2}, unit_cache.get("a.service").properties)
+
+    def test_object_paths_and_proxies(self) -> None:
+        fake = FakeSystemd.generate(50)
+        with fake.serve():
+            unit_cache = check_systemd.DbusUnitCache()
+            fake.calls.clear()
+            unit_cache.fetch_properties(["NRestarts"])
+            # Two GetAll calls per unit and no GetUnit calls
+            self.assertEqual(100, fake.calls["dbus"])
+            proxies = check_systemd.DBusProxy.new_for_bus_sync.call_count
+            unit_cache.fetch_properties(["NRestarts"])
+            self.assertEqual(
+                proxies, check_systemd.DBusProxy.new_for_bus_sync.call_count
+            )
+        for unit in unit_cache.list(include=r".*\.service"):
+            self.assertIn("NRestarts", unit.properties)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests related to the checking of all running user service managers."""
+
+import unittest
+from unittest.mock import Mock, patch
+
+from check_systemd import UnitCache, get_user_managers
+
+from .helper import MPopen, execute_main
+
+
+def popen(args, **kwargs):
+    if "systemd-analyze" in args:
+        return MPopen(stdout="systemd-analyze_12.345.txt")
+    if "--machine=alice@" in args:
+        return MPopen(stdout="systemctl-list-units_3units.txt")
+    if "--machine=bob@" in args:
+        return MPopen(stdout="systemctl-list-units_failed.txt")
+    return MPopen(stdout="systemctl-list-units_user-managers.txt")
+
+
+def getpwuid(uid):
+    return Mock(pw_name={1000: "alice", 1001: "bob"}[uid])
+
+
+def execute_with_user_managers(argv):
+    with patch("check_systemd.pwd.getpwuid", getpwuid):
+        return execute_main(argv=["--user-managers"] + argv, popen=popen)
+
+
+class TestFunctionGetUserManagers(unittest.TestCase):
+    def test_only_active_managers(self) -> None:
+        unit_cache = UnitCache()
+        unit_cache.add_unit(name="user@1000.service", active_state="active")
+        unit_cache.add_unit(name="user@1002.service", active_state="inactive")
+        unit_cache.add_unit(name="user-runtime-dir@1000.service", active_state="active")
+        with patch("check_systemd.pwd.getpwuid", side_effect=KeyError):
+            self.assertEqual({"user@1000": "1000@"}, get_user_managers(unit_cache))
+
+
+class TestOptionUserManagers(unittest.TestCase):
+    def test_problem_attribution(self) -> None:
+        result = execute_with_user_managers(["--no-performance-data"])
+        result.assert_critical()
+        result.assert_first_line("SYSTEMD CRITICAL - user@1001/smartd.service: failed")
+
+    def test_performance_data(self) -> None:
+        result = execute_with_user_managers(["--max-workers", "1"])
+        result.assert_critical()
+        self.assertIn("user_1000_count_units=3", result.first_line)
+        self.assertIn("user_1001_units_failed=1", result.first_line)
+        self.assertIn(" count_units=4", result.first_line)
+        self.assertNotIn("user_1002", result.first_line)
+
+    def test_acquisition_error(self) -> None:
+        def popen_error(args, **kwargs):
+            if "--machine=bob@" in args:
+                return MPopen(returncode=1)
+            return popen(args)
+
+        with patch("check_systemd.pwd.getpwuid", getpwuid):
+            result = execute_main(
+                argv=["--user-managers", "--no-performance-data"], popen=popen_error
+            )
+        result.assert_unknown()
+        self.assertIn("user@1001", result.first_line)
+
+
+if __name__ == "__main__":
+    unittest.main()